@@ -6,15 +6,33 @@ Interface web moderne avec gestion audio bidirectionnelle côté navigateur
 
 import os
 import sys
-import json
+import json_backend
+import collections
 import queue
 import threading
 import websocket
 from werkzeug.utils import secure_filename
-from stream_handler import OpenAIStreamHandler
+from stream_handler import BaseStreamHandler, OpenAIStreamHandler, SERVER_VAD, UPSTREAM_SAMPLE_RATE, b64_payload_size
+from session_emitter import BatchingEmitter, FlushScheduler, EgressQueue
+from recorder import SessionRecorder
+from upstream_pool import WarmConnectionPool
+from gpt_handler import GPTHandler
+from vad import EnergyVAD
+from frame_aggregator import FrameAggregator, DeadlineTimer
+from resample import StreamingResampler, SUPPORTED_RATES
+from audio_codecs import create_codec, available_encodings
+from session_registry import create_registry
+from session_manager import SessionManager
+from event_journal import EventJournal
+from upstream_resume import ConversationHistory, GapBuffer, backoff_delay
+from upload_ingest import UploadJob
+from batch_runner import BatchRunner
+from session_profiles import SessionProfile, ProfileStore
+from audio_cache import ResponseAudioCache
+from profiling import SpanProfiler, StackSampler, Tracer
+from metrics import MetricsRegistry, SIZE_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE
 import numpy as np
 import base64
-import wave
 import time
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory
@@ -22,6 +40,9 @@ from flask_socketio import SocketIO, emit, join_room, leave_room
 import logging
 from dotenv import load_dotenv
 import uuid
+import socket
+import hmac
+from concurrent.futures import ThreadPoolExecutor
 
 # Force UTF-8 encoding pour Windows
 if sys.platform == "win32":
@@ -34,7 +55,10 @@ load_dotenv()
 # Configuration Flask
 app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key-change-in-production')
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# File de messages partagée (ex. redis://...) pour que les émissions Socket.IO
+# vers une room atteignent les clients connectés à d'autres workers
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading',
+                    message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE') or None)
 
 # Configuration logging
 logging.basicConfig(
@@ -49,6 +73,136 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL = os.getenv("MODEL", "gpt-4o-realtime-preview-2024-10-01")
 INSTRUCTIONS = os.getenv("INSTRUCTIONS", "Vous êtes un assistant vocal intelligent en français. Répondez de manière concise et utile.")
 
+# Profils de session nommés (voix, instructions, VAD, transcription, encodage navigateur)
+# lus dans un fichier JSON rechargé à chaud ; les valeurs ci-dessus forment le profil 'default'
+SESSION_PROFILES = os.getenv("SESSION_PROFILES", "session_profiles.json")
+SESSION_PROFILES_CHECK_INTERVAL = float(os.getenv("SESSION_PROFILES_CHECK_INTERVAL", "2"))
+VOICE = os.getenv("VOICE", "alloy")
+
+# Transport vers l'API temps réel : 'thread' (un thread par session) ou 'asyncio' (boucle partagée)
+REALTIME_TRANSPORT = os.getenv("REALTIME_TRANSPORT", "thread")
+REALTIME_URL = os.getenv("REALTIME_URL", "wss://api.openai.com/v1/realtime")
+# Chat texte en streaming (/api/chat, événement chat_message) : modèle, URL et connexions HTTP conservées
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
+CHAT_URL = os.getenv("CHAT_URL", "https://api.openai.com/v1/chat/completions")
+CHAT_POOL_SIZE = int(os.getenv("CHAT_POOL_SIZE", "10"))
+# Bibliothèque JSON des messages temps réel : 'auto' (orjson si installé), 'orjson' ou 'json'
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto")
+
+# Réserve de connexions OpenAI pré-établies et pré-configurées (0 = désactivée)
+WARM_POOL_SIZE = int(os.getenv("WARM_POOL_SIZE", "0"))
+WARM_POOL_TTL = float(os.getenv("WARM_POOL_TTL", "600"))
+WARM_POOL_CHECK_INTERVAL = float(os.getenv("WARM_POOL_CHECK_INTERVAL", "5"))
+
+# Détection d'activité vocale locale avant envoi à OpenAI
+VAD_ENABLED = os.getenv("VAD_ENABLED", "0") == "1"
+VAD_THRESHOLD = float(os.getenv("VAD_THRESHOLD", "0.01"))
+VAD_ZCR_MAX = float(os.getenv("VAD_ZCR_MAX", "0.35"))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "600"))
+VAD_KEEP_EVERY = int(os.getenv("VAD_KEEP_EVERY", "0"))
+# Validation locale des tours de parole (désactive la détection côté OpenAI)
+VAD_LOCAL_COMMIT = VAD_ENABLED and os.getenv("VAD_LOCAL_COMMIT", "0") == "1"
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "200"))
+
+# Regroupement des trames micro avant input_audio_buffer.append
+AUDIO_AGGREGATION = os.getenv("AUDIO_AGGREGATION", "0") == "1"
+AUDIO_FRAME_MIN_MS = int(os.getenv("AUDIO_FRAME_MIN_MS", "20"))
+AUDIO_FRAME_MAX_MS = int(os.getenv("AUDIO_FRAME_MAX_MS", "100"))
+AUDIO_MAX_LATENCY_MS = int(os.getenv("AUDIO_MAX_LATENCY_MS", "120"))
+
+# Registre des sessions partagé entre workers (vide = mémoire locale, redis://... = Redis)
+SESSION_REGISTRY_URL = os.getenv("SESSION_REGISTRY_URL", "")
+SESSION_REGISTRY_TTL = int(os.getenv("SESSION_REGISTRY_TTL", "3600"))
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+# Cycle de vie des sessions : fermeture des sessions inactives ou trop longues
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "300"))
+SESSION_MAX_DURATION = float(os.getenv("SESSION_MAX_DURATION", "3600"))
+SESSION_REAP_INTERVAL = float(os.getenv("SESSION_REAP_INTERVAL", "30"))
+
+# Capacité du journal d'événements de chaque session
+EVENT_JOURNAL_SIZE = int(os.getenv("EVENT_JOURNAL_SIZE", "100"))
+
+# Ingestion audio via Socket.IO : nombre maximal de trames en attente par session
+AUDIO_IN_MAX_PENDING = int(os.getenv("AUDIO_IN_MAX_PENDING", "8"))
+
+# Interruption de la réponse en cours quand l'utilisateur reprend la parole (barge-in)
+BARGE_IN = os.getenv("BARGE_IN", "1") == "1"
+
+# File d'émission audio vers le navigateur : taille (0 = émission directe), politique
+# de débordement (block, drop_oldest, coalesce) et âge maximal d'une trame (ms)
+EGRESS_QUEUE_SIZE = int(os.getenv("EGRESS_QUEUE_SIZE", "32"))
+EGRESS_POLICY = os.getenv("EGRESS_POLICY", "drop_oldest")
+EGRESS_MAX_AGE_MS = float(os.getenv("EGRESS_MAX_AGE_MS", "2000"))
+
+# Reprise après coupure de la connexion OpenAI : tentatives (0 = désactivée), backoff
+# exponentiel avec gigue (s), éléments de conversation rejoués et audio micro conservé (ms)
+RECONNECT_MAX_ATTEMPTS = int(os.getenv("RECONNECT_MAX_ATTEMPTS", "5"))
+RECONNECT_BASE_DELAY = float(os.getenv("RECONNECT_BASE_DELAY", "0.5"))
+RECONNECT_MAX_DELAY = float(os.getenv("RECONNECT_MAX_DELAY", "10"))
+RECONNECT_REPLAY_ITEMS = int(os.getenv("RECONNECT_REPLAY_ITEMS", "20"))
+RECONNECT_BUFFER_MS = int(os.getenv("RECONNECT_BUFFER_MS", "5000"))
+
+# Import de fichiers audio dans le dialogue : taille maximale (Mo), tâches simultanées,
+# vitesse d'envoi (multiple du temps réel, 0 = sans cadencement), taille des blocs (ms)
+# et fréquence des fichiers PCM16 bruts (.pcm/.raw)
+UPLOADS_DIR = os.path.join('static', 'uploads')
+UPLOAD_MAX_MB = int(os.getenv("UPLOAD_MAX_MB", "200"))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+UPLOAD_SPEED = float(os.getenv("UPLOAD_SPEED", "1"))
+UPLOAD_BLOCK_MS = int(os.getenv("UPLOAD_BLOCK_MS", "100"))
+UPLOAD_RAW_RATE = int(os.getenv("UPLOAD_RAW_RATE", "24000"))
+# Nombre de tâches d'import terminées conservées pour /api/uploads
+UPLOAD_JOBS_KEPT = 100
+# Durée de conservation (s) d'un fichier importé hors dialogue qu'aucun lot n'a utilisé
+UPLOAD_KEEP_SECONDS = int(os.getenv("UPLOAD_KEEP_SECONDS", "3600"))
+
+# Mode batch (clips hors ligne) : connexions OpenAI réutilisées, nouvelles tentatives par
+# clip, délai maximal d'un clip (s), durée des messages append (ms) et fermeture des
+# connexions inactives (s)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "2"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "2"))
+BATCH_CLIP_TIMEOUT = float(os.getenv("BATCH_CLIP_TIMEOUT", "120"))
+BATCH_APPEND_MS = int(os.getenv("BATCH_APPEND_MS", "1000"))
+BATCH_IDLE_TIMEOUT = float(os.getenv("BATCH_IDLE_TIMEOUT", "60"))
+BATCH_DIR = os.path.join('static', 'batches')
+
+# Cache audio des réponses, par transcription normalisée et profil de session : taille en
+# mémoire et sur disque (Mo, 0 = mémoire seule) et durée maximale d'une réponse (s).
+# Désactivé par défaut : une réponse du cache ne tient pas compte du contexte de la conversation
+AUDIO_CACHE = os.getenv("AUDIO_CACHE", "0") == "1"
+AUDIO_CACHE_MAX_MB = int(os.getenv("AUDIO_CACHE_MAX_MB", "32"))
+AUDIO_CACHE_DISK_MB = int(os.getenv("AUDIO_CACHE_DISK_MB", "256"))
+AUDIO_CACHE_MAX_SECONDS = float(os.getenv("AUDIO_CACHE_MAX_SECONDS", "15"))
+AUDIO_CACHE_DIR = os.path.join('static', 'audio_cache')
+# Lecture d'une réponse du cache : trames de 100 ms, envoyées avec 300 ms d'avance sur le temps réel
+AUDIO_CACHE_FRAME_MS = 100
+AUDIO_CACHE_LEAD_MS = 300
+
+# Profilage (désactivé par défaut) : chronométrage d'un appel sur PROFILING_SAMPLE_EVERY dans les
+# chemins chauds, et trace d'une trame micro sur TRACE_SAMPLE_EVERY jusqu'au message envoyé à OpenAI (0 = aucune)
+PROFILING = os.getenv("PROFILING", "0") == "1"
+PROFILING_SAMPLE_EVERY = int(os.getenv("PROFILING_SAMPLE_EVERY", "100"))
+TRACE_SAMPLE_EVERY = int(os.getenv("TRACE_SAMPLE_EVERY", "0"))
+TRACES_KEPT = 200
+# Jeton des routes /api/admin/* (en-tête Authorization: Bearer ...) ; vide : routes désactivées
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Durée maximale (s) et période minimale (ms) d'une capture de piles par /api/admin/profile/stacks
+PROFILE_STACKS_MAX_SECONDS = 10
+PROFILE_STACKS_MIN_INTERVAL_MS = 5
+
+# Enregistrement WAV des réponses (décodage base64 uniquement si activé)
+RECORD_AUDIO = os.getenv("RECORD_AUDIO", "1") == "1"
+# Enregistrement de la piste micro dans un second fichier WAV
+RECORD_INPUT = os.getenv("RECORD_INPUT", "0") == "1"
+RECORDINGS_DIR = os.path.join('static', 'recordings')
+
+# Intervalle (s) de regroupement des émissions stats_update / new_events (0 = immédiat)
+STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "0.25"))
+
+# Port d'écoute du serveur web
+PORT = int(os.getenv("PORT", "5000"))
+
 # Variables d'authentification
 AUTH_USERNAME = os.getenv("MON_USERNAME")
 AUTH_PASSWORD = os.getenv("PASSWORD")
@@ -57,160 +211,789 @@ if not API_KEY:
     logger.error("OPENAI_API_KEY manquant dans .env")
     sys.exit(1)
 
+if REALTIME_TRANSPORT not in ('thread', 'asyncio'):
+    logger.error(f"REALTIME_TRANSPORT invalide: {REALTIME_TRANSPORT} (attendu: thread ou asyncio)")
+    sys.exit(1)
+
+if REALTIME_TRANSPORT == 'asyncio':
+    try:
+        from async_stream_handler import AsyncOpenAIStreamHandler
+    except ImportError as e:
+        logger.error(f"Transport asyncio indisponible: {e}")
+        sys.exit(1)
+
+if EGRESS_POLICY not in EgressQueue.POLICIES:
+    logger.error(f"EGRESS_POLICY invalide: {EGRESS_POLICY} (attendu: {', '.join(EgressQueue.POLICIES)})")
+    sys.exit(1)
+
+if EGRESS_POLICY == 'block' and REALTIME_TRANSPORT == 'asyncio':
+    # L'émission se ferait depuis la boucle asyncio partagée : l'attente bloquerait toutes les sessions
+    logger.error("EGRESS_POLICY=block incompatible avec REALTIME_TRANSPORT=asyncio")
+    sys.exit(1)
+
+try:
+    json_backend.use_backend(JSON_BACKEND)
+except (RuntimeError, ValueError) as e:
+    logger.error(f"JSON: {e}")
+    sys.exit(1)
+
 if not AUTH_USERNAME or not AUTH_PASSWORD:
     logger.warning("MON_USERNAME ou PASSWORD manquant dans .env - Authentification simplifiée activée")
     AUTH_USERNAME = None
     AUTH_PASSWORD = None
 
-# Stockage des sessions actives
-active_sessions = {}
+# Profils de session, sérialisés une fois puis envoyés tels quels à chaque connexion
+try:
+    profile_store = ProfileStore(SESSION_PROFILES, SessionProfile('default', INSTRUCTIONS, model=MODEL, voice=VOICE),
+                                 check_interval=SESSION_PROFILES_CHECK_INTERVAL)
+    profile_store.load()
+except ValueError as e:
+    logger.error(f"PROFILES: {e}")
+    sys.exit(1)
+
+# Propriété des sessions entre workers
+try:
+    session_registry = create_registry(SESSION_REGISTRY_URL, WORKER_ID, ttl=SESSION_REGISTRY_TTL)
+except (RuntimeError, ValueError) as e:
+    logger.error(f"REGISTRY: {e}")
+    sys.exit(1)
+
+def session_attached(session_id):
+    """Indique si un navigateur est connecté à la room Socket.IO de la session"""
+    try:
+        return any(True for _ in socketio.server.manager.get_participants('/', session_id))
+    except Exception:
+        return False
+
+# Stockage des sessions actives (sessions détenues par ce worker)
+active_sessions = SessionManager(
+    session_registry,
+    idle_timeout=SESSION_IDLE_TIMEOUT,
+    max_duration=SESSION_MAX_DURATION,
+    reap_interval=SESSION_REAP_INTERVAL,
+    is_attached=session_attached
+)
 session_events = {}
 
+# Tâche unique de vidage des émissions regroupées de toutes les sessions
+flush_scheduler = FlushScheduler(socketio.start_background_task, socketio.sleep, STATS_FLUSH_INTERVAL)
+# Échéances de latence maximale des trames micro regroupées
+aggregation_timer = DeadlineTimer()
+
+def create_stream_handler(event_callback, profile=None):
+    """Crée le transport temps réel configuré par REALTIME_TRANSPORT pour un profil de session"""
+    profile = profile or profile_store.get()
+    turn_detection = None if VAD_LOCAL_COMMIT else profile.turn_detection
+    handler_class = AsyncOpenAIStreamHandler if REALTIME_TRANSPORT == 'asyncio' else OpenAIStreamHandler
+    return handler_class(API_KEY, profile.model or MODEL, profile.instructions, event_callback,
+                         url=REALTIME_URL, turn_detection=turn_detection, profile=profile)
+
+def create_batch_handler(event_callback):
+    """Transport du mode batch : chaque clip est validé explicitement (pas de détection de tour)"""
+    profile = profile_store.get()
+    handler_class = AsyncOpenAIStreamHandler if REALTIME_TRANSPORT == 'asyncio' else OpenAIStreamHandler
+    return handler_class(API_KEY, profile.model or MODEL, profile.instructions, event_callback,
+                         url=REALTIME_URL, turn_detection=None, profile=profile)
+
+upstream_pool = None
+if WARM_POOL_SIZE > 0:
+    upstream_pool = WarmConnectionPool(
+        create_stream_handler, WARM_POOL_SIZE, ttl=WARM_POOL_TTL,
+        check_interval=WARM_POOL_CHECK_INTERVAL,
+        start_background_task=socketio.start_background_task
+    )
+
+# Client HTTP du chat texte, partagé par toutes les requêtes (keep-alive)
+chat_handler = GPTHandler(API_KEY, CHAT_MODEL, url=CHAT_URL, pool_size=CHAT_POOL_SIZE)
+# Arrêt des chats Socket.IO en cours, par identifiant de connexion
+chat_aborts = {}
+
+# Tâches d'import de fichiers audio (les plus récentes), et limite des tâches simultanées
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_MB * 1024 * 1024
+upload_jobs = collections.OrderedDict()
+upload_slots = threading.BoundedSemaphore(max(1, UPLOAD_WORKERS))
+# Fichiers importés conservés dans UPLOADS_DIR pour le mode batch : nom enregistré -> (session, horodatage)
+upload_owners = {}
+
+# Écritures sur disque (enregistrements, cache audio) hors de la boucle asyncio partagée par les sessions ;
+# un seul thread garde l'ordre des trames
+disk_executor = None
+if REALTIME_TRANSPORT == 'asyncio':
+    disk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='disk-io')
+
+# Cache audio des réponses répétées (salutations, messages d'erreur...)
+audio_cache = None
+if AUDIO_CACHE:
+    audio_cache = ResponseAudioCache(
+        AUDIO_CACHE_DIR if AUDIO_CACHE_DISK_MB > 0 else None,
+        max_bytes=AUDIO_CACHE_MAX_MB * 1024 * 1024,
+        disk_max_bytes=AUDIO_CACHE_DISK_MB * 1024 * 1024,
+        max_entry_bytes=int(AUDIO_CACHE_MAX_SECONDS * UPSTREAM_SAMPLE_RATE * 2),
+        sample_rate=UPSTREAM_SAMPLE_RATE, executor=disk_executor)
+
+# Chronomètres échantillonnés (PROFILING=1), traces des trames micro et capture de piles à la demande
+profiler = SpanProfiler(PROFILING_SAMPLE_EVERY) if PROFILING else None
+tracer = Tracer(TRACE_SAMPLE_EVERY, TRACES_KEPT)
+stack_capture_lock = threading.Lock()
+
+# Métriques agrégées sur toutes les sessions du worker (exposées sur /metrics)
+metrics_registry = MetricsRegistry()
+time_to_ready_hist = metrics_registry.histogram(
+    'voix_time_to_ready_seconds', 'Délai entre start_dialogue et session.updated')
+speech_to_audio_hist = metrics_registry.histogram(
+    'voix_speech_to_first_audio_seconds', 'Délai entre la fin de parole et le premier response.audio.delta')
+response_duration_hist = metrics_registry.histogram(
+    'voix_response_duration_seconds', 'Délai entre response.created et response.done')
+upstream_send_hist = metrics_registry.histogram(
+    'voix_upstream_send_seconds', "Durée d'un envoi audio vers OpenAI",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+ingest_chunk_hist = metrics_registry.histogram(
+    'voix_ingest_chunk_bytes', 'Taille des trames micro reçues du navigateur', buckets=SIZE_BUCKETS)
+egress_chunk_hist = metrics_registry.histogram(
+    'voix_egress_chunk_bytes', 'Taille des deltas audio relayés au navigateur', buckets=SIZE_BUCKETS)
+# Compteurs globaux alimentés par VoiceSession.update_stats
+stat_counters = {
+    'chunks_sent': metrics_registry.counter('voix_chunks_sent_total', 'Trames audio envoyées à OpenAI'),
+    'bytes_sent': metrics_registry.counter('voix_bytes_sent_total', 'Octets audio envoyés à OpenAI'),
+    'chunks_received': metrics_registry.counter('voix_chunks_received_total', 'Deltas audio reçus d\'OpenAI'),
+    'bytes_received': metrics_registry.counter('voix_bytes_received_total', 'Octets audio reçus d\'OpenAI'),
+    'chunks_dropped': metrics_registry.counter('voix_chunks_dropped_total', 'Trames micro refusées (contre-pression ou ordre)'),
+    'vad_chunks_dropped': metrics_registry.counter('voix_vad_chunks_dropped_total', 'Trames silencieuses écartées par le VAD local'),
+    'vad_commits': metrics_registry.counter('voix_vad_commits_total', 'Tours validés par le VAD local'),
+    'messages_count': metrics_registry.counter('voix_responses_total', 'Réponses complètes'),
+    'barge_ins': metrics_registry.counter('voix_barge_ins_total', 'Réponses interrompues par la reprise de parole'),
+    'barge_in_dropped_bytes': metrics_registry.counter(
+        'voix_barge_in_dropped_bytes_total', 'Octets audio de réponses interrompues non relayés au navigateur'),
+}
+reconnects_counter = metrics_registry.counter(
+    'voix_upstream_reconnects_total', 'Reprises de la connexion OpenAI par résultat')
+reconnect_gap_hist = metrics_registry.histogram(
+    'voix_upstream_gap_seconds', 'Durée des coupures OpenAI (fermeture → session.updated)',
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+chat_ttft_hist = metrics_registry.histogram(
+    'voix_chat_time_to_first_token_seconds', 'Délai entre la requête de chat et le premier token relayé')
+chat_requests = metrics_registry.counter('voix_chat_requests_total', 'Chats texte par issue')
+upload_jobs_counter = metrics_registry.counter('voix_upload_jobs_total', "Tâches d'import de fichiers audio par issue")
+upload_audio_seconds = metrics_registry.counter(
+    'voix_upload_audio_seconds_total', 'Secondes audio de fichiers importés envoyées à OpenAI')
+batch_clips_counter = metrics_registry.counter('voix_batch_clips_total', 'Clips du mode batch par issue')
+batch_clip_hist = metrics_registry.histogram(
+    'voix_batch_clip_seconds', "Durée de traitement d'un clip du mode batch (envoi → response.done)",
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120))
+audio_cache_saved_seconds = metrics_registry.counter(
+    'voix_audio_cache_saved_seconds_total', 'Latence économisée par les réponses servies depuis le cache audio')
+egress_dropped = metrics_registry.counter(
+    'voix_egress_frames_dropped_total', 'Trames audio non émises vers le navigateur par motif')
+# Octets audio échangés avec le navigateur, compressés et en équivalent PCM16
+browser_audio_bytes = metrics_registry.counter(
+    'voix_browser_audio_bytes_total', 'Octets audio échangés avec le navigateur par sens et codec')
+browser_audio_pcm_bytes = metrics_registry.counter(
+    'voix_browser_audio_pcm_bytes_total', 'Équivalent PCM16 des octets audio échangés avec le navigateur')
+
+def sum_over_sessions(func):
+    """Somme d'une grandeur sur les sessions locales, lue au moment du scrape"""
+    return lambda: sum(func(voice_session) for voice_session in active_sessions.values())
+
+metrics_registry.gauge('voix_sessions_live', 'Sessions détenues par ce worker', lambda: len(active_sessions))
+metrics_registry.gauge('voix_sessions_ready', 'Sessions prêtes pour l\'audio', sum_over_sessions(lambda s: s.is_ready))
+metrics_registry.counter_func('voix_sessions_closed_total', 'Sessions fermées par motif', lambda: [
+    ({'reason': 'stopped'}, active_sessions.stopped),
+    ({'reason': 'idle'}, active_sessions.reaped['idle']),
+    ({'reason': 'max_duration'}, active_sessions.reaped['max_duration']),
+])
+metrics_registry.gauge('voix_ingest_pending', 'Trames micro en attente d\'envoi',
+                       sum_over_sessions(lambda s: s.ingest_depth()))
+metrics_registry.gauge('voix_aggregator_buffered_bytes', 'Octets micro en attente de regroupement',
+                       sum_over_sessions(lambda s: s.aggregator.buffered_bytes if s.aggregator else 0))
+metrics_registry.gauge('voix_upstream_queue_depth', 'Messages en file vers OpenAI',
+                       sum_over_sessions(lambda s: s.stream.pending_sends()))
+metrics_registry.gauge('voix_egress_queue_depth', 'Trames audio en file vers le navigateur',
+                       sum_over_sessions(lambda s: s.egress.depth if s.egress else 0))
+metrics_registry.gauge('voix_emitter_pending_events', 'Événements en attente d\'émission vers le navigateur',
+                       sum_over_sessions(lambda s: s.emitter.pending))
+metrics_registry.gauge('voix_upload_jobs_running', "Tâches d'import de fichiers audio en cours",
+                       lambda: sum(job.state == 'running' for job in list(upload_jobs.values())))
+if audio_cache is not None:
+    metrics_registry.counter_func('voix_audio_cache_lookups_total', 'Recherches dans le cache audio des réponses', lambda: [
+        ({'result': 'hit'}, audio_cache.hits),
+        ({'result': 'miss'}, audio_cache.misses),
+    ])
+    metrics_registry.gauge('voix_audio_cache_hit_ratio', 'Part des recherches servies par le cache audio',
+                           lambda: audio_cache.hit_ratio)
+    metrics_registry.gauge('voix_audio_cache_bytes', 'Octets audio en cache', lambda: [
+        ({'tier': 'memory'}, audio_cache.stats()['bytes']),
+        ({'tier': 'disk'}, audio_cache.stats()['disk_bytes']),
+    ])
+if upstream_pool is not None:
+    metrics_registry.gauge('voix_pool_connections', 'Connexions pré-établies de la réserve', lambda: [
+        ({'state': state}, value) for state, value in upstream_pool.stats().items() if state in ('idle', 'ready')
+    ])
+    metrics_registry.counter_func('voix_pool_claims_total', 'Attributions depuis la réserve', lambda: [
+        ({'result': 'hit'}, upstream_pool.hits),
+        ({'result': 'miss'}, upstream_pool.misses),
+    ])
+
 class VoiceSession:
     """Classe pour gérer une session de dialogue vocal avec OpenAI"""
     
-    def __init__(self, session_id):
+    def __init__(self, session_id, input_rate=UPSTREAM_SAMPLE_RATE, output_rate=UPSTREAM_SAMPLE_RATE,
+                 encoding='pcm16', profile=None):
         self.session_id = session_id
-        self.ws = None
-        self.stream = OpenAIStreamHandler(API_KEY, MODEL, INSTRUCTIONS, self.handle_stream_event)
+        self.profile = profile or profile_store.get()
+        self.stream = create_stream_handler(self.handle_stream_event, self.profile)
         self.openai_session_id = None
         self.conversation_id = None
         self.is_connected = False
         self.is_ready = False
-        self.audio_log = []
-        self.events = []
+        self.started_at = time.monotonic()
+        self.last_activity = self.started_at
+        # Horodatages (monotonic) des latences mesurées pour /metrics
+        self.ready_pending_since = self.started_at
+        self.speech_stopped_at = None
+        self.response_started_at = None
+        # Réponse en cours et audio déjà relayé, pour l'interruption (barge-in)
+        self.response_id = None
+        self.response_item_id = None
+        self.response_audio_ms = 0.0
+        self.response_audio_started_at = None
+        self.discard_response_audio = False
+        # Cache audio : transcription et réponse du tour en cours (depuis input_audio_buffer.committed),
+        # réponse terminée en attente de sa transcription, et arrêt de la lecture d'une réponse du cache
+        self.turn_transcript = None
+        self.turn_audio_relayed = False
+        self.skip_next_response = False
+        self.reply_pcm = None
+        self.reply_text = None
+        self.reply_latency = None
+        self.finished_reply = None
+        self.cache_playback = None
+        # Reprise après coupure : historique rejoué et audio micro en attente (gap_buffer non nul pendant la coupure)
+        self.history = ConversationHistory(RECONNECT_REPLAY_ITEMS)
+        self.gap_buffer = None
+        self.gap_started_at = None
+        self.reconnect_attempt = 0
+        self.reconnect_running = False
+        self.recorder = None
+        if RECORD_AUDIO:
+            self.recorder = SessionRecorder(
+                RECORDINGS_DIR,
+                f"dialogue_{session_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                record_input=RECORD_INPUT,
+                executor=disk_executor
+            )
+        self.events = EventJournal(EVENT_JOURNAL_SIZE)
         self.stats = {
             'start_time': time.time(),
             'chunks_sent': 0,
             'chunks_received': 0,
             'bytes_sent': 0,
             'bytes_received': 0,
-            'messages_count': 0
+            'messages_count': 0,
+            'chunks_dropped': 0,
+            'vad_chunks_dropped': 0,
+            'vad_bytes_dropped': 0,
+            'vad_commits': 0,
+            'wire_bytes_in': 0,
+            'wire_pcm_bytes_in': 0,
+            'wire_bytes_out': 0,
+            'wire_pcm_bytes_out': 0,
+            'barge_ins': 0,
+            'barge_in_dropped_bytes': 0,
+            'reconnects': 0,
+            'reconnect_gap_ms': 0,
+            'gap_frames_buffered': 0,
+            'gap_frames_dropped': 0,
+            'cache_hits': 0
         }
+        self.aggregator = None
+        if AUDIO_AGGREGATION:
+            self.aggregator = FrameAggregator(min_ms=AUDIO_FRAME_MIN_MS, max_ms=AUDIO_FRAME_MAX_MS,
+                                              max_latency_ms=AUDIO_MAX_LATENCY_MS)
+        self.aggregation_deadline = None
+        self.vad = None
+        if VAD_ENABLED:
+            self.vad = EnergyVAD(threshold=VAD_THRESHOLD, zcr_max=VAD_ZCR_MAX,
+                                 hangover_ms=VAD_HANGOVER_MS, keep_every=VAD_KEEP_EVERY)
         self.stop_event = threading.Event()
+        self.emitter = BatchingEmitter(socketio.emit, session_id, self.stats_snapshot, STATS_FLUSH_INTERVAL,
+                                       event_formatter=self.events.format)
+        # Audio vers le navigateur : file bornée vidée par une tâche dédiée,
+        # pour qu'un client lent ne bloque pas la réception depuis OpenAI
+        self.egress = None
+        if EGRESS_QUEUE_SIZE > 0:
+            self.egress = EgressQueue(socketio.emit, session_id, maxlen=EGRESS_QUEUE_SIZE, policy=EGRESS_POLICY,
+                                      max_age=EGRESS_MAX_AGE_MS / 1000, merge=self._merge_audio,
+                                      on_drop=lambda reason: egress_dropped.inc(labels={'reason': reason}))
+        # Ordre et contre-pression de l'ingestion audio (événement Socket.IO audio_in)
+        self.ingest_lock = threading.Lock()
+        self.ingest_slots = threading.BoundedSemaphore(AUDIO_IN_MAX_PENDING)
+        # Trames ayant obtenu une place, pour la jauge voix_ingest_pending
+        self.ingest_pending = 0
+        self.ingest_pending_lock = threading.Lock()
+        self.ingest_seq = -1
+        # Trace de la trame micro échantillonnée en attente d'envoi à OpenAI
+        self.pending_trace = None
+        # Formats audio négociés avec le navigateur (OpenAI reste en PCM16 24 kHz)
+        self.input_rate = UPSTREAM_SAMPLE_RATE
+        self.output_rate = UPSTREAM_SAMPLE_RATE
+        self.input_resampler = None
+        self.output_resampler = None
+        # Codecs du lien navigateur (None : PCM16 brut)
+        self.encoding = 'pcm16'
+        self.input_codec = None
+        self.output_codec = None
+        self.set_audio_format(input_rate, output_rate, encoding)
+        # Tâches de fond lancées en dernier : un format refusé ne laisse rien derrière lui
+        flush_scheduler.register(self.emitter)
+        if self.egress is not None:
+            socketio.start_background_task(self.egress.run)
         
+    def set_audio_format(self, input_rate=None, output_rate=None, encoding=None):
+        """Change les fréquences d'échantillonnage et l'encodage du navigateur (micro et lecture)
+
+        Lève ValueError si l'encodage n'est pas utilisable à ces fréquences.
+        """
+        with self.ingest_lock:
+            if encoding or input_rate or output_rate:
+                encoding = encoding or self.encoding
+                input_codec = output_codec = None
+                if encoding != 'pcm16':
+                    input_codec = create_codec(encoding, input_rate or self.input_rate)
+                    output_codec = create_codec(encoding, output_rate or self.output_rate)
+                self.encoding = encoding
+                self.input_codec = input_codec
+                self.output_codec = output_codec
+            if input_rate and input_rate != self.input_rate:
+                self.input_rate = input_rate
+                self.input_resampler = None
+                if input_rate != UPSTREAM_SAMPLE_RATE:
+                    self.input_resampler = StreamingResampler(input_rate, UPSTREAM_SAMPLE_RATE)
+            if output_rate and output_rate != self.output_rate:
+                self.output_rate = output_rate
+                self.output_resampler = None
+                if output_rate != UPSTREAM_SAMPLE_RATE:
+                    self.output_resampler = StreamingResampler(UPSTREAM_SAMPLE_RATE, output_rate)
+        return self.audio_format()
+
+    def audio_format(self):
+        return {'encoding': self.encoding, 'input_rate': self.input_rate, 'output_rate': self.output_rate}
+
     def add_event(self, event_type, data, level='info'):
-        """Ajoute un événement au journal"""
-        event = {
-            'timestamp': datetime.now().strftime('%H:%M:%S.%f')[:-3],
-            'type': event_type,
-            'level': level,
-            'data': data
-        }
-        self.events.append(event)
-        
-        # Garder seulement les 100 derniers événements
-        if len(self.events) > 100:
-            self.events = self.events[-100:]
+        """Ajoute un événement au journal circulaire"""
+        event = self.events.append(event_type, level, data)
         
-        # Émettre l'événement via WebSocket
-        socketio.emit('new_event', event, room=self.session_id)
+        # Émission regroupée via WebSocket (immédiate pour les erreurs)
+        self.emitter.queue_event(event)
+        if level == 'error':
+            self.emitter.flush()
         
     def update_stats(self, stat_type, value):
-        """Met à jour les statistiques"""
+        """Met à jour les statistiques (émission regroupée)"""
         if stat_type in self.stats:
             if stat_type.endswith('_count'):
-                self.stats[stat_type] += 1
-            else:
-                self.stats[stat_type] += value
+                value = 1
+            self.stats[stat_type] += value
+            counter = stat_counters.get(stat_type)
+            if counter is not None:
+                counter.inc(value)
         
-        # Émettre les stats mises à jour
+        self.emitter.stats_changed()
+
+    def stats_snapshot(self):
+        """Copie des statistiques avec la durée de session"""
         stats_with_duration = self.stats.copy()
         stats_with_duration['duration'] = time.time() - self.stats['start_time']
-        socketio.emit('stats_update', stats_with_duration, room=self.session_id)
+        if self.aggregator is not None:
+            stats_with_duration['aggregation'] = self.aggregator.stats()
+        if self.egress is not None:
+            stats_with_duration['egress'] = self.egress.stats()
+        stats_with_duration['codec'] = {
+            'encoding': self.encoding,
+            'savings_in': wire_savings(self.stats['wire_bytes_in'], self.stats['wire_pcm_bytes_in']),
+            'savings_out': wire_savings(self.stats['wire_bytes_out'], self.stats['wire_pcm_bytes_out']),
+        }
+        return stats_with_duration
+
+    def count_wire(self, direction, wire_bytes, pcm_bytes):
+        """Compte les octets échangés avec le navigateur et leur équivalent PCM16"""
+        self.update_stats(f'wire_bytes_{direction}', wire_bytes)
+        self.update_stats(f'wire_pcm_bytes_{direction}', pcm_bytes)
+        labels = {'direction': direction, 'codec': self.encoding}
+        browser_audio_bytes.inc(wire_bytes, labels)
+        browser_audio_pcm_bytes.inc(pcm_bytes, labels)
 
     def handle_stream_event(self, event, data):
-        if event == 'open':
-            self.is_connected = True
+        """Point d'entrée unique des événements du transport temps réel"""
+        if event == 'message':
+            # Message déjà décodé par le transport : aucun nouveau passage JSON
+            self.dispatch_message(data)
+        elif event == 'open':
+            self.on_open(None)
         elif event == 'close':
-            self.is_connected = False
-            self.is_ready = False
-            socketio.emit('session_disconnected', {}, room=self.session_id)
+            self.on_close(None, data, None)
         elif event == 'error':
-            self.add_event('error', data, 'error')
-        elif event == 'message':
-            self.on_message(None, json.dumps(data))
+            self.on_error(None, data)
 
     def on_open(self, ws):
-        """Callback d'ouverture WebSocket OpenAI"""
+        """Callback d'ouverture WebSocket OpenAI (la configuration est envoyée par le transport)"""
         self.is_connected = True
         self.add_event('websocket', 'Connexion WebSocket ouverte avec OpenAI')
-        
-        # Configuration de la session
-        config = {
-            "type": "session.update",
-            "session": {
-                "modalities": ["text", "audio"],
-                "voice": "alloy",
-                "instructions": INSTRUCTIONS,
-                "turn_detection": {"type": "server_vad", "threshold": 0.5},
-                "input_audio_format": "pcm16",
-                "output_audio_format": "pcm16",
-                "input_audio_transcription": {"model": "whisper-1"}
-            }
-        }
-        
-        ws.send(json.dumps(config))
-        self.add_event('config', 'Configuration de session envoyée')
 
     def on_message(self, ws, message):
-        """Callback de réception de message OpenAI"""
+        """Callback de réception d'un message OpenAI encore sérialisé"""
         try:
-            data = json.loads(message)
-            msg_type = data.get("type", "unknown")
-            
-            if msg_type == "session.created":
-                self.openai_session_id = data.get("session", {}).get("id")
-                self.add_event('session', f'Session OpenAI créée: {self.openai_session_id}')
-                
-            elif msg_type == "session.updated":
-                self.is_ready = True
-                self.add_event('session', 'Session prête pour l\'audio')
-                socketio.emit('session_ready', {'ready': True}, room=self.session_id)
-                
-            elif msg_type == "conversation.created":
-                self.conversation_id = data.get("conversation", {}).get("id")
-                self.add_event('conversation', f'Nouvelle conversation: {self.conversation_id}')
-                
-            elif msg_type == "input_audio_buffer.speech_started":
-                self.add_event('speech', 'Début de parole détecté', 'success')
-                socketio.emit('speech_status', {'speaking': True}, room=self.session_id)
-                
-            elif msg_type == "input_audio_buffer.speech_stopped":
-                self.add_event('speech', 'Fin de parole détecté', 'success')
-                socketio.emit('speech_status', {'speaking': False}, room=self.session_id)
-                
-            elif msg_type == "conversation.item.input_audio_transcription.completed":
-                transcript = data.get("transcript", "")
-                self.add_event('transcript', f'Vous: "{transcript}"', 'primary')
-                
-            elif msg_type == "response.created":
-                response_id = data.get("response", {}).get("id")
-                self.add_event('response', f'Génération de réponse: {response_id}')
-                
-            elif msg_type == "response.audio.delta":
-                audio_bytes = base64.b64decode(data["delta"])
-                self.audio_log.append(audio_bytes)
-                self.update_stats('chunks_received', 1)
-                self.update_stats('bytes_received', len(audio_bytes))
-                
-                # Envoyer l'audio au navigateur client
-                audio_b64 = base64.b64encode(audio_bytes).decode()
-                socketio.emit('audio_output', {'audio': audio_b64}, room=self.session_id)
-                
-            elif msg_type == "response.audio.done":
-                self.add_event('audio', 'Audio de réponse terminé', 'success')
-                
-            elif msg_type == "response.done":
-                self.add_event('response', 'Réponse complète', 'success')
-                self.update_stats('messages_count', 1)
-                
-            elif msg_type == "error":
-                error_msg = data.get("error", {})
-                self.add_event('error', f'Erreur OpenAI: {error_msg}', 'error')
-                
+            data = json_backend.loads(message)
         except Exception as e:
             self.add_event('error', f'Erreur traitement message: {str(e)}', 'error')
+            return
+        self.dispatch_message(data)
+
+    def dispatch_message(self, data):
+        """Aiguille un message OpenAI décodé vers son gestionnaire (table MESSAGE_HANDLERS)"""
+        self.last_activity = time.monotonic()
+        handler = self.MESSAGE_HANDLERS.get(data.get("type"))
+        if handler is None:
+            return
+        try:
+            handler(self, data)
+        except Exception as e:
+            self.add_event('error', f'Erreur traitement message: {str(e)}', 'error')
+
+    def _on_audio_delta(self, data):
+        # En PCM16, le base64 d'OpenAI est relayé tel quel au navigateur,
+        # il n'est décodé que pour l'enregistrement, le rééchantillonnage ou l'encodage
+        delta = data["delta"]
+        if self.discard_response_audio:
+            # Réponse interrompue : le reste de l'audio n'est plus relayé
+            self.update_stats('barge_in_dropped_bytes', b64_payload_size(delta))
+            return
+        if self.speech_stopped_at is not None:
+            self.reply_latency = time.monotonic() - self.speech_stopped_at
+            speech_to_audio_hist.observe(self.reply_latency)
+            self.speech_stopped_at = None
+        self.turn_audio_relayed = True
+        upstream_size = b64_payload_size(delta)
+        self.update_stats('chunks_received', 1)
+        self.update_stats('bytes_received', upstream_size)
+        if self.response_audio_started_at is None:
+            self.response_audio_started_at = time.monotonic()
+        self.response_audio_ms += upstream_size * 1000 / (UPSTREAM_SAMPLE_RATE * 2)
+        self.response_item_id = data.get("item_id", self.response_item_id)
+
+        if self.reply_pcm is not None:
+            pcm = base64.b64decode(delta)
+            if len(self.reply_pcm) + len(pcm) <= audio_cache.max_entry_bytes:
+                self.reply_pcm += pcm
+            else:
+                # Réponse trop longue pour le cache
+                self.reply_pcm = None
+            self.emit_pcm(pcm)
+            return
+        if self.recorder or self.output_resampler is not None or self.output_codec is not None:
+            self.emit_pcm(base64.b64decode(delta))
+            return
+        pcm_size = b64_payload_size(delta)
+        egress_chunk_hist.observe(pcm_size)
+        self.count_wire('out', pcm_size, pcm_size)
+
+        # Envoyer l'audio au navigateur client
+        self.emit_audio({'audio': delta})
+
+    def emit_pcm(self, pcm):
+        """Relaye du PCM16 24 kHz au navigateur, rééchantillonné et encodé selon le format de session"""
+        if self.recorder:
+            self.recorder.write_output(pcm)
+        output_resampler = self.output_resampler
+        output_codec = self.output_codec
+        if output_resampler is not None:
+            pcm = output_resampler.process(pcm)
+        if output_codec is not None:
+            # Audio compressé envoyé en binaire Socket.IO
+            audio = output_codec.encode(pcm)
+            egress_chunk_hist.observe(len(audio))
+            self.count_wire('out', len(audio), len(pcm))
+            self.emit_audio({'audio': audio, 'encoding': self.encoding})
+            return
+        egress_chunk_hist.observe(len(pcm))
+        self.count_wire('out', len(pcm), len(pcm))
+        self.emit_audio({'audio': base64.b64encode(pcm).decode()})
+
+    def emit_audio(self, payload):
+        """Émet un delta audio vers le navigateur, via la file d'émission si elle est active"""
+        if self.egress is None:
+            socketio.emit('audio_output', payload, room=self.session_id)
+        else:
+            self.egress.put('audio_output', payload)
+
+    def _merge_audio(self, first, second):
+        """Fusionne deux deltas en attente (politique coalesce), None si impossible"""
+        if first.get('encoding') != second.get('encoding') or first.get('encoding') in ('adpcm', 'opus'):
+            # Blocs ADPCM et paquets Opus ne se concatènent pas
+            return None
+        if isinstance(first['audio'], str):
+            if first['audio'].endswith('='):
+                audio = base64.b64encode(base64.b64decode(first['audio']) + base64.b64decode(second['audio'])).decode()
+            else:
+                # Sans remplissage, deux chaînes base64 se concatènent telles quelles
+                audio = first['audio'] + second['audio']
+        else:
+            audio = first['audio'] + second['audio']
+        return dict(first, audio=audio)
+
+    def _on_session_created(self, data):
+        self.openai_session_id = data.get("session", {}).get("id")
+        self.add_event('session', f'Session OpenAI créée: {self.openai_session_id}')
+
+    def _on_session_updated(self, data):
+        if self.ready_pending_since is not None:
+            time_to_ready_hist.observe(time.monotonic() - self.ready_pending_since)
+            self.ready_pending_since = None
+        self.is_ready = True
+        if self.gap_buffer is not None:
+            self._resume_after_gap()
+        self.add_event('session', 'Session prête pour l\'audio')
+        socketio.emit('session_ready', {'ready': True}, room=self.session_id)
+        self.emitter.flush()
+
+    def _on_conversation_created(self, data):
+        self.conversation_id = data.get("conversation", {}).get("id")
+        self.add_event('conversation', f'Nouvelle conversation: {self.conversation_id}')
+
+    def _on_speech_started(self, data):
+        if BARGE_IN:
+            self.interrupt_response()
+            self.stop_cached_reply()
+        self.add_event('speech', 'Début de parole détecté', 'success')
+        socketio.emit('speech_status', {'speaking': True}, room=self.session_id)
+        self.emitter.flush()
+
+    def _on_speech_stopped(self, data):
+        self.speech_stopped_at = time.monotonic()
+        self.add_event('speech', 'Fin de parole détecté', 'success')
+        socketio.emit('speech_status', {'speaking': False}, room=self.session_id)
+        self.emitter.flush()
+
+    def _on_audio_committed(self, data):
+        # Nouveau tour utilisateur pour le cache audio
+        self.turn_transcript = None
+        self.turn_audio_relayed = False
+        self.skip_next_response = False
+        self.finished_reply = None
+
+    def _on_transcription_completed(self, data):
+        transcript = data.get("transcript", "")
+        self.history.set_text(data.get("item_id"), transcript, 'user')
+        self.add_event('transcript', f'Vous: "{transcript}"', 'primary')
+        if audio_cache is None or not transcript:
+            return
+        self.turn_transcript = transcript
+        if not self.turn_audio_relayed and self.finished_reply is None:
+            # Rien n'a encore été joué pour ce tour : une réponse en cache remplace celle du modèle
+            entry = audio_cache.get(self.profile.fingerprint, transcript)
+            if entry is not None:
+                self.serve_cached_reply(entry)
+                return
+        self._store_finished_reply()
+
+    def _on_audio_transcript_done(self, data):
+        self.history.set_text(data.get("item_id"), data.get("transcript", ""), 'assistant')
+        if self.reply_pcm is not None:
+            self.reply_text = data.get("transcript")
+
+    def _on_item_created(self, data):
+        item = data.get("item", {})
+        self.history.add(item.get("id"), item.get("role"))
+
+    def _on_response_created(self, data):
+        response_id = data.get("response", {}).get("id")
+        self.response_started_at = time.monotonic()
+        self.response_id = response_id
+        self.response_item_id = None
+        self.response_audio_ms = 0.0
+        self.response_audio_started_at = None
+        self.discard_response_audio = False
+        self.reply_pcm = None
+        if self.skip_next_response:
+            # Tour déjà servi depuis le cache audio
+            self.skip_next_response = False
+            self.discard_response_audio = True
+            self.stream.cancel_response()
+        elif audio_cache is not None and self.finished_reply is None:
+            self.reply_pcm = bytearray()
+            self.reply_text = None
+        self.add_event('response', f'Génération de réponse: {response_id}')
+
+    def _on_audio_done(self, data):
+        self.add_event('audio', 'Audio de réponse terminé', 'success')
+
+    def _on_response_done(self, data):
+        if self.response_started_at is not None:
+            response_duration_hist.observe(time.monotonic() - self.response_started_at)
+            self.response_started_at = None
+        self.response_id = None
+        reply_pcm, self.reply_pcm = self.reply_pcm, None
+        if self.discard_response_audio:
+            self.add_event('response', 'Réponse annulée', 'info')
+            self.emitter.flush()
+            return
+        self.add_event('response', 'Réponse complète', 'success')
+        self.update_stats('messages_count', 1)
+        self.emitter.flush()
+        status = data.get("response", {}).get("status", "completed")
+        if reply_pcm and self.reply_text and status == 'completed':
+            # Mise en cache dès que la transcription du tour est connue
+            self.finished_reply = (self.reply_text, reply_pcm, self.reply_latency)
+            self._store_finished_reply()
+
+    def _store_finished_reply(self):
+        if self.finished_reply is None or not self.turn_transcript:
+            return
+        text, pcm, latency = self.finished_reply
+        self.finished_reply = None
+        audio_cache.put(self.profile.fingerprint, self.turn_transcript, text, pcm, latency)
+
+    def serve_cached_reply(self, entry):
+        """Joue une réponse du cache audio à la place de celle du modèle
+
+        La réponse du modèle est annulée (dès sa création si elle n'existe pas
+        encore) et le texte de la réponse du cache est ajouté à la
+        conversation, pour que le modèle garde le contexte du dialogue.
+        """
+        self.reply_pcm = None
+        if self.response_id is None:
+            self.skip_next_response = True
+        elif not self.discard_response_audio:
+            self.discard_response_audio = True
+            self.stream.cancel_response()
+        if self.stream.connected.is_set():
+            item_id = f"cache_{uuid.uuid4().hex[:24]}"
+            self.stream.send({
+                "type": "conversation.item.create",
+                "item": {"id": item_id, "type": "message", "role": "assistant",
+                         "content": [{"type": "text", "text": entry.text}]},
+            })
+            self.history.set_text(item_id, entry.text, 'assistant')
+        self.stop_cached_reply()
+        playback = {'stop': threading.Event(), 'started_at': None, 'sent_ms': 0.0}
+        self.cache_playback = playback
+        self.update_stats('cache_hits', 1)
+        duration = entry.size / (UPSTREAM_SAMPLE_RATE * 2)
+        self.add_event('response', f'Réponse servie depuis le cache ({duration:.1f} s)', 'success')
+        socketio.start_background_task(self._play_cached_reply, entry, playback)
+
+    def _play_cached_reply(self, entry, playback):
+        """Tâche de lecture d'une réponse du cache, en trames audio_output au rythme du temps réel"""
+        frame_bytes = UPSTREAM_SAMPLE_RATE * 2 * AUDIO_CACHE_FRAME_MS // 1000
+        started = playback['started_at'] = time.monotonic()
+        if self.speech_stopped_at is not None:
+            latency = started - self.speech_stopped_at
+            speech_to_audio_hist.observe(latency)
+            self.speech_stopped_at = None
+            if entry.first_audio_latency is not None and entry.first_audio_latency > latency:
+                saved = entry.first_audio_latency - latency
+                audio_cache.record_saving(saved)
+                audio_cache_saved_seconds.inc(saved)
+        for offset in range(0, entry.size, frame_bytes):
+            ahead = offset * 1000 / (UPSTREAM_SAMPLE_RATE * 2) - AUDIO_CACHE_LEAD_MS
+            ahead = ahead / 1000 - (time.monotonic() - started)
+            if ahead > 0:
+                socketio.sleep(ahead)
+            if playback['stop'].is_set() or self.stop_event.is_set():
+                return
+            frame = entry.pcm[offset:offset + frame_bytes]
+            playback['sent_ms'] += len(frame) * 1000 / (UPSTREAM_SAMPLE_RATE * 2)
+            self.emit_pcm(frame)
+        if self.cache_playback is playback:
+            self.cache_playback = None
+        self.add_event('response', 'Réponse du cache jouée', 'success')
+        self.update_stats('messages_count', 1)
+        self.emitter.flush()
+
+    def stop_cached_reply(self):
+        """Arrête la lecture d'une réponse du cache et vide le lecteur du navigateur"""
+        playback, self.cache_playback = self.cache_playback, None
+        if playback is None:
+            return False
+        playback['stop'].set()
+        played_ms = 0.0
+        if playback['started_at'] is not None:
+            played_ms = min(playback['sent_ms'], (time.monotonic() - playback['started_at']) * 1000)
+        self.flush_browser_audio({'response_id': None, 'played_ms': int(played_ms)})
+        self.add_event('response', f'Réponse du cache interrompue après {played_ms:.0f} ms jouées', 'info')
+        return True
+
+    def flush_browser_audio(self, flush):
+        """Vide le lecteur du navigateur (événement audio_flush)"""
+        if self.egress is None:
+            socketio.emit('audio_flush', flush, room=self.session_id)
+        else:
+            # L'audio encore en file est abandonné, la notification passe après l'audio en cours d'émission
+            self.egress.clear('audio_flush', flush)
+
+    def played_audio_ms(self):
+        """Estime la durée de réponse déjà jouée par le navigateur
+
+        La lecture démarre au premier delta et suit le temps réel, sans
+        dépasser l'audio effectivement relayé.
+        """
+        if self.response_audio_started_at is None:
+            return 0.0
+        elapsed_ms = (time.monotonic() - self.response_audio_started_at) * 1000
+        return min(self.response_audio_ms, elapsed_ms)
+
+    def interrupt_response(self):
+        """Annule la réponse en cours lorsque l'utilisateur reprend la parole
+
+        La réponse est annulée chez OpenAI, l'élément audio est tronqué à ce
+        qui a été entendu, l'audio restant est écarté et le navigateur vide
+        son lecteur (événement audio_flush). L'audio arrivant plus vite que
+        le temps réel, une réponse terminée (response.done) peut encore être
+        en lecture : elle est alors seulement tronquée, sans response.cancel.
+        """
+        if self.discard_response_audio:
+            return False
+        played_ms = self.played_audio_ms()
+        if self.response_id is None and played_ms >= self.response_audio_ms:
+            # Aucune réponse en cours ni en lecture
+            return False
+        self.discard_response_audio = True
+        if self.response_id is not None:
+            truncate_ms = played_ms if self.response_item_id is not None else None
+            self.stream.cancel_response(self.response_item_id, truncate_ms)
+        elif self.response_item_id is not None:
+            self.stream.truncate_item(self.response_item_id, played_ms)
+        self.flush_browser_audio({'response_id': self.response_id, 'played_ms': int(played_ms)})
+        self.update_stats('barge_ins', 1)
+        self.add_event('response', f'Réponse interrompue après {played_ms:.0f} ms jouées', 'info')
+        return True
+
+    def _on_openai_error(self, data):
+        error_msg = data.get("error", {})
+        trace = tracer.get(error_msg.get("event_id")) if isinstance(error_msg, dict) else None
+        if trace is not None:
+            # Erreur sur une trame tracée : rattachée à son numéro de séquence navigateur
+            self.add_event('error', f'Erreur OpenAI (trame {trace.seq}, {trace.id}): {error_msg}', 'error')
+            return
+        self.add_event('error', f'Erreur OpenAI: {error_msg}', 'error')
+
+    # Gestionnaires par type de message OpenAI (les types absents sont ignorés)
+    MESSAGE_HANDLERS = {
+        "response.audio.delta": _on_audio_delta,
+        "session.created": _on_session_created,
+        "session.updated": _on_session_updated,
+        "conversation.created": _on_conversation_created,
+        "input_audio_buffer.speech_started": _on_speech_started,
+        "input_audio_buffer.speech_stopped": _on_speech_stopped,
+        "input_audio_buffer.committed": _on_audio_committed,
+        "conversation.item.input_audio_transcription.completed": _on_transcription_completed,
+        "conversation.item.created": _on_item_created,
+        "response.output_item.added": _on_item_created,
+        "response.audio_transcript.done": _on_audio_transcript_done,
+        "response.created": _on_response_created,
+        "response.audio.done": _on_audio_done,
+        "response.done": _on_response_done,
+        "error": _on_openai_error,
+    }
 
     def on_error(self, ws, error):
         """Callback d'erreur WebSocket"""
@@ -221,32 +1004,359 @@ class VoiceSession:
         self.is_connected = False
         self.is_ready = False
         self.add_event('websocket', f'Connexion fermée (code: {close_status_code})')
-        socketio.emit('session_disconnected', {}, room=self.session_id)
+        if self.stop_event.is_set() or RECONNECT_MAX_ATTEMPTS <= 0:
+            socketio.emit('session_disconnected', {}, room=self.session_id)
+            return
+        self.begin_reconnect()
+
+    def begin_reconnect(self):
+        """Ouvre une coupure : l'audio micro est mis en attente et la reconnexion planifiée"""
+        with self.ingest_lock:
+            if self.gap_buffer is None:
+                self.gap_started_at = time.monotonic()
+                # PCM16 décodé à la fréquence du micro (voir _buffer_during_gap)
+                self.gap_buffer = GapBuffer(self.input_rate * 2 * RECONNECT_BUFFER_MS // 1000)
+            if self.reconnect_running:
+                return
+            self.reconnect_running = True
+        # La réponse en cours est perdue avec la connexion (et son élément avec la conversation)
+        self.response_id = None
+        self.response_item_id = None
+        self.discard_response_audio = False
+        socketio.emit('session_reconnecting', {'attempt': self.reconnect_attempt + 1}, room=self.session_id)
+        socketio.start_background_task(self._reconnect)
+
+    def _reconnect(self):
+        """Tâche de reconnexion : backoff exponentiel avec gigue puis nouvelle connexion
+
+        La reprise elle-même (historique et audio en attente) a lieu à la
+        réception de session.updated sur la nouvelle connexion.
+        """
+        while self.reconnect_attempt < RECONNECT_MAX_ATTEMPTS:
+            delay = backoff_delay(self.reconnect_attempt, RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY)
+            self.reconnect_attempt += 1
+            self.add_event('websocket', f'Reconnexion {self.reconnect_attempt}/{RECONNECT_MAX_ATTEMPTS} '
+                                        f'dans {delay:.1f} s')
+            if self.stop_event.wait(delay):
+                self.reconnect_running = False
+                return
+            self.stream = create_stream_handler(self.handle_stream_event, self.profile)
+            if self.start_connection():
+                if self.stop_event.is_set():
+                    # Session arrêtée pendant la connexion
+                    self.stream.close()
+                with self.ingest_lock:
+                    # Une fermeture survenue avant ce point n'a pas relancé de tâche
+                    if self.stream.connected.is_set() or self.stop_event.is_set():
+                        self.reconnect_running = False
+                        return
+
+        with self.ingest_lock:
+            self.reconnect_running = False
+            self.gap_buffer = None
+            self.gap_started_at = None
+            self.reconnect_attempt = 0
+        reconnects_counter.inc(labels={'result': 'failure'})
+        self.add_event('error', 'Reconnexion à OpenAI impossible', 'error')
+        socketio.emit('session_disconnected', {'reason': 'upstream'}, room=self.session_id)
+
+    def _resume_after_gap(self):
+        """Rejoue l'historique puis l'audio reçu pendant la coupure sur la nouvelle connexion"""
+        replayed = self.history.replay_events()
+        for event in replayed:
+            self.stream.send(event)
+
+        with self.ingest_lock:
+            gap = time.monotonic() - self.gap_started_at
+            frames = self.gap_buffer.drain()
+            self.gap_buffer = None
+            self.gap_started_at = None
+            self.reconnect_attempt = 0
+            for pcm, _ in frames:
+                self._ingest_pcm(pcm)
+
+        reconnects_counter.inc(labels={'result': 'success'})
+        reconnect_gap_hist.observe(gap)
+        self.update_stats('reconnects', 1)
+        self.update_stats('reconnect_gap_ms', int(gap * 1000))
+        self.add_event('websocket', f'Connexion OpenAI reprise après {gap:.1f} s '
+                                    f'({len(replayed)} éléments rejoués, {len(frames)} trames en attente)', 'success')
+        socketio.emit('session_resumed', {'gap_ms': int(gap * 1000), 'replayed_items': len(replayed),
+                                          'buffered_frames': len(frames)}, room=self.session_id)
 
     def send_audio(self, audio_data):
-        """Envoie de l'audio reçu du navigateur vers OpenAI"""
-        if not self.is_ready:
+        """Envoie de l'audio reçu du navigateur (base64) vers OpenAI
+
+        Sans étage de traitement actif, le base64 est transmis tel quel,
+        sans décodage ni ré-encodage.
+        """
+        if not self.is_ready and self.gap_buffer is None:
             return False
 
-        try:
-            audio_bytes = base64.b64decode(audio_data)
-            if self.stream.send_audio(audio_bytes):
-                self.update_stats('chunks_sent', 1)
-                self.update_stats('bytes_sent', len(audio_bytes))
-                return True
+        if not isinstance(audio_data, str) or len(audio_data) % 4:
+            self.add_event('error', 'Erreur envoi audio: base64 invalide', 'error')
             return False
 
+        if self.needs_pcm():
+            try:
+                audio_bytes = base64.b64decode(audio_data)
+            except Exception as e:
+                self.add_event('error', f'Erreur décodage audio: {str(e)}', 'error')
+                return False
+            return self.send_audio_bytes(audio_bytes)
+
+        return self._forward_audio(audio_b64=audio_data)
+
+    def send_audio_bytes(self, audio_bytes, seq=None):
+        """Envoie des trames PCM16 brutes vers OpenAI en conservant leur ordre
+
+        Les trames portant un numéro de séquence déjà dépassé sont ignorées
+        et, au-delà de AUDIO_IN_MAX_PENDING trames en attente, les nouvelles
+        trames sont refusées pour que le navigateur ralentisse. Pendant une
+        coupure d'OpenAI, les trames sont mises en attente jusqu'à la reprise.
+        """
+        if not self.is_ready and self.gap_buffer is None:
+            return False
+
+        return self._forward_audio(pcm=audio_bytes, seq=seq)
+
+    def send_file_audio(self, pcm):
+        """Envoie un bloc PCM16 24 kHz d'un fichier importé par le chemin du micro
+
+        Le bloc est déjà rééchantillonné : il ne passe ni par le codec ni par le
+        rééchantillonneur du navigateur, mais par le VAD, le regroupement et les
+        compteurs. Il est refusé pendant une coupure d'OpenAI ou quand la file
+        est pleine, et la tâche d'import réessaie.
+        """
+        if not self.is_ready or self.gap_buffer is not None:
+            return False
+
+        return self._forward_audio(pcm=pcm, upstream_rate=True)
+
+    def needs_pcm(self):
+        """Indique si un étage d'ingestion doit travailler sur le PCM décodé"""
+        return (self.vad is not None or self.aggregator is not None or self.input_resampler is not None
+                or self.input_codec is not None)
+
+    def _forward_audio(self, pcm=None, audio_b64=None, seq=None, upstream_rate=False):
+        """Transmet une trame à OpenAI sous contrôle d'ordre et de contre-pression"""
+        self.last_activity = time.monotonic()
+        trace = None if upstream_rate else tracer.start(self.session_id, seq)
+        if not self.ingest_slots.acquire(blocking=False):
+            if not upstream_rate:
+                self.update_stats('chunks_dropped', 1)
+            if trace is not None:
+                tracer.finish(trace, 'dropped')
+            return False
+        with self.ingest_pending_lock:
+            self.ingest_pending += 1
+
+        try:
+            with self.ingest_lock:
+                if trace is not None:
+                    trace.mark('ingest')
+                    if self.pending_trace is None:
+                        self.pending_trace = trace
+                    else:
+                        # Une trame déjà tracée attend encore son envoi (regroupement, VAD)
+                        tracer.finish(trace, 'skipped')
+                if self.gap_buffer is not None:
+                    if upstream_rate:
+                        return False
+                    return self._buffer_during_gap(pcm, audio_b64, seq)
+                if upstream_rate:
+                    return self._ingest_pcm(pcm, resample=False)
+                return self._ingest_frame(pcm, audio_b64, seq)
+
         except Exception as e:
             self.add_event('error', f'Erreur envoi audio: {str(e)}', 'error')
             return False
 
+        finally:
+            with self.ingest_pending_lock:
+                self.ingest_pending -= 1
+            self.ingest_slots.release()
+
+    def _buffer_during_gap(self, pcm=None, audio_b64=None, seq=None):
+        """Met une trame en attente pendant la coupure (appelé sous ingest_lock)
+
+        La trame est ordonnée et décodée dès sa réception : le tampon garde du
+        PCM16 à la fréquence du micro, borné en durée quel que soit le codec.
+        """
+        if seq is not None:
+            if seq <= self.ingest_seq:
+                self.update_stats('chunks_dropped', 1)
+                return False
+            self.ingest_seq = seq
+        if pcm is None:
+            pcm = base64.b64decode(audio_b64)
+            wire_size = len(pcm)
+        else:
+            wire_size = len(pcm)
+            if self.input_codec is not None:
+                pcm = self.input_codec.decode(pcm)
+        ingest_chunk_hist.observe(wire_size)
+        self.count_wire('in', wire_size, len(pcm))
+        dropped = self.gap_buffer.push(pcm)
+        self.update_stats('gap_frames_buffered', 1)
+        if dropped:
+            self.update_stats('gap_frames_dropped', dropped)
+        return True
+
+    def _ingest_frame(self, pcm=None, audio_b64=None, seq=None):
+        """Ordre, décodage et envoi d'une trame du navigateur (appelé sous ingest_lock)"""
+        if seq is not None:
+            if seq <= self.ingest_seq:
+                self.update_stats('chunks_dropped', 1)
+                self.finish_pending_trace('dropped')
+                return False
+            self.ingest_seq = seq
+
+        if pcm is not None:
+            wire_size = len(pcm)
+            ingest_chunk_hist.observe(wire_size)
+            if self.input_codec is not None:
+                pcm = self.input_codec.decode(pcm)
+            self.count_wire('in', wire_size, len(pcm))
+            return self._ingest_pcm(pcm)
+
+        chunk_size = b64_payload_size(audio_b64)
+        ingest_chunk_hist.observe(chunk_size)
+        self.count_wire('in', chunk_size, chunk_size)
+        if not self._append_upstream(audio_b64=audio_b64):
+            return False
+        if self.recorder and self.recorder.record_input:
+            self.recorder.write_input(base64.b64decode(audio_b64))
+        self.update_stats('chunks_sent', 1)
+        self.update_stats('bytes_sent', chunk_size)
+        return True
+
+    def ingest_depth(self):
+        """Trames micro acceptées et pas encore transmises"""
+        return self.ingest_pending
+
+    def _ingest_pcm(self, pcm, resample=True):
+        """Étages de traitement du PCM micro puis envoi (appelé sous ingest_lock)"""
+        if resample and self.input_resampler is not None:
+            pcm = self.input_resampler.process(pcm)
+            if not pcm:
+                return True
+
+        if self.recorder and self.recorder.record_input:
+            self.recorder.write_input(pcm)
+
+        chunks = [pcm]
+        decision = None
+        if self.vad is not None:
+            decision = self.vad.process(pcm)
+            chunks = decision.chunks
+            if not chunks:
+                self.update_stats('vad_chunks_dropped', 1)
+                self.finish_pending_trace('vad_dropped')
+            if decision.dropped_bytes:
+                self.update_stats('vad_bytes_dropped', decision.dropped_bytes)
+
+        if self.aggregator is not None:
+            frames = []
+            for chunk in chunks:
+                frames.extend(self.aggregator.push(chunk))
+            chunks = frames
+            deadline = self.aggregator.deadline()
+            if deadline is not None and deadline != self.aggregation_deadline:
+                self.aggregation_deadline = deadline
+                aggregation_timer.schedule(deadline, self._flush_aggregator_on_deadline)
+
+        if not self._send_frames(chunks):
+            return False
+
+        if decision is not None and decision.event:
+            self._on_vad_event(decision)
+        return True
+
+    def _send_frames(self, frames):
+        """Envoie des trames PCM16 à OpenAI et met à jour les compteurs"""
+        for frame in frames:
+            if not self._append_upstream(pcm=frame):
+                return False
+            self.update_stats('chunks_sent', 1)
+            self.update_stats('bytes_sent', len(frame))
+        return True
+
+    def _append_upstream(self, pcm=None, audio_b64=None):
+        """Envoie une trame à OpenAI (input_audio_buffer.append)
+
+        Le message qui porte une trame tracée reçoit l'identifiant de la trace
+        comme event_id, repris par OpenAI dans les erreurs qui le concernent.
+        """
+        trace, self.pending_trace = self.pending_trace, None
+        send_started = time.perf_counter()
+        if trace is None:
+            ok = self.stream.send_audio(pcm) if audio_b64 is None else self.stream.send_audio_b64(audio_b64)
+        else:
+            trace.mark('upstream_send')
+            if audio_b64 is None:
+                ok = self.stream.send_audio(pcm, event_id=trace.id)
+            else:
+                ok = self.stream.send_audio_b64(audio_b64, event_id=trace.id)
+            trace.mark('upstream_sent')
+            tracer.finish(trace, 'sent' if ok else 'failed')
+        if ok:
+            upstream_send_hist.observe(time.perf_counter() - send_started)
+        return ok
+
+    def finish_pending_trace(self, result):
+        """Clôt la trace en attente d'une trame qui ne sera pas envoyée"""
+        trace, self.pending_trace = self.pending_trace, None
+        if trace is not None:
+            tracer.finish(trace, result)
+
+    def _flush_aggregator(self):
+        """Envoie immédiatement l'audio en attente de regroupement (sous ingest_lock)"""
+        if self.aggregator is not None:
+            frame = self.aggregator.flush()
+            if frame:
+                self._send_frames([frame])
+
+    def _flush_aggregator_on_deadline(self):
+        """Respecte la latence maximale lorsqu'aucune nouvelle trame n'arrive"""
+        if self.stop_event.is_set():
+            return
+        with self.ingest_lock:
+            deadline = self.aggregator.deadline()
+            if deadline is not None and deadline <= time.monotonic():
+                self._flush_aggregator()
+
+    def _on_vad_event(self, decision):
+        """Transitions de parole détectées par le VAD local"""
+        if decision.event == 'start':
+            self.add_event('vad', 'Début de parole (VAD local)', 'success')
+            if VAD_LOCAL_COMMIT:
+                if BARGE_IN:
+                    self.interrupt_response()
+                socketio.emit('speech_status', {'speaking': True}, room=self.session_id)
+            return
+
+        self.add_event('vad', f'Fin de parole (VAD local, {decision.speech_ms:.0f} ms)', 'success')
+        if VAD_LOCAL_COMMIT:
+            socketio.emit('speech_status', {'speaking': False}, room=self.session_id)
+            if decision.speech_ms >= VAD_MIN_SPEECH_MS:
+                self._flush_aggregator()
+                self.stream.stop_audio()
+                self.speech_stopped_at = time.monotonic()
+                self.update_stats('vad_commits', 1)
+                self.add_event('vad', 'Tour validé localement', 'info')
+        self.emitter.flush()
+
     def stop_audio(self):
         """Signale la fin d'une séquence audio à OpenAI"""
         if not self.is_ready:
             return False
 
         try:
-            self.stream.stop_audio()
+            with self.ingest_lock:
+                self._flush_aggregator()
+                self.stream.stop_audio()
+                self.speech_stopped_at = time.monotonic()
             self.add_event('audio', 'Fin de parole envoyée', 'info')
             return True
 
@@ -255,14 +1365,24 @@ class VoiceSession:
             return False
 
     def start_connection(self):
-        """Démarre la connexion WebSocket avec OpenAI"""
+        """Démarre la connexion WebSocket avec OpenAI
+
+        Une connexion pré-établie de la réserve est utilisée en priorité,
+        sinon une nouvelle connexion est ouverte.
+        """
+        # La réserve est configurée avec le profil par défaut
+        if upstream_pool is not None and self.profile is profile_store.get():
+            stream = upstream_pool.claim(self.handle_stream_event)
+            if stream is not None and stream.profile is not self.profile:
+                # Connexion configurée avant un rechargement des profils
+                stream.close()
+            elif stream is not None:
+                self.stream = stream
+                self.add_event('websocket', 'Connexion pré-établie attribuée depuis la réserve')
+                return True
+
         try:
             if self.stream.start():
-                self.ws = self.stream.ws
-                self.ws.on_open = self.on_open
-                self.ws.on_message = self.on_message
-                self.ws.on_error = self.on_error
-                self.ws.on_close = self.on_close
                 self.add_event('websocket', 'Connexion WebSocket initiée')
                 return True
             else:
@@ -276,30 +1396,276 @@ class VoiceSession:
     def disconnect(self):
         """Ferme la connexion"""
         self.stop_event.set()
+        flush_scheduler.unregister(self.emitter)
+        if self.egress is not None:
+            self.egress.close()
         
-        if self.ws:
-            self.stream.close()
+        self.stream.close()
         
-        # Sauvegarder l'audio si disponible
-        if self.audio_log:
+        # Finaliser les enregistrements écrits au fil de l'eau
+        if self.recorder:
             try:
-                final_audio = b''.join(self.audio_log)
-                filename = f"dialogue_{self.session_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-                filepath = os.path.join('static', 'recordings', filename)
-                
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                
-                with wave.open(filepath, "wb") as wf:
-                    wf.setnchannels(1)
-                    wf.setsampwidth(2)
-                    wf.setframerate(24000)
-                    wf.writeframes(final_audio)
-                
-                self.add_event('save', f'Audio sauvegardé: {filename}', 'success')
+                for filename in self.recorder.close():
+                    self.add_event('save', f'Audio sauvegardé: {filename}', 'success')
                 
             except Exception as e:
                 self.add_event('error', f'Erreur sauvegarde audio: {str(e)}', 'error')
 
+        self.emitter.flush()
+
+def close_session(session_id):
+    """Arrête une session, localement ou via le worker qui la détient"""
+    if active_sessions.stop(session_id):
+        return True
+    return session_registry.forward(session_id, 'stop_dialogue')
+
+def parse_sample_rate(value):
+    """Valide une fréquence d'échantillonnage proposée par le navigateur (None : inchangée)"""
+    if value is None:
+        return None
+    try:
+        rate = int(value)
+    except (TypeError, ValueError):
+        rate = None
+    if rate not in SUPPORTED_RATES:
+        raise ValueError(f'Fréquence d\'échantillonnage non supportée: {value}')
+    return rate
+
+def parse_encoding(value):
+    """Valide un encodage audio proposé par le navigateur (None : inchangé)"""
+    if value is None:
+        return None
+    if value not in available_encodings():
+        raise ValueError(f'Encodage audio non supporté: {value}')
+    return value
+
+def wire_savings(wire_bytes, pcm_bytes):
+    """Part des octets PCM16 économisée sur le lien navigateur"""
+    return round(1 - wire_bytes / pcm_bytes, 3) if pcm_bytes else 0.0
+
+def chat_instructions():
+    """Instructions du profil de l'utilisateur connecté, celui de son dialogue en cours s'il y en a un
+
+    Le chat texte garde ainsi le même rôle que l'assistant vocal.
+    """
+    voice_session = active_sessions.get(session.get('session_id'))
+    if voice_session is not None:
+        return voice_session.profile.instructions
+    return profile_store.for_user(session['user_id']).instructions
+
+def parse_chat_messages(data, instructions):
+    """Valide l'historique de chat du navigateur et le fait précéder des instructions"""
+    if not isinstance(data, dict):
+        raise ValueError('Messages manquants')
+    messages = data.get('messages')
+    if messages is None and isinstance(data.get('message'), str) and data['message']:
+        messages = [{'role': 'user', 'content': data['message']}]
+    if not isinstance(messages, list) or not messages:
+        raise ValueError('Messages manquants')
+    for message in messages:
+        if not isinstance(message, dict) or message.get('role') not in ('user', 'assistant') \
+                or not isinstance(message.get('content'), str):
+            raise ValueError('Message de chat invalide')
+    return [{'role': 'system', 'content': instructions}] + \
+        [{'role': message['role'], 'content': message['content']} for message in messages]
+
+def stream_chat_deltas(messages, abort_event):
+    """Deltas de texte du modèle, avec mesure du délai du premier token"""
+    started = time.monotonic()
+    first_token = True
+    result = 'error'
+    try:
+        for delta in chat_handler.stream_deltas(messages, abort_event):
+            if first_token:
+                chat_ttft_hist.observe(time.monotonic() - started)
+                first_token = False
+            yield delta
+        result = 'aborted' if abort_event.is_set() else 'completed'
+    except GeneratorExit:
+        result = 'aborted'
+        raise
+    finally:
+        chat_requests.inc(labels={'result': result})
+
+def relay_chat(sid, chat_id, messages, abort_event):
+    """Tâche de relais d'un chat Socket.IO : chat_delta au fil de l'eau puis chat_done"""
+    try:
+        for delta in stream_chat_deltas(messages, abort_event):
+            socketio.emit('chat_delta', {'chat_id': chat_id, 'delta': delta}, room=sid)
+        socketio.emit('chat_done', {'chat_id': chat_id, 'aborted': abort_event.is_set()}, room=sid)
+    except Exception as e:
+        logger.error(f"CHAT: Erreur chat: {e}")
+        socketio.emit('chat_error', {'chat_id': chat_id, 'error': str(e)}, room=sid)
+    finally:
+        if chat_aborts.get(sid) is abort_event:
+            chat_aborts.pop(sid, None)
+
+def save_upload_stream(stream, save_path, block_size=64 * 1024):
+    """Écrit un corps de requête sur disque bloc par bloc, sans le charger en mémoire"""
+    with open(save_path, 'wb') as f:
+        while True:
+            block = stream.read(block_size)
+            if not block:
+                break
+            f.write(block)
+
+def stored_upload_path(filename):
+    """Chemin d'enregistrement d'un fichier importé, préfixé pour que deux imports du même nom ne s'écrasent pas"""
+    return os.path.join(UPLOADS_DIR, f"{uuid.uuid4().hex[:8]}_{filename}")
+
+def remove_upload(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def keep_upload(save_path, session_id):
+    """Conserve un fichier importé hors dialogue pour un lot de la session, et expire les plus anciens"""
+    now = time.time()
+    for name, (owner, stored_at) in list(upload_owners.items()):
+        if now - stored_at > UPLOAD_KEEP_SECONDS and upload_owners.pop(name, None) is not None:
+            remove_upload(os.path.join(UPLOADS_DIR, name))
+    upload_owners[os.path.basename(save_path)] = (session_id, now)
+
+def start_upload_job(path, filename, session_id):
+    """Crée la tâche d'import d'un fichier dans le dialogue de la session et la lance en arrière-plan"""
+    job = UploadJob(path, filename, UPSTREAM_SAMPLE_RATE, block_ms=UPLOAD_BLOCK_MS, speed=UPLOAD_SPEED,
+                    raw_rate=UPLOAD_RAW_RATE, session_id=session_id)
+    upload_jobs[job.id] = job
+    while len(upload_jobs) > UPLOAD_JOBS_KEPT and next(iter(upload_jobs.values())).finished:
+        upload_jobs.popitem(last=False)
+    socketio.start_background_task(run_upload_job, job)
+    return job
+
+def emit_upload_progress(job):
+    socketio.emit('upload_progress', job.snapshot(), room=job.session_id)
+
+def run_upload_job(job):
+    """Tâche d'import : attend une place libre puis envoie le fichier au dialogue, bloc par bloc
+
+    Les blocs suivent le chemin de l'audio micro (send_file_audio) ; un bloc
+    refusé (file pleine, coupure d'OpenAI) est réessayé, et la tâche échoue
+    si la session est fermée.
+    """
+    def sink(pcm):
+        voice_session = active_sessions.get(job.session_id)
+        if voice_session is None or voice_session.stop_event.is_set():
+            raise RuntimeError('Aucune session active')
+        return voice_session.send_file_audio(pcm)
+
+    emit_upload_progress(job)
+    try:
+        with upload_slots:
+            state = job.run(sink, on_progress=emit_upload_progress, sleep=socketio.sleep)
+    finally:
+        # Le fichier n'a servi qu'à cet import
+        remove_upload(job.path)
+
+    upload_jobs_counter.inc(labels={'result': state})
+    upload_audio_seconds.inc(job.sent_seconds)
+    voice_session = active_sessions.get(job.session_id)
+    if state == 'done':
+        logger.info(f"UPLOAD: {job.filename} envoyé ({job.sent_seconds:.1f} s d'audio)")
+        if voice_session is not None:
+            voice_session.add_event('upload', f'Fichier {job.filename} envoyé ({job.sent_seconds:.1f} s)', 'success')
+    elif state == 'failed':
+        logger.error(f"UPLOAD: Erreur import {job.filename}: {job.error}")
+        if voice_session is not None:
+            voice_session.add_event('error', f'Erreur import {job.filename}: {job.error}', 'error')
+
+def on_batch_clip(job, result):
+    """Compteurs et avancement d'un lot après chaque clip"""
+    batch_clips_counter.inc(labels={'result': result['status']})
+    if result['latency_seconds'] is not None:
+        batch_clip_hist.observe(result['latency_seconds'])
+    if result['status'] == 'failed':
+        logger.warning(f"BATCH: Clip {result['clip']} en échec après {result['attempts']} tentatives: {result['error']}")
+    if job.owner:
+        socketio.emit('batch_progress', {'batch_id': job.id, 'clip': result['clip'], 'status': result['status'],
+                                         'completed': sum(r is not None for r in job.results),
+                                         'clips': len(job.clips)}, room=job.owner)
+
+def on_batch_done(job):
+    """Rapport de débit d'un lot terminé, puis suppression de ses clips importés"""
+    for path in job.clips:
+        remove_upload(path)
+    report = job.report()
+    logger.info(f"BATCH: Lot {job.id} terminé : {report['succeeded']}/{report['clips']} clips en "
+                f"{report['wall_seconds']:.1f} s ({report['realtime_factor']} x temps réel)")
+    if job.owner:
+        socketio.emit('batch_done', job.snapshot(), room=job.owner)
+
+# Traitement hors ligne des clips par lots, sur des connexions OpenAI réutilisées
+batch_runner = BatchRunner(
+    create_batch_handler, BATCH_DIR, workers=BATCH_WORKERS, max_retries=BATCH_MAX_RETRIES,
+    clip_timeout=BATCH_CLIP_TIMEOUT, append_ms=BATCH_APPEND_MS, idle_timeout=BATCH_IDLE_TIMEOUT,
+    retry_base_delay=RECONNECT_BASE_DELAY, retry_max_delay=RECONNECT_MAX_DELAY, raw_rate=UPLOAD_RAW_RATE,
+    on_clip=on_batch_clip, on_batch=on_batch_done,
+    start_background_task=socketio.start_background_task, sleep=socketio.sleep
+)
+metrics_registry.counter_func('voix_profile_reloads_total', 'Rechargements du fichier de profils par issue', lambda: [
+    ({'result': 'success'}, profile_store.reloads),
+    ({'result': 'error'}, profile_store.errors),
+])
+metrics_registry.gauge('voix_batch_queue_depth', 'Clips du mode batch en attente', batch_runner.depth)
+metrics_registry.gauge('voix_batch_connections', 'Connexions OpenAI ouvertes par le mode batch',
+                       lambda: batch_runner.stats()['connected'])
+
+def on_session_reaped(session_id, reason):
+    """Notifie la fermeture automatique d'une session abandonnée"""
+    logger.info(f"REAPER: Session {session_id} fermée ({reason})")
+    socketio.emit('session_disconnected', {'reason': reason}, room=session_id)
+
+def handle_forwarded_command(message):
+    """Applique une commande transférée par un autre worker à une session locale"""
+    session_id = message.get('session_id')
+    command = message.get('command')
+    voice_session = active_sessions.get(session_id)
+    if voice_session is None:
+        logger.warning(f"REGISTRY: Commande {command} pour une session inconnue: {session_id}")
+        return
+
+    if command == 'send_audio':
+        voice_session.send_audio(message['audio'])
+    elif command == 'send_audio_bytes':
+        voice_session.send_audio_bytes(message['audio'], message.get('seq'))
+    elif command == 'stop_audio':
+        voice_session.stop_audio()
+    elif command == 'set_audio_format':
+        try:
+            voice_session.set_audio_format(message.get('input_rate'), message.get('output_rate'),
+                                           message.get('encoding'))
+        except ValueError as e:
+            voice_session.add_event('error', f'Format audio refusé: {str(e)}', 'error')
+    elif command == 'stop_dialogue':
+        close_session(session_id)
+
+session_registry.subscribe(handle_forwarded_command)
+
+def instrument_hot_paths():
+    """Chronométrage échantillonné des chemins chauds (PROFILING=1)
+
+    Le base64 se lit par différence entre upstream.send_audio et
+    upstream.send_audio_b64, l'écriture sur le socket OpenAI par différence
+    entre upstream.send et json.dumps.
+    """
+    for name in ('on_message', 'dispatch_message', 'send_audio', 'send_audio_bytes', 'update_stats',
+                 'add_event', 'emit_audio', 'emit_pcm'):
+        profiler.instrument(VoiceSession, name, f'session.{name}')
+    profiler.instrument(BaseStreamHandler, 'on_message', 'upstream.on_message')
+    profiler.instrument(BaseStreamHandler, 'send_audio', 'upstream.send_audio')
+    profiler.instrument(BaseStreamHandler, 'send_audio_b64', 'upstream.send_audio_b64')
+    profiler.instrument(OpenAIStreamHandler, 'send', 'upstream.send')
+    if REALTIME_TRANSPORT == 'asyncio':
+        profiler.instrument(AsyncOpenAIStreamHandler, 'send', 'upstream.send')
+    json_backend.loads = profiler.wrap('json.loads', json_backend.loads)
+    json_backend.dumps = profiler.wrap('json.dumps', json_backend.dumps)
+    socketio.emit = profiler.wrap('socketio.emit', socketio.emit)
+
+if profiler is not None:
+    instrument_hot_paths()
+    logger.info(f"PROFILING: Chronométrage d'un appel sur {PROFILING_SAMPLE_EVERY} activé")
+
 # Routes Flask
 
 @app.route('/favicon.ico')
@@ -328,18 +1694,205 @@ def upload():
         return redirect(url_for('login'))
 
     message = None
+    job = None
     if request.method == 'POST':
         uploaded = request.files.get('file')
         if uploaded and uploaded.filename:
-            os.makedirs(os.path.join('static', 'uploads'), exist_ok=True)
+            os.makedirs(UPLOADS_DIR, exist_ok=True)
             filename = secure_filename(uploaded.filename)
-            save_path = os.path.join('static', 'uploads', filename)
+            save_path = stored_upload_path(filename)
             uploaded.save(save_path)
             message = f"Fichier '{filename}' téléchargé"
+            session_id = session.get('session_id')
+            if session_id in active_sessions:
+                job = start_upload_job(save_path, filename, session_id)
+                message += ', envoi au dialogue en cours'
+            else:
+                keep_upload(save_path, session_id)
         else:
             message = 'Aucun fichier sélectionné'
 
-    return render_template('upload.html', message=message)
+    return render_template('upload.html', message=message, job=job.snapshot() if job else None)
+
+@app.route('/api/upload', methods=['POST'])
+def api_upload():
+    """Upload d'un fichier audio puis import en arrière-plan dans le dialogue en cours
+
+    Accepte un formulaire multipart (champ 'file') ou le fichier brut dans le
+    corps de la requête (?filename=...), écrit sur disque par blocs.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non connecté'}), 401
+
+    uploaded = request.files.get('file')
+    filename = secure_filename(uploaded.filename if uploaded else request.args.get('filename', ''))
+    if not filename:
+        return jsonify({'error': 'Nom de fichier manquant'}), 400
+
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    save_path = stored_upload_path(filename)
+    if uploaded:
+        uploaded.save(save_path)
+    else:
+        save_upload_stream(request.stream, save_path)
+
+    session_id = session.get('session_id')
+    job = None
+    if session_id in active_sessions and request.args.get('dialogue', '1') != '0':
+        job = start_upload_job(save_path, filename, session_id)
+    else:
+        keep_upload(save_path, session_id)
+    return jsonify({'success': True, 'filename': filename, 'stored_as': os.path.basename(save_path),
+                    'job': job.snapshot() if job else None})
+
+@app.route('/api/uploads', methods=['GET'])
+def list_uploads():
+    """Tâches d'import de la session"""
+    session_id = session.get('session_id')
+    return jsonify({'jobs': [job.snapshot() for job in list(upload_jobs.values()) if job.session_id == session_id]})
+
+@app.route('/api/uploads/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    """Avancement d'une tâche d'import"""
+    job = upload_jobs.get(job_id)
+    if job is None or job.session_id != session.get('session_id'):
+        return jsonify({'error': 'Tâche inconnue'}), 404
+    return jsonify(job.snapshot())
+
+@app.route('/api/uploads/<job_id>/cancel', methods=['POST'])
+def cancel_upload(job_id):
+    """Interrompt une tâche d'import"""
+    job = upload_jobs.get(job_id)
+    if job is None or job.session_id != session.get('session_id'):
+        return jsonify({'error': 'Tâche inconnue'}), 404
+    job.cancel()
+    return jsonify({'success': True})
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """Profils de session disponibles et profil de l'utilisateur connecté"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non connecté'}), 401
+    stats = profile_store.stats()
+    stats['user_profile'] = profile_store.for_user(session['user_id']).name
+    return jsonify(stats)
+
+@app.route('/api/batch', methods=['POST'])
+def submit_batch():
+    """Soumet un lot de clips au traitement hors ligne
+
+    Accepte des fichiers multipart (champ 'files') ou un corps JSON
+    {'clips': [...], 'name': ...} désignant des fichiers déjà importés.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non connecté'}), 401
+
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    clips = []
+    name = request.form.get('name')
+    uploaded_files = [f for f in request.files.getlist('files') if f.filename]
+    if uploaded_files:
+        for uploaded in uploaded_files:
+            save_path = stored_upload_path(secure_filename(uploaded.filename))
+            uploaded.save(save_path)
+            clips.append(save_path)
+    else:
+        data = request.get_json(silent=True) or {}
+        name = data.get('name')
+        for filename in data.get('clips') or []:
+            # Seuls les fichiers importés par cette session peuvent être désignés
+            stored = secure_filename(str(filename))
+            path = os.path.join(UPLOADS_DIR, stored)
+            owner, _ = upload_owners.get(stored, (None, None))
+            if owner != session.get('session_id') or not os.path.isfile(path):
+                return jsonify({'error': f'Clip introuvable: {filename}'}), 400
+            clips.append(path)
+        # Les fichiers appartiennent désormais au lot, qui les supprime une fois terminé
+        for path in clips:
+            upload_owners.pop(os.path.basename(path), None)
+
+    if not clips:
+        return jsonify({'error': 'Aucun clip'}), 400
+    job = batch_runner.submit(clips, name=name, owner=session.get('session_id'))
+    return jsonify({'success': True, 'batch_id': job.id, 'clips': len(clips)}), 202
+
+@app.route('/api/batch/<batch_id>', methods=['GET'])
+def batch_status(batch_id):
+    """Avancement, rapport de débit et résultats d'un lot"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non connecté'}), 401
+    job = batch_runner.get(batch_id)
+    if job is None or job.owner != session.get('session_id'):
+        return jsonify({'error': 'Lot inconnu'}), 404
+    return jsonify(job.snapshot())
+
+def admin_denied():
+    """Réponse d'erreur si la requête ne porte pas le jeton d'administration, sinon None
+
+    Les noms d'utilisateur ne sont pas authentifiés sans MON_USERNAME/PASSWORD :
+    l'accès repose sur ADMIN_TOKEN seul.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Routes d\'administration désactivées (ADMIN_TOKEN absent)'}), 403
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Jeton d\'administration invalide'}), 403
+    return None
+
+@app.route('/api/admin/profile', methods=['GET'])
+def admin_profile():
+    """Agrégats des chronomètres par étape et traces récentes des trames micro"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'limit invalide'}), 400
+    return jsonify({
+        'profiling': profiler.snapshot() if profiler is not None else None,
+        'tracing': {
+            'sample_every': tracer.sample_every,
+            'started': tracer.started,
+            'traces': tracer.recent(request.args.get('session_id'), limit),
+        },
+    })
+
+@app.route('/api/admin/profile/reset', methods=['POST'])
+def admin_profile_reset():
+    """Remet à zéro les agrégats des chronomètres"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    if profiler is not None:
+        profiler.reset()
+    return jsonify({'success': True})
+
+@app.route('/api/admin/profile/stacks', methods=['GET'])
+def admin_profile_stacks():
+    """Échantillons des piles de tous les threads, au format replié (flamegraph.pl, speedscope)
+
+    Paramètres : seconds (durée de capture) et interval_ms (période d'échantillonnage).
+    """
+    denied = admin_denied()
+    if denied:
+        return denied
+    try:
+        seconds = float(request.args.get('seconds', 5))
+        interval_ms = float(request.args.get('interval_ms', 5))
+    except ValueError:
+        return jsonify({'error': 'seconds ou interval_ms invalide'}), 400
+    if not 0 < seconds <= PROFILE_STACKS_MAX_SECONDS or interval_ms < PROFILE_STACKS_MIN_INTERVAL_MS:
+        return jsonify({'error': f'seconds doit être entre 0 et {PROFILE_STACKS_MAX_SECONDS}, '
+                                 f'interval_ms au moins {PROFILE_STACKS_MIN_INTERVAL_MS}'}), 400
+    if not stack_capture_lock.acquire(blocking=False):
+        return jsonify({'error': 'Capture de piles déjà en cours'}), 409
+    try:
+        sampler = StackSampler(interval_ms / 1000).run(seconds, sleep=socketio.sleep)
+    finally:
+        stack_capture_lock.release()
+    logger.info(f"PROFILING: {sampler.samples} captures de piles en {seconds:.1f} s")
+    return app.response_class(sampler.folded(), content_type='text/plain; charset=utf-8')
 
 @app.route('/login', methods=['POST'])
 def do_login():
@@ -373,9 +1926,8 @@ def do_login():
 def logout():
     """Déconnexion"""
     session_id = session.get('session_id')
-    if session_id and session_id in active_sessions:
-        active_sessions[session_id].disconnect()
-        del active_sessions[session_id]
+    if session_id:
+        close_session(session_id)
     
     session.clear()
     return redirect(url_for('login'))
@@ -388,16 +1940,36 @@ def start_dialogue():
     
     session_id = session.get('session_id')
     
-    if session_id in active_sessions:
+    if session_registry.owner(session_id):
         return jsonify({'error': 'Session déjà active'}), 400
     
-    voice_session = VoiceSession(session_id)
-    active_sessions[session_id] = voice_session
+    audio_request = request.get_json(silent=True) or {}
+    try:
+        input_rate = parse_sample_rate(audio_request.get('input_rate')) or UPSTREAM_SAMPLE_RATE
+        output_rate = parse_sample_rate(audio_request.get('output_rate')) or UPSTREAM_SAMPLE_RATE
+        # Profil de l'utilisateur, ou à défaut le profil par défaut : pas ceux des autres utilisateurs
+        profile = profile_store.for_user(session['user_id'])
+        requested = audio_request.get('profile')
+        if requested and str(requested) != profile.name:
+            profile = profile_store.get(str(requested))
+            if profile.name != profile_store.default:
+                return jsonify({'error': f'Profil non autorisé: {profile.name}'}), 403
+        encoding = parse_encoding(audio_request.get('encoding')) or profile.encoding
+        voice_session = VoiceSession(session_id, input_rate, output_rate, encoding, profile)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not active_sessions.add(session_id, voice_session):
+        voice_session.disconnect()
+        return jsonify({'error': 'Session déjà active'}), 400
+    active_sessions.start_reaper(socketio.start_background_task, socketio.sleep, on_session_reaped)
     
     if voice_session.start_connection():
-        return jsonify({'success': True, 'session_id': session_id})
+        return jsonify({'success': True, 'session_id': session_id, 'audio_format': voice_session.audio_format(),
+                        'profile': profile.name})
     else:
-        del active_sessions[session_id]
+        active_sessions.pop(session_id)
+        voice_session.disconnect()
         return jsonify({'error': 'Erreur démarrage connexion'}), 500
 
 @app.route('/api/stop_dialogue', methods=['POST'])
@@ -405,9 +1977,7 @@ def stop_dialogue():
     """Arrête la session de dialogue"""
     session_id = session.get('session_id')
     
-    if session_id in active_sessions:
-        active_sessions[session_id].disconnect()
-        del active_sessions[session_id]
+    if close_session(session_id):
         return jsonify({'success': True})
     
     return jsonify({'error': 'Aucune session active'}), 400
@@ -417,14 +1987,20 @@ def send_audio():
     """Envoie de l'audio reçu du navigateur à OpenAI"""
     session_id = session.get('session_id')
     
-    if session_id not in active_sessions:
+    if session_id not in active_sessions and not session_registry.owner(session_id):
         return jsonify({'error': 'Aucune session active'}), 400
     
     audio_data = request.json.get('audio')
     if not audio_data:
         return jsonify({'error': 'Données audio manquantes'}), 400
     
-    voice_session = active_sessions[session_id]
+    voice_session = active_sessions.get(session_id)
+    if voice_session is None:
+        # Session détenue par un autre worker : transfert de l'audio
+        if session_registry.forward(session_id, 'send_audio', audio=audio_data):
+            return jsonify({'success': True, 'forwarded': True})
+        return jsonify({'error': 'Erreur transfert audio'}), 502
+    
     if voice_session.send_audio(audio_data):
         return jsonify({'success': True})
     else:
@@ -436,6 +2012,8 @@ def end_audio():
     session_id = session.get('session_id')
 
     if session_id not in active_sessions:
+        if session_registry.forward(session_id, 'stop_audio'):
+            return jsonify({'success': True, 'forwarded': True})
         return jsonify({'error': 'Aucune session active'}), 400
 
     voice_session = active_sessions[session_id]
@@ -450,44 +2028,94 @@ def get_status():
     session_id = session.get('session_id')
     
     if session_id not in active_sessions:
+        owner = session_registry.owner(session_id)
+        if owner:
+            return jsonify({'connected': True, 'remote': True, 'owner': owner})
         return jsonify({'connected': False})
     
     voice_session = active_sessions[session_id]
-    stats = voice_session.stats.copy()
-    stats['duration'] = time.time() - stats['start_time']
+    stats = voice_session.stats_snapshot()
     
     return jsonify({
         'connected': voice_session.is_connected,
         'ready': voice_session.is_ready,
         'openai_session_id': voice_session.openai_session_id,
         'conversation_id': voice_session.conversation_id,
-        'stats': stats
+        'stats': stats,
+        'audio_format': voice_session.audio_format(),
+        'pool': upstream_pool.stats() if upstream_pool is not None else None,
+        'audio_cache': audio_cache.stats() if audio_cache is not None else None
     })
 
+@app.route('/api/sessions')
+def get_sessions_metrics():
+    """Métriques du cycle de vie des sessions de ce worker"""
+    return jsonify(active_sessions.metrics())
+
+@app.route('/metrics')
+def get_metrics():
+    """Métriques au format texte Prometheus"""
+    return app.response_class(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/api/events')
 def get_events():
-    """Journal des événements"""
+    """Journal des événements (?since=<id> pour ne recevoir que les nouveaux)"""
     try:
         session_id = session.get('session_id')
         
-        if session_id not in active_sessions:
+        voice_session = active_sessions.get(session_id)
+        if voice_session is None:
             return jsonify([])
         
-        return jsonify(active_sessions[session_id].events)
+        since = request.args.get('since', type=int)
+        return jsonify(voice_session.events.to_list(since))
         
     except Exception as e:
         logger.error(f"EVENTS: Erreur récupération événements: {e}")
         return jsonify({'error': f'Erreur récupération événements: {str(e)}'}), 500
 
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    """Chat texte : les tokens du modèle sont relayés au fil de l'eau (Server-Sent Events)
+
+    Reçoit {'messages': [{'role', 'content'}, ...]} ou {'message': '...'}.
+    Si le navigateur ferme la connexion, la requête vers OpenAI est abandonnée.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non connecté'}), 401
+    try:
+        messages = parse_chat_messages(request.get_json(silent=True), chat_instructions())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    abort_event = threading.Event()
+
+    def generate():
+        try:
+            for delta in stream_chat_deltas(messages, abort_event):
+                yield f'data: {json_backend.dumps({"delta": delta})}\n\n'
+            yield 'event: done\ndata: {}\n\n'
+        except Exception as e:
+            logger.error(f"CHAT: Erreur chat: {e}")
+            yield f'event: error\ndata: {json_backend.dumps({"error": str(e)})}\n\n'
+        finally:
+            # Navigateur parti (GeneratorExit) : la lecture du flux OpenAI s'arrête
+            abort_event.set()
+
+    return app.response_class(generate(), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/generate_test_audio')
 def generate_test_audio():
     """Génère un signal audio de test côté serveur pour validation"""
     try:
         logger.info("TEST_AUDIO: Génération signal de test")
         
-        # Signal sinusoïdal 1kHz, 1 seconde
+        # Signal sinusoïdal 1kHz, 1 seconde, à la fréquence demandée (24 kHz par défaut)
         duration = 1.0
-        sample_rate = 24000
+        sample_rate = request.args.get('sample_rate', UPSTREAM_SAMPLE_RATE, type=int)
+        if sample_rate not in SUPPORTED_RATES:
+            return jsonify({'error': f'Fréquence d\'échantillonnage non supportée: {sample_rate}'}), 400
         frequency = 1000
         
         t = np.linspace(0, duration, int(sample_rate * duration), False)
@@ -503,7 +2131,7 @@ def generate_test_audio():
         return jsonify({
             'success': True, 
             'audio': audio_b64,
-            'message': 'Signal de test généré (PCM16, 24kHz, 1kHz)',
+            'message': f'Signal de test généré (PCM16, {sample_rate} Hz, 1kHz)',
             'size': len(audio_bytes)
         })
         
@@ -528,20 +2156,114 @@ def handle_connect():
         join_room(session_id)
         emit('connected', {'session_id': session_id})
 
+@socketio.on('audio_in')
+def handle_audio_in(data):
+    """Réception de trames PCM16 binaires depuis le navigateur
+
+    Accepte soit les octets bruts, soit {'seq': n, 'audio': <bytes>}.
+    La valeur retournée sert d'accusé de réception côté client.
+    """
+    session_id = session.get('session_id')
+
+    seq = None
+    audio = data
+    if isinstance(data, dict):
+        audio = data.get('audio')
+        seq = data.get('seq')
+
+    voice_session = active_sessions.get(session_id)
+    if voice_session is None:
+        if isinstance(audio, (bytes, bytearray)) and audio and \
+                session_registry.forward(session_id, 'send_audio_bytes', audio=bytes(audio), seq=seq):
+            return {'ok': True, 'seq': seq, 'forwarded': True}
+        return {'ok': False, 'error': 'Aucune session active'}
+
+    if not isinstance(audio, (bytes, bytearray)) or not audio:
+        return {'ok': False, 'error': 'Données audio manquantes', 'seq': seq}
+
+    ok = voice_session.send_audio_bytes(bytes(audio), seq)
+    return {'ok': ok, 'seq': seq}
+
+@socketio.on('audio_format')
+def handle_audio_format(data):
+    """Négociation des fréquences d'échantillonnage et de l'encodage du micro et de la lecture
+
+    Reçoit {'input_rate': n, 'output_rate': n, 'encoding': 'mulaw'} et retourne le format retenu.
+    """
+    session_id = session.get('session_id')
+    data = data if isinstance(data, dict) else {}
+    refused = {'ok': False, 'supported_rates': list(SUPPORTED_RATES), 'encodings': available_encodings()}
+    try:
+        input_rate = parse_sample_rate(data.get('input_rate'))
+        output_rate = parse_sample_rate(data.get('output_rate'))
+        encoding = parse_encoding(data.get('encoding'))
+    except ValueError as e:
+        return dict(refused, error=str(e))
+
+    voice_session = active_sessions.get(session_id)
+    if voice_session is None:
+        if session_registry.forward(session_id, 'set_audio_format', input_rate=input_rate, output_rate=output_rate,
+                                    encoding=encoding):
+            return {'ok': True, 'forwarded': True}
+        return {'ok': False, 'error': 'Aucune session active'}
+
+    try:
+        return dict(voice_session.set_audio_format(input_rate, output_rate, encoding), ok=True)
+    except ValueError as e:
+        return dict(refused, error=str(e))
+
+@socketio.on('chat_message')
+def handle_chat_message(data):
+    """Chat texte via Socket.IO : deltas émis en chat_delta, puis chat_done
+
+    Reçoit {'chat_id': ..., 'messages': [...]} ; un nouveau message arrête le chat précédent.
+    """
+    if 'user_id' not in session:
+        return {'ok': False, 'error': 'Non connecté'}
+    try:
+        messages = parse_chat_messages(data, chat_instructions())
+    except ValueError as e:
+        return {'ok': False, 'error': str(e)}
+
+    sid = request.sid
+    previous = chat_aborts.pop(sid, None)
+    if previous is not None:
+        previous.set()
+    abort_event = threading.Event()
+    chat_aborts[sid] = abort_event
+    socketio.start_background_task(relay_chat, sid, data.get('chat_id'), messages, abort_event)
+    return {'ok': True}
+
+@socketio.on('chat_abort')
+def handle_chat_abort(data=None):
+    """Arrête le chat Socket.IO en cours"""
+    abort_event = chat_aborts.pop(request.sid, None)
+    if abort_event is not None:
+        abort_event.set()
+    return {'ok': abort_event is not None}
+
 @socketio.on('disconnect')
 def handle_disconnect():
     """Déconnexion WebSocket"""
     session_id = session.get('session_id')
     if session_id:
         leave_room(session_id)
+    abort_event = chat_aborts.pop(request.sid, None)
+    if abort_event is not None:
+        abort_event.set()
 
 if __name__ == '__main__':
     # Créer les dossiers nécessaires
-    os.makedirs('static/recordings', exist_ok=True)
+    os.makedirs(RECORDINGS_DIR, exist_ok=True)
     os.makedirs('templates', exist_ok=True)
     
     logger.info("FLASK: Démarrage de l'application Voice Assistant")
     logger.info(f"MODEL: {MODEL}")
-    logger.info(f"URL: http://localhost:5000")
+    logger.info(f"PROFILES: {', '.join(sorted(profile_store.profiles))} (défaut : {profile_store.default})")
+    logger.info(f"JSON: {json_backend.backend}")
+    if upstream_pool is not None:
+        upstream_pool.start()
+        logger.info(f"POOL: Réserve de {WARM_POOL_SIZE} connexions pré-établies")
+    logger.info(f"URL: http://localhost:{PORT}")
     
-    socketio.run(app, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
+    socketio.run(app, host='0.0.0.0', port=PORT, allow_unsafe_werkzeug=True)
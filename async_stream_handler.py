@@ -0,0 +1,128 @@
+import asyncio
+import collections
+import threading
+
+try:
+    import websockets
+except ImportError:  # optional dependency, only needed for REALTIME_TRANSPORT=asyncio
+    websockets = None
+
+import json_backend
+from stream_handler import BaseStreamHandler
+
+
+class EventLoopThread:
+    """A single asyncio loop, run in a daemon thread, shared by all sessions."""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._posted = collections.deque()
+        self._wakeup_pending = False
+        self.thread = threading.Thread(target=self._run, name='realtime-loop', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def post(self, callback, arg):
+        """Queue ``callback(arg)`` on the loop, waking it at most once per batch.
+
+        ``call_soon_threadsafe`` writes to the loop's self-pipe on every call;
+        batching keeps that to one syscall per loop iteration however many
+        sessions are sending.
+        """
+        self._posted.append((callback, arg))
+        if not self._wakeup_pending:
+            self._wakeup_pending = True
+            self.loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        self._wakeup_pending = False
+        posted = self._posted
+        while posted:
+            callback, arg = posted.popleft()
+            callback(arg)
+
+
+class AsyncOpenAIStreamHandler(BaseStreamHandler):
+    """OpenAI realtime connection multiplexed on a shared asyncio loop.
+
+    Same callback surface as ``OpenAIStreamHandler`` but no thread per
+    session: sends from other threads are queued onto the loop and written
+    in order by a per-connection sender task. Event callbacks run on the
+    loop thread and must not block.
+    """
+
+    def __init__(self, *args, loop=None, **kwargs):
+        if websockets is None:
+            raise RuntimeError("the 'websockets' package is required for the asyncio transport")
+        super().__init__(*args, **kwargs)
+        self.loop = loop or EventLoopThread.shared()
+        self._outbox = None
+        self._task = None
+
+    def start(self):
+        self._task = self.loop.submit(self._run())
+        return self.connected.wait(timeout=5)
+
+    async def _run(self):
+        status = None
+        try:
+            # No permessage-deflate: base64 audio barely compresses and each
+            # zlib context costs hundreds of KB per connection
+            async with websockets.connect(self.endpoint, additional_headers=self.headers(),
+                                          compression=None, max_size=None) as ws:
+                self.ws = ws
+                self._outbox = asyncio.Queue()
+                self.connected.set()
+                self._emit('open', None)
+                await ws.send(self.session_message())
+                sender = asyncio.ensure_future(self._sender(ws))
+                try:
+                    async for message in ws:
+                        self.on_message(ws, message)
+                finally:
+                    sender.cancel()
+                status = ws.close_code
+        except asyncio.CancelledError:
+            status = 1000
+        except Exception as e:
+            self._emit('error', str(e))
+        finally:
+            self.ws = None
+            self._mark_closed(status)
+
+    async def _sender(self, ws):
+        while True:
+            payload = await self._outbox.get()
+            await ws.send(payload)
+
+    def send(self, payload):
+        self.loop.post(self._outbox.put_nowait, json_backend.dumps(payload))
+
+    def pending_sends(self):
+        outbox = self._outbox
+        return outbox.qsize() if outbox is not None else 0
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.stopped.set()
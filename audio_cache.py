@@ -0,0 +1,219 @@
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+import wave
+
+
+def normalize_text(text):
+    """Casefolded words without punctuation or extra spaces, for cache keys."""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    return ' '.join(re.findall(r'\w+', text))
+
+
+class CachedResponse:
+    """One cached assistant turn: PCM16 mono audio and the reply text."""
+
+    __slots__ = ('key', 'text', 'pcm', 'first_audio_latency', 'hits')
+
+    def __init__(self, key, text, pcm, first_audio_latency=None):
+        self.key = key
+        self.text = text
+        self.pcm = bytes(pcm)
+        self.first_audio_latency = first_audio_latency
+        self.hits = 0
+
+    @property
+    def size(self):
+        return len(self.pcm)
+
+
+class ResponseAudioCache:
+    """Content-addressed cache of response audio, in memory and on disk.
+
+    Entries are keyed on the normalised user transcript plus a session
+    profile fingerprint, so the same question under different
+    instructions or voice is a different entry. The memory tier is an LRU
+    bounded by ``max_bytes``; with a ``directory`` every entry is also
+    written as ``<key>.wav`` plus a ``<key>.json`` sidecar, and the disk
+    tier is trimmed oldest-first to ``disk_max_bytes``. Disk entries
+    survive restarts and are promoted to memory on a hit. With an
+    ``executor`` the disk writes run on its threads instead of the caller's.
+    """
+
+    def __init__(self, directory=None, max_bytes=32 * 1024 * 1024, disk_max_bytes=256 * 1024 * 1024,
+                 max_entry_bytes=24000 * 2 * 15, sample_rate=24000, executor=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes if directory else 0
+        self.max_entry_bytes = max_entry_bytes
+        self.sample_rate = sample_rate
+        self.executor = executor
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.saved_seconds = 0.0
+        self._memory = collections.OrderedDict()
+        self._memory_bytes = 0
+        # key -> size of the WAV file, oldest first
+        self._disk = collections.OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if self.disk_max_bytes:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+    @staticmethod
+    def key(profile_key, text):
+        """Cache key for ``text`` under a profile, None when nothing is left to key on."""
+        normalized = normalize_text(text)
+        if not normalized:
+            return None
+        return hashlib.sha256(f'{profile_key}\0{normalized}'.encode('utf-8')).hexdigest()
+
+    def get(self, profile_key, text):
+        """Cached response for ``text``, or None; counts the hit or miss."""
+        key = self.key(profile_key, text)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            elif key in self._disk:
+                entry = self._load(key)
+                if entry is not None:
+                    self.disk_hits += 1
+                    self._disk.move_to_end(key)
+                    self._remember(entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.hits += 1
+            return entry
+
+    def put(self, profile_key, text, response_text, pcm, first_audio_latency=None):
+        """Store a completed response; return the entry, or None if it is not cacheable."""
+        key = self.key(profile_key, text)
+        if key is None or not pcm or len(pcm) > self.max_entry_bytes:
+            return None
+        entry = CachedResponse(key, response_text, pcm, first_audio_latency)
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous.size
+            self._remember(entry)
+            self.stores += 1
+        if self.disk_max_bytes:
+            if self.executor is None:
+                self._write(entry)
+            else:
+                self.executor.submit(self._write, entry)
+        return entry
+
+    def record_saving(self, seconds):
+        """Latency saved by a hit compared with the original response."""
+        if seconds > 0:
+            self.saved_seconds += seconds
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self._memory),
+            'bytes': self._memory_bytes,
+            'disk_entries': len(self._disk),
+            'disk_bytes': self._disk_bytes,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hit_ratio, 3),
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'disk_evictions': self.disk_evictions,
+            'saved_seconds': round(self.saved_seconds, 3),
+        }
+
+    def _remember(self, entry):
+        self._memory[entry.key] = entry
+        self._memory_bytes += entry.size
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+            self.evictions += 1
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    def _scan_disk(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            key, extension = os.path.splitext(name)
+            if extension != '.wav' or not os.path.exists(self._path(key, '.json')):
+                continue
+            stat = os.stat(self._path(key, '.wav'))
+            entries.append((stat.st_mtime, key, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._trim_disk()
+
+    def _load(self, key):
+        try:
+            with open(self._path(key, '.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            with wave.open(self._path(key, '.wav'), 'rb') as wav:
+                pcm = wav.readframes(wav.getnframes())
+        except (OSError, ValueError, wave.Error, EOFError):
+            self._forget(key)
+            return None
+        # Refresh the mtime so the disk order survives restarts
+        os.utime(self._path(key, '.wav'))
+        return CachedResponse(key, meta.get('text', ''), pcm, meta.get('first_audio_latency'))
+
+    def _write(self, entry):
+        # Files are written outside the lock; only the disk index update holds it
+        meta = {'text': entry.text, 'first_audio_latency': entry.first_audio_latency, 'created_at': time.time()}
+        wav_path = self._path(entry.key, '.wav')
+        tmp_suffix = f'.{threading.get_ident()}.tmp'
+        try:
+            with open(self._path(entry.key, '.json' + tmp_suffix), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            with wave.open(wav_path + tmp_suffix, 'wb') as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(self.sample_rate)
+                wav.writeframes(entry.pcm)
+            with self._lock:
+                os.replace(self._path(entry.key, '.json' + tmp_suffix), self._path(entry.key, '.json'))
+                os.replace(wav_path + tmp_suffix, wav_path)
+                size = os.path.getsize(wav_path)
+                self._disk_bytes += size - self._disk.pop(entry.key, 0)
+                self._disk[entry.key] = size
+                self._trim_disk()
+        except OSError:
+            return
+
+    def _trim_disk(self):
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            self._forget(next(iter(self._disk)))
+            self.disk_evictions += 1
+
+    def _forget(self, key):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        for extension in ('.wav', '.json'):
+            try:
+                os.remove(self._path(key, extension))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,217 @@
+import struct
+
+import numpy as np
+
+try:
+    import opuslib
+except ImportError:  # optional dependency, only needed for the 'opus' encoding
+    opuslib = None
+
+_MULAW_BIAS = 0x21
+_MULAW_CLIP = 8159
+_MULAW_SEGMENT_ENDS = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+
+_IMA_STEPS = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767], dtype=np.int32)
+_IMA_INDEX_ADJUST = np.array([-1, -1, -1, -1, 2, 4, 6, 8] * 2, dtype=np.int32)
+# Reconstructed magnitude per (step index, 3-bit code), as in the reference decoder
+_IMA_DELTAS = ((_IMA_STEPS[:, None] >> 3)
+               + ((np.arange(8) >> 2) & 1) * _IMA_STEPS[:, None]
+               + ((np.arange(8) >> 1) & 1) * (_IMA_STEPS[:, None] >> 1)
+               + (np.arange(8) & 1) * (_IMA_STEPS[:, None] >> 2))
+
+
+def _build_mulaw_tables():
+    # Reference G.711 encoder on 14-bit magnitudes (same output as audioop)
+    samples = np.arange(-32768, 32768, dtype=np.int32) >> 2
+    mask = np.where(samples < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(samples), _MULAW_CLIP) + _MULAW_BIAS
+    segment = np.searchsorted(_MULAW_SEGMENT_ENDS, magnitude)
+    encode = ((segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)) ^ mask
+    encode = np.where(segment >= 8, 0x7F ^ mask, encode).astype(np.uint8)
+
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    magnitude = (((codes & 0x0F) << 3) + 0x84 << exponent) - 0x84
+    decode = np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+    return encode, decode
+
+
+# Indexed by sample + 32768 and by code respectively
+_MULAW_ENCODE, _MULAW_DECODE = _build_mulaw_tables()
+
+
+class PCM16Codec:
+    """Identity codec: raw little-endian PCM16."""
+
+    name = 'pcm16'
+
+    def encode(self, pcm):
+        return pcm
+
+    def decode(self, data):
+        return data
+
+
+class MuLawCodec:
+    """G.711 mu-law, one byte per sample, through 64 K / 256 entry lookup tables."""
+
+    name = 'mulaw'
+
+    def encode(self, pcm):
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)
+        return _MULAW_ENCODE[samples.astype(np.int32) + 32768].tobytes()
+
+    def decode(self, data):
+        return _MULAW_DECODE[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+
+class ADPCMCodec:
+    """IMA-ADPCM in independent blocks, four bits per sample.
+
+    Each block is a 4-byte header (first sample as int16, step index, pad)
+    followed by ``block_samples`` nibbles, low nibble first. Blocks do not
+    depend on each other, so a chunk is coded with one NumPy operation per
+    sample position across all of its blocks instead of one Python
+    iteration per sample. The starting step index of a block is estimated
+    from its first sample differences. The last block of a chunk may be
+    shorter; an odd sample count gains one trailing sample.
+    """
+
+    name = 'adpcm'
+
+    def __init__(self, block_samples=64):
+        self.block_samples = block_samples
+        self.block_bytes = 4 + block_samples // 2
+
+    def encode(self, pcm):
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)
+        count = samples.size
+        if count == 0:
+            return b''
+        size = self.block_samples
+        blocks_count = -(-count // size)
+        blocks = np.pad(samples.astype(np.int32), (0, blocks_count * size - count), mode='edge')
+        blocks = blocks.reshape(blocks_count, size)
+
+        first_steps = np.abs(np.diff(blocks[:, :9], axis=1)).mean(axis=1) if size > 1 else np.zeros(blocks_count)
+        index = np.clip(np.searchsorted(_IMA_STEPS, first_steps), 0, 88).astype(np.int32)
+        start_index = index.copy()
+        predictor = blocks[:, 0].copy()
+        codes = np.empty((blocks_count, size), dtype=np.uint8)
+
+        for i in range(size):
+            diff = blocks[:, i] - predictor
+            negative = diff < 0
+            code = np.minimum((np.abs(diff) << 2) // _IMA_STEPS[index], 7)
+            delta = _IMA_DELTAS[index, code]
+            predictor = np.clip(predictor + np.where(negative, -delta, delta), -32768, 32767)
+            index = np.clip(index + _IMA_INDEX_ADJUST[code], 0, 88)
+            codes[:, i] = code | (negative << 3)
+
+        out = np.empty((blocks_count, self.block_bytes), dtype=np.uint8)
+        out[:, 0:2] = blocks[:, 0].astype('<i2').view(np.uint8).reshape(blocks_count, 2)
+        out[:, 2] = start_index
+        out[:, 3] = 0
+        out[:, 4:] = codes[:, 0::2] | (codes[:, 1::2] << 4)
+
+        # Trim the unused nibbles of the last block
+        last = count - (blocks_count - 1) * size
+        unused = (size - last - last % 2) // 2
+        data = out.tobytes()
+        return data[:len(data) - unused] if unused else data
+
+    def decode(self, data):
+        if len(data) <= 4:
+            return b''
+        blocks_count = -(-len(data) // self.block_bytes)
+        last_payload = len(data) - (blocks_count - 1) * self.block_bytes - 4
+        raw = np.frombuffer(data, dtype=np.uint8)
+        raw = np.pad(raw, (0, blocks_count * self.block_bytes - raw.size)).reshape(blocks_count, self.block_bytes)
+
+        predictor = raw[:, 0:2].copy().view('<i2').reshape(blocks_count).astype(np.int32)
+        index = np.minimum(raw[:, 2].astype(np.int32), 88)
+        payload = raw[:, 4:]
+        codes = np.empty((blocks_count, self.block_samples), dtype=np.int32)
+        codes[:, 0::2] = payload & 0x0F
+        codes[:, 1::2] = payload >> 4
+
+        samples = np.empty((blocks_count, self.block_samples), dtype=np.int16)
+        for i in range(self.block_samples):
+            code = codes[:, i]
+            delta = _IMA_DELTAS[index, code & 7]
+            predictor = np.clip(predictor + np.where(code & 8, -delta, delta), -32768, 32767)
+            index = np.clip(index + _IMA_INDEX_ADJUST[code], 0, 88)
+            samples[:, i] = predictor
+
+        total = (blocks_count - 1) * self.block_samples + 2 * last_payload
+        return samples.reshape(-1)[:total].tobytes()
+
+
+class OpusCodec:
+    """Opus through ``opuslib`` (libopus), for the browser leg only.
+
+    Encoded chunks are a sequence of packets, each prefixed with its length
+    as a big-endian uint16. PCM is buffered until a whole ``frame_ms``
+    frame is available, so the encoder and decoder are stateful.
+    """
+
+    name = 'opus'
+    SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+    def __init__(self, sample_rate, frame_ms=20, bitrate=24000):
+        if opuslib is None:
+            raise ValueError("the 'opuslib' package is required for the opus encoding")
+        if sample_rate not in self.SAMPLE_RATES:
+            raise ValueError(f"opus does not support {sample_rate} Hz")
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self._encoder = opuslib.Encoder(sample_rate, 1, opuslib.APPLICATION_VOIP)
+        self._encoder.bitrate = bitrate
+        self._decoder = opuslib.Decoder(sample_rate, 1)
+        self._pending = bytearray()
+
+    def encode(self, pcm):
+        self._pending += pcm
+        frame_bytes = self.frame_samples * 2
+        packets = []
+        while len(self._pending) >= frame_bytes:
+            packet = self._encoder.encode(bytes(self._pending[:frame_bytes]), self.frame_samples)
+            del self._pending[:frame_bytes]
+            packets.append(struct.pack('>H', len(packet)) + packet)
+        return b''.join(packets)
+
+    def decode(self, data):
+        pcm = []
+        offset = 0
+        while offset + 2 <= len(data):
+            (length,) = struct.unpack_from('>H', data, offset)
+            offset += 2
+            pcm.append(self._decoder.decode(bytes(data[offset:offset + length]), self.frame_samples))
+            offset += length
+        return b''.join(pcm)
+
+
+def available_encodings():
+    encodings = ['pcm16', 'mulaw', 'adpcm']
+    if opuslib is not None:
+        encodings.append('opus')
+    return encodings
+
+
+def create_codec(encoding, sample_rate):
+    """Return a codec instance for one direction of one session."""
+    if encoding == 'pcm16':
+        return PCM16Codec()
+    if encoding == 'mulaw':
+        return MuLawCodec()
+    if encoding == 'adpcm':
+        return ADPCMCodec()
+    if encoding == 'opus':
+        return OpusCodec(sample_rate)
+    raise ValueError(f"unsupported audio encoding: {encoding}")
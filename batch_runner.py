@@ -0,0 +1,419 @@
+import base64
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from recorder import StreamingWavWriter
+from resample import StreamingResampler
+from stream_handler import UPSTREAM_SAMPLE_RATE
+from upload_ingest import AudioFileReader
+from upstream_resume import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+
+class ClipFailed(RuntimeError):
+    """One attempt at a clip failed; ``retry`` is False when retrying cannot help."""
+
+    def __init__(self, message, retry=True):
+        super().__init__(message)
+        self.retry = retry
+
+
+def _failed_result(index, path, attempts, error):
+    return {'index': index, 'clip': os.path.basename(path), 'status': 'failed', 'attempts': attempts,
+            'error': error, 'transcript': None, 'response_text': None, 'audio_file': None,
+            'audio_in_seconds': 0.0, 'audio_out_seconds': 0.0, 'latency_seconds': None}
+
+
+class BatchJob:
+    """A set of clips processed by the runner, with per-clip results and a report.
+
+    Results land in ``directory``: one WAV per response, ``results.json``
+    and ``report.json`` once every clip has finished.
+    """
+
+    def __init__(self, clips, output_dir, name=None, owner=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.owner = owner
+        self.clips = list(clips)
+        self.directory = os.path.join(output_dir, self.id)
+        self.results = [None] * len(self.clips)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+        self._remaining = len(self.clips)
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.done.is_set():
+            return 'done'
+        return 'running' if self.started_at is not None else 'queued'
+
+    def mark_started(self):
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = time.monotonic()
+
+    def record(self, index, result):
+        """Store a clip result; return True when it was the batch's last clip."""
+        with self._lock:
+            self.results[index] = result
+            self._remaining -= 1
+            if self._remaining:
+                return False
+            self.finished_at = time.monotonic()
+        try:
+            with open(os.path.join(self.directory, 'results.json'), 'w', encoding='utf-8') as f:
+                json.dump(self.results, f, ensure_ascii=False, indent=2)
+            with open(os.path.join(self.directory, 'report.json'), 'w', encoding='utf-8') as f:
+                json.dump(self.report(), f, indent=2)
+        finally:
+            self.done.set()
+        return True
+
+    def report(self):
+        """Throughput summary: counts, retries, audio volume, wall time and clip latency."""
+        results = [result for result in self.results if result is not None]
+        succeeded = [result for result in results if result['status'] == 'done']
+        end = self.finished_at or time.monotonic()
+        wall = end - self.started_at if self.started_at is not None else 0.0
+        audio_in = sum(result['audio_in_seconds'] for result in succeeded)
+        latencies = [result['latency_seconds'] for result in succeeded]
+        return {
+            'clips': len(self.clips),
+            'completed': len(results),
+            'succeeded': len(succeeded),
+            'failed': len(results) - len(succeeded),
+            'retries': sum(result['attempts'] - 1 for result in results),
+            'wall_seconds': round(wall, 3),
+            'audio_in_seconds': round(audio_in, 3),
+            'audio_out_seconds': round(sum(result['audio_out_seconds'] for result in succeeded), 3),
+            'clips_per_second': round(len(results) / wall, 3) if wall else None,
+            'realtime_factor': round(audio_in / wall, 2) if wall else None,
+            'latency_p50': round(float(np.percentile(latencies, 50)), 3) if latencies else None,
+            'latency_p95': round(float(np.percentile(latencies, 95)), 3) if latencies else None,
+        }
+
+    def snapshot(self):
+        snapshot = {
+            'batch_id': self.id,
+            'name': self.name,
+            'state': self.state,
+            'clips': len(self.clips),
+            'report': self.report(),
+        }
+        if self.done.is_set():
+            snapshot['results'] = self.results
+        return snapshot
+
+
+class _BatchWorker:
+    """One upstream connection, reused for every clip its worker processes.
+
+    Turns are committed explicitly, and the clip's conversation items are
+    deleted afterwards so the next clip starts from an empty context.
+    """
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.handler = None
+        self.events = None
+        self.connections = 0
+
+    def connect(self):
+        self.close()
+        events = queue.Queue()
+        handler = self.runner.handler_factory(lambda event, data: events.put((event, data)))
+        try:
+            started = handler.start()
+        except Exception:
+            started = False
+        if not started:
+            handler.close()
+            raise ClipFailed('connexion OpenAI impossible')
+        self.handler = handler
+        self.events = events
+        self.connections += 1
+        self._wait(lambda data: data.get('type') == 'session.updated', time.monotonic() + self.runner.connect_timeout)
+
+    def close(self):
+        if self.handler is not None:
+            try:
+                self.handler.close()
+            except Exception:
+                pass
+            self.handler = None
+
+    @property
+    def connected(self):
+        return self.handler is not None and self.handler.connected.is_set()
+
+    def _next_message(self, deadline):
+        """Next server message before ``deadline``; transport failures raise ClipFailed."""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ClipFailed('délai dépassé')
+            try:
+                event, data = self.events.get(timeout=remaining)
+            except queue.Empty:
+                raise ClipFailed('délai dépassé')
+            if event == 'close':
+                raise ClipFailed('connexion OpenAI fermée')
+            if event != 'message':
+                continue
+            if data.get('type') == 'error':
+                raise ClipFailed(data.get('error', {}).get('message', 'erreur OpenAI'))
+            return data
+
+    def _wait(self, predicate, deadline):
+        while not predicate(self._next_message(deadline)):
+            pass
+
+    def process(self, job, index):
+        """Run a clip with retries and return its result."""
+        path = job.clips[index]
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                result = self._attempt(job, index, path)
+                result['attempts'] = attempts
+                return result
+            except Exception as e:
+                retry = getattr(e, 'retry', True)
+                if retry:
+                    # Leftover events of a failed attempt must not leak into the next clip
+                    self.close()
+                if not retry or attempts > self.runner.max_retries:
+                    return _failed_result(index, path, attempts, str(e))
+                self.runner.sleep(backoff_delay(attempts - 1, self.runner.retry_base_delay,
+                                                self.runner.retry_max_delay))
+
+    def _send_clip(self, path):
+        """Stream a clip as ``append_ms`` appends; return its duration in seconds."""
+        samples = 0
+        try:
+            reader = AudioFileReader(path, self.runner.raw_rate)
+        except (ValueError, OSError) as e:
+            raise ClipFailed(str(e), retry=False)
+        with reader:
+            resampler = None
+            if reader.sample_rate != UPSTREAM_SAMPLE_RATE:
+                resampler = StreamingResampler(reader.sample_rate, UPSTREAM_SAMPLE_RATE)
+            block_frames = max(1, reader.sample_rate * self.runner.append_ms // 1000)
+            while True:
+                pcm = reader.read(block_frames)
+                if not pcm:
+                    break
+                if resampler is not None:
+                    pcm = resampler.process(pcm)
+                if not pcm:
+                    continue
+                if not self.handler.send_audio(pcm):
+                    raise ClipFailed('connexion OpenAI fermée')
+                samples += len(pcm) // 2
+        return samples / UPSTREAM_SAMPLE_RATE
+
+    def _attempt(self, job, index, path):
+        if not self.connected:
+            self.connect()
+        started = time.monotonic()
+        deadline = started + self.runner.clip_timeout
+        handler = self.handler
+
+        handler.send({"type": "input_audio_buffer.clear"})
+        audio_in = self._send_clip(path)
+        if not audio_in:
+            raise ClipFailed('clip vide', retry=False)
+        handler.send({"type": "input_audio_buffer.commit"})
+        handler.send({"type": "response.create"})
+
+        stem = os.path.splitext(os.path.basename(path))[0]
+        audio_file = f'{index:03d}_{stem}.wav'
+        writer = None
+        item_ids = []
+        transcript = None
+        transcribed = False
+        response_text = None
+        response_done_at = None
+        try:
+            while not (response_done_at and transcribed):
+                # The input transcription may trail the response; wait for it a little
+                wait_until = deadline
+                if response_done_at:
+                    wait_until = min(deadline, response_done_at + self.runner.transcript_grace)
+                try:
+                    data = self._next_message(wait_until)
+                except ClipFailed:
+                    if response_done_at and time.monotonic() < deadline:
+                        break
+                    raise
+                msg_type = data.get('type')
+                if msg_type == 'input_audio_buffer.committed' and data.get('item_id'):
+                    item_ids.append(data['item_id'])
+                elif msg_type in ('conversation.item.input_audio_transcription.completed',
+                                  'conversation.item.input_audio_transcription.failed'):
+                    # Ignore the late transcription of a previous clip
+                    if data.get('item_id') in item_ids:
+                        transcript = data.get('transcript')
+                        transcribed = True
+                elif msg_type == 'response.audio.delta':
+                    if writer is None:
+                        writer = StreamingWavWriter(os.path.join(job.directory, audio_file), UPSTREAM_SAMPLE_RATE)
+                    writer.write(base64.b64decode(data.get('delta', '')))
+                elif msg_type == 'response.audio_transcript.done':
+                    response_text = data.get('transcript')
+                elif msg_type == 'response.text.done':
+                    response_text = data.get('text')
+                elif msg_type == 'response.done':
+                    response = data.get('response', {})
+                    status = response.get('status', 'completed')
+                    if status != 'completed':
+                        raise ClipFailed(f'réponse {status}')
+                    item_ids.extend(item['id'] for item in response.get('output', []) if item.get('id'))
+                    response_done_at = time.monotonic()
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if handler.connected.is_set():
+            for item_id in item_ids:
+                handler.send({"type": "conversation.item.delete", "item_id": item_id})
+
+        audio_out = writer.data_size / 2 / UPSTREAM_SAMPLE_RATE if writer is not None else 0.0
+        return {'index': index, 'clip': os.path.basename(path), 'status': 'done', 'attempts': 1, 'error': None,
+                'transcript': transcript, 'response_text': response_text,
+                'audio_file': audio_file if writer is not None else None,
+                'audio_in_seconds': round(audio_in, 3), 'audio_out_seconds': round(audio_out, 3),
+                'latency_seconds': round(response_done_at - started, 3)}
+
+
+class BatchRunner:
+    """Offline processing of voicemail-style clips on a bounded worker pool.
+
+    ``workers`` threads share one queue of clips across all batches. Each
+    worker keeps its upstream connection open between clips, so the
+    WebSocket and session setup is paid once per worker instead of once per
+    clip, and closes it after ``idle_timeout`` seconds without work. A clip
+    is sent as ``append_ms`` appends, committed, answered with
+    ``response.create``, and retried up to ``max_retries`` times with
+    jittered backoff on a new connection.
+    """
+
+    def __init__(self, handler_factory, output_dir, workers=2, max_retries=2, clip_timeout=120,
+                 append_ms=1000, idle_timeout=60, connect_timeout=10, transcript_grace=5,
+                 retry_base_delay=0.5, retry_max_delay=10, raw_rate=24000, max_batches=100,
+                 on_clip=None, on_batch=None, start_background_task=None, sleep=time.sleep):
+        self.handler_factory = handler_factory
+        self.output_dir = output_dir
+        self.workers = workers
+        self.max_retries = max_retries
+        self.clip_timeout = clip_timeout
+        self.append_ms = append_ms
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.transcript_grace = transcript_grace
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.raw_rate = raw_rate
+        self.max_batches = max_batches
+        self.on_clip = on_clip
+        self.on_batch = on_batch
+        self.sleep = sleep
+        self._start_background_task = start_background_task or self._start_thread
+        self._queue = queue.Queue()
+        self._batches = {}
+        self._workers = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _start_thread(target):
+        thread = threading.Thread(target=target, name='batch-worker', daemon=True)
+        thread.start()
+        return thread
+
+    def submit(self, clips, name=None, owner=None):
+        """Queue a batch of clip paths and return its BatchJob."""
+        if not clips:
+            raise ValueError('empty batch')
+        job = BatchJob(clips, self.output_dir, name=name, owner=owner)
+        os.makedirs(job.directory, exist_ok=True)
+        with self._lock:
+            self._batches[job.id] = job
+            while len(self._batches) > self.max_batches:
+                oldest = next(iter(self._batches.values()))
+                if not oldest.done.is_set():
+                    break
+                del self._batches[oldest.id]
+            missing = self.workers - len(self._workers)
+            new_workers = [_BatchWorker(self) for _ in range(max(0, missing))]
+            self._workers.extend(new_workers)
+        for index in range(len(job.clips)):
+            self._queue.put((job, index))
+        for worker in new_workers:
+            self._start_background_task(lambda worker=worker: self._run(worker))
+        return job
+
+    def get(self, batch_id):
+        return self._batches.get(batch_id)
+
+    def _run(self, worker):
+        try:
+            while True:
+                try:
+                    job, index = self._queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    worker.close()
+                    continue
+                job.mark_started()
+                result = worker.process(job, index)
+                self._finish_clip(job, index, result)
+        finally:
+            # A worker that dies anyway leaves its slot to the next submit
+            worker.close()
+            with self._lock:
+                self._workers.remove(worker)
+
+    def _finish_clip(self, job, index, result):
+        """Record a clip result and run the callbacks; failures are logged, never raised."""
+        try:
+            finished = job.record(index, result)
+        except Exception:
+            # Only the batch's last clip writes files, so the batch is over anyway
+            logger.exception(f'batch {job.id}: could not write the results')
+            finished = True
+        if self.on_clip:
+            self._callback(self.on_clip, job, result)
+        if finished and self.on_batch:
+            self._callback(self.on_batch, job)
+
+    @staticmethod
+    def _callback(callback, job, *args):
+        try:
+            callback(job, *args)
+        except Exception:
+            logger.exception(f'batch {job.id}: {getattr(callback, "__name__", "callback")} failed')
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            workers = list(self._workers)
+        return {
+            'workers': len(workers),
+            'connected': sum(1 for worker in workers if worker.connected),
+            'connections_opened': sum(worker.connections for worker in workers),
+            'queued': self._queue.qsize(),
+        }
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark des codecs du lien navigateur (audio_codecs.py) : débit en ko/s
+d'audio, économie par rapport au PCM16, rapport signal/bruit et temps CPU
+d'encodage et de décodage par seconde d'audio, en trames de 100 ms à 24 kHz.
+Le débit base64 correspond à l'ancien transport JSON (audio_output).
+
+Usage : python benchmarks/bench_audio_codecs.py [secondes_audio]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from audio_codecs import available_encodings, create_codec  # noqa: E402
+
+SAMPLE_RATE = 24000
+FRAME_MS = 100
+
+
+def speech_like(seconds):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    # Voix approximative : fondamentale modulée, harmoniques et souffle
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2
+    signal = sum(np.sin(2 * np.pi * 180 * k * t) / k for k in range(1, 8)) * 6000 * envelope
+    return (signal + rng.standard_normal(t.size) * 200).astype(np.int16)
+
+
+def run(encoding, samples):
+    frame = SAMPLE_RATE * FRAME_MS // 1000 * 2
+    pcm = samples.tobytes()
+    frames = [pcm[offset:offset + frame] for offset in range(0, len(pcm), frame)]
+    encoder = create_codec(encoding, SAMPLE_RATE)
+    decoder = create_codec(encoding, SAMPLE_RATE)
+
+    start = time.process_time()
+    encoded = [encoder.encode(chunk) for chunk in frames]
+    encode_s = time.process_time() - start
+    start = time.process_time()
+    decoded = b''.join(decoder.decode(chunk) for chunk in encoded)
+    decode_s = time.process_time() - start
+
+    seconds = samples.size / SAMPLE_RATE
+    wire = sum(len(chunk) for chunk in encoded)
+    out = np.frombuffer(decoded, dtype=np.int16)[:samples.size].astype(np.float64)
+    reference = samples[:out.size].astype(np.float64)
+    noise = np.sum((reference - out) ** 2)
+    snr = 10 * np.log10(np.sum(reference ** 2) / noise) if noise else float('inf')
+    return wire / seconds / 1000, 1 - wire / len(pcm), snr, encode_s / seconds * 1e6, decode_s / seconds * 1e6
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    samples = speech_like(seconds)
+    print(f"{seconds:.0f}s d'audio 24 kHz en trames de {FRAME_MS} ms")
+    print(f"{'codec':<8}{'ko/s':>8}{'économie':>10}{'SNR (dB)':>10}{'encodage (µs/s)':>17}{'décodage (µs/s)':>17}")
+    print(f"{'base64':<8}{SAMPLE_RATE * 2 * 4 / 3 / 1000:>8.1f}{-1 / 3:>10.0%}{'-':>10}{'-':>17}{'-':>17}")
+    for encoding in available_encodings():
+        rate, savings, snr, encode_us, decode_us = run(encoding, samples)
+        print(f"{encoding:<8}{rate:>8.1f}{savings:>10.0%}{snr:>10.1f}{encode_us:>17.0f}{decode_us:>17.0f}")
+
+
+if __name__ == '__main__':
+    main()
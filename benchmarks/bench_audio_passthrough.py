@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark du relais response.audio.delta : aller-retour base64 historique
+contre relais direct du base64 d'OpenAI (avec ou sans enregistrement).
+
+Usage : python benchmarks/bench_audio_passthrough.py [secondes_audio]
+"""
+
+import base64
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+SAMPLE_RATE = 24000
+DELTA_MS = 50
+
+
+def make_deltas(seconds):
+    samples = int(SAMPLE_RATE * DELTA_MS / 1000)
+    rng = np.random.default_rng(0)
+    count = int(seconds * 1000 / DELTA_MS)
+    return [base64.b64encode(rng.integers(-32768, 32767, samples, dtype=np.int16).tobytes()).decode()
+            for _ in range(count)]
+
+
+def legacy(delta, audio_log):
+    audio_bytes = base64.b64decode(delta)
+    audio_log.append(audio_bytes)
+    return base64.b64encode(audio_bytes).decode()
+
+
+def passthrough(delta, audio_log):
+    return delta
+
+
+def passthrough_recording(delta, audio_log):
+    audio_log.append(base64.b64decode(delta))
+    return delta
+
+
+def measure(func, deltas, seconds):
+    audio_log = []
+    start = time.process_time()
+    for delta in deltas:
+        func(delta, audio_log)
+    cpu = time.process_time() - start
+
+    # Octets alloués transitoirement par delta (hors journal conservé)
+    audio_log = []
+    allocated = 0
+    tracemalloc.start()
+    for delta in deltas:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func(delta, audio_log)
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+    tracemalloc.stop()
+
+    return cpu / seconds * 1e6, allocated / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 600
+    deltas = make_deltas(seconds)
+    print(f"{seconds:.0f}s d'audio, deltas de {DELTA_MS} ms ({len(deltas)} messages)")
+    print(f"{'mode':<24}{'CPU µs / s audio':>18}{'octets alloués / s audio':>28}")
+    for name, func in (('aller-retour base64', legacy),
+                       ('relais direct', passthrough),
+                       ('relais + enregistrement', passthrough_recording)):
+        cpu, allocated = measure(func, deltas, seconds)
+        print(f"{name:<24}{cpu:>18.1f}{allocated:>28.0f}")
+
+
+if __name__ == '__main__':
+    main()
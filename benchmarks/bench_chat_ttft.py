@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark du délai du premier token (TTFT) du chat texte (gpt_handler.py)
+contre un serveur SSE local imitant /v1/chat/completions (réponse en
+chunked transfer encoding, comme l'API).
+
+Le serveur ajoute un délai à chaque nouvelle connexion TCP (--connect-ms)
+pour représenter l'établissement TCP + TLS vers l'API, puis un délai avant
+le premier token (--ttft-ms). Compare l'ancien client (requests.post par
+appel, iter_lines par blocs de 512 octets) au client partagé.
+
+Usage : python benchmarks/bench_chat_ttft.py [--requests 50] [--concurrency 1 8] [--connect-ms 60]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from gpt_handler import GPTHandler  # noqa: E402
+
+
+class ChatStub(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connect_ms = 60
+    ttft_ms = 200
+    token_ms = 20
+    tokens = 40
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+        time.sleep(self.connect_ms / 1000)
+
+    def log_message(self, *args):
+        pass
+
+    def write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(self.ttft_ms / 1000)
+        for index in range(self.tokens):
+            chunk = {"choices": [{"index": 0, "delta": {"content": f" mot{index}"}}]}
+            self.write_chunk(f'data: {json.dumps(chunk)}\n\n'.encode())
+            time.sleep(self.token_ms / 1000)
+        self.write_chunk(b'data: [DONE]\n\n')
+        self.write_chunk(b'')
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # L'ancien client ferme la connexion sans lire la fin du flux
+        pass
+
+
+def legacy_stream(url, messages):
+    """Client d'origine : une requête et une connexion par appel, lecture par blocs de 512 octets"""
+    headers = {"Authorization": "Bearer bench", "Content-Type": "application/json"}
+    payload = {"model": "bench", "messages": messages, "stream": True}
+    with requests.post(url, headers=headers, json=payload, stream=True) as resp:
+        for line in resp.iter_lines():
+            if line.startswith(b"data: "):
+                data = line[len(b"data: "):].decode()
+                if data == "[DONE]":
+                    break
+                yield json.loads(data)["choices"][0]["delta"].get("content")
+
+
+def measure(stream):
+    start = time.perf_counter()
+    first = None
+    for _ in stream():
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def run(stream, count, concurrency):
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda _: measure(stream), range(count)))
+    ttft = np.array([r[0] for r in results]) * 1000
+    total = np.array([r[1] for r in results]) * 1000
+    return np.percentile(ttft, 50), np.percentile(ttft, 95), np.percentile(total, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--connect-ms', type=float, default=60)
+    parser.add_argument('--ttft-ms', type=float, default=200)
+    args = parser.parse_args()
+
+    ChatStub.connect_ms = args.connect_ms
+    ChatStub.ttft_ms = args.ttft_ms
+    server = QuietServer(('127.0.0.1', 0), ChatStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/v1/chat/completions'
+    messages = [{"role": "user", "content": "Bonjour"}]
+
+    print(f"serveur : connexion {args.connect_ms:.0f} ms, premier token {args.ttft_ms:.0f} ms, "
+          f"{ChatStub.tokens} tokens espacés de {ChatStub.token_ms} ms")
+    print(f"{'client':<34}{'concurrence':>12}{'TTFT p50/p95 (ms)':>20}{'total p50 (ms)':>16}{'connexions':>12}")
+    for concurrency in args.concurrency:
+        handler = GPTHandler('bench', model='bench', url=url, pool_size=concurrency)
+        clients = [
+            ('requests.post + iter_lines(512)', lambda: legacy_stream(url, messages)),
+            ('GPTHandler (Session partagée)', lambda: handler.stream_deltas(messages)),
+        ]
+        for name, stream in clients:
+            ChatStub.connections = 0
+            p50, p95, total = run(stream, args.requests, concurrency)
+            print(f"{name:<34}{concurrency:>12}{p50:>11.1f}/{p95:<8.1f}{total:>16.1f}{ChatStub.connections:>12}")
+        handler.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
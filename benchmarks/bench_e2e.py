@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark de bout en bout : N dialogues simultanés ouverts par
+/api/start_dialogue sur l'application, avec realtime_stub.py à la place
+de l'API OpenAI (trace rejouée avec son cadencement, VAD serveur simulé).
+
+Chaque client se connecte, diffuse le micro en trames de 100 ms via
+l'événement Socket.IO audio_in, puis attend la réponse audio après chaque
+tour de parole. L'application tourne dans un sous-processus par
+configuration pour mesurer son CPU et sa RSS maximale.
+
+Usage : python benchmarks/bench_e2e.py [--sessions 10 50 100] [--turns 2] [--transport thread]
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+try:
+    import psutil
+    import socketio
+except ImportError as e:
+    sys.exit(f"Dépendance manquante pour le benchmark : {e.name}")
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SAMPLE_RATE = 24000
+CHUNK_MS = 100
+SILENCE = b'\x00\x00' * (SAMPLE_RATE * CHUNK_MS // 1000)
+SPEECH = (np.random.default_rng(0).standard_normal(SAMPLE_RATE * CHUNK_MS // 1000) * 6000).astype(np.int16).tobytes()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float('nan')
+
+
+class Client(threading.Thread):
+    """Un navigateur simulé : connexion, dialogue, tours de parole."""
+
+    def __init__(self, base_url, index, turns, speech_ms, delay):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.index = index
+        self.turns = turns
+        self.speech_chunks = max(1, speech_ms // CHUNK_MS)
+        self.delay = delay
+        self.ready_latency = None
+        self.ack_latencies = []
+        self.first_audio_latencies = []
+        self.chunks_acked = 0
+        self.chunks_refused = 0
+        self.deltas = 0
+        self.audio_bytes = 0
+        self.error = None
+        self._ready = threading.Event()
+        self._first_audio = threading.Event()
+        self._first_audio_at = 0.0
+        self._last_audio = 0.0
+        self._seq = 0
+
+    def on_audio_output(self, data):
+        self.deltas += 1
+        self.audio_bytes += len(data.get('audio', '')) * 3 // 4
+        self._last_audio = time.perf_counter()
+        if not self._first_audio.is_set():
+            self._first_audio_at = self._last_audio
+            self._first_audio.set()
+
+    def send_chunk(self, sio, pcm):
+        self._seq += 1
+        sent = time.perf_counter()
+        ack = sio.call('audio_in', {'seq': self._seq, 'audio': pcm}, timeout=10)
+        self.ack_latencies.append(time.perf_counter() - sent)
+        if ack and ack.get('ok'):
+            self.chunks_acked += 1
+        else:
+            self.chunks_refused += 1
+        time.sleep(max(0.0, CHUNK_MS / 1000 - (time.perf_counter() - sent)))
+
+    def run(self):
+        time.sleep(self.delay)
+        http = requests.Session()
+        sio = socketio.Client(reconnection=False)
+        sio.on('session_ready', lambda data: self._ready.set())
+        sio.on('audio_output', self.on_audio_output)
+        try:
+            http.post(f'{self.base_url}/login', data={'username': f'bench{self.index}', 'password': ''},
+                      allow_redirects=False)
+            cookie = '; '.join(f'{name}={value}' for name, value in http.cookies.items())
+            sio.connect(self.base_url, headers={'Cookie': cookie}, transports=['websocket'], wait_timeout=10)
+
+            start = time.perf_counter()
+            resp = http.post(f'{self.base_url}/api/start_dialogue')
+            if resp.status_code != 200 or not self._ready.wait(10):
+                raise RuntimeError(f'démarrage impossible ({resp.status_code})')
+            self.ready_latency = time.perf_counter() - start
+
+            for _ in range(self.turns):
+                self._first_audio.clear()
+                for _ in range(self.speech_chunks):
+                    self.send_chunk(sio, SPEECH)
+                speech_end = time.perf_counter()
+                # Le micro continue d'envoyer du silence pendant la réponse
+                while not self._first_audio.is_set() and time.perf_counter() - speech_end < 10:
+                    self.send_chunk(sio, SILENCE)
+                if not self._first_audio.is_set():
+                    raise RuntimeError('aucune réponse audio')
+                self.first_audio_latencies.append(self._first_audio_at - speech_end)
+                while time.perf_counter() - self._last_audio < 0.5:
+                    self.send_chunk(sio, SILENCE)
+
+            http.post(f'{self.base_url}/api/stop_dialogue')
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            try:
+                sio.disconnect()
+            except Exception:
+                pass
+
+
+def start_app(port, stub_url, transport):
+    env = dict(os.environ, PORT=str(port), REALTIME_URL=stub_url, REALTIME_TRANSPORT=transport,
+               OPENAI_API_KEY='bench-key', RECORD_AUDIO='0', MON_USERNAME='', PASSWORD='')
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'app.py')], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/', timeout=1).status_code == 200:
+                return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("l'application n'a pas démarré")
+
+
+def run_config(sessions, args, stub_url):
+    port = free_port()
+    app_process = start_app(port, stub_url, args.transport)
+    monitor = psutil.Process(app_process.pid)
+    max_rss = [monitor.memory_info().rss]
+    running = threading.Event()
+    running.set()
+
+    def sample_rss():
+        while running.is_set():
+            max_rss[0] = max(max_rss[0], monitor.memory_info().rss)
+            time.sleep(0.2)
+
+    threading.Thread(target=sample_rss, daemon=True).start()
+    clients = [Client(f'http://127.0.0.1:{port}', i, args.turns, args.speech_ms, args.ramp * i / sessions)
+               for i in range(sessions)]
+    cpu_before = sum(monitor.cpu_times()[:2])
+    wall_start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    wall = time.perf_counter() - wall_start
+    cpu = sum(monitor.cpu_times()[:2]) - cpu_before
+    running.clear()
+    app_process.terminate()
+    app_process.wait()
+
+    ok = [c for c in clients if c.error is None]
+    return {
+        'sessions': sessions,
+        'ok': len(ok),
+        'errors': sorted({c.error for c in clients if c.error}),
+        'ready': [c.ready_latency for c in ok],
+        'ack': [v for c in ok for v in c.ack_latencies],
+        'first_audio': [v for c in ok for v in c.first_audio_latencies],
+        'audio_in_s': sum(c.chunks_acked for c in clients) * CHUNK_MS / 1000 / wall,
+        'refused': sum(c.chunks_refused for c in clients),
+        'deltas_s': sum(c.deltas for c in clients) / wall,
+        'cpu_pct': cpu / wall * 100,
+        'rss_mb': max_rss[0] / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--turns', type=int, default=2)
+    parser.add_argument('--speech-ms', type=int, default=1500)
+    parser.add_argument('--transport', default='thread', choices=['thread', 'asyncio'])
+    parser.add_argument('--ramp', type=float, default=2.0, help="étalement des démarrages (s)")
+    parser.add_argument('--speed', type=float, default=1.0, help="accélération du rejeu des réponses")
+    parser.add_argument('--trace', help="trace JSONL rejouée par le stub (par défaut : synthétique)")
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    trace_args = ['--trace', args.trace] if args.trace else ['--synthetic']
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, 'realtime_stub.py'), '--port', str(stub_port),
+                             '--speed', str(args.speed)] + trace_args, stdout=subprocess.PIPE, text=True)
+    stub.stdout.readline()
+    try:
+        print(f"transport {args.transport}, {args.turns} tours de {args.speech_ms} ms par session")
+        print(f"{'sessions':>8}{'ok':>5}{'prêt p50/p95 (ms)':>20}{'ack p50/p99 (ms)':>19}"
+              f"{'fin parole→audio p50/p95/p99 (ms)':>36}{'audio in (s/s)':>16}{'deltas/s':>10}"
+              f"{'CPU %':>8}{'RSS max (Mo)':>14}")
+        for sessions in args.sessions:
+            r = run_config(sessions, args, f'ws://127.0.0.1:{stub_port}')
+            print(f"{r['sessions']:>8}{r['ok']:>5}"
+                  f"{percentile(r['ready'], 50):>10.0f}/{percentile(r['ready'], 95):<9.0f}"
+                  f"{percentile(r['ack'], 50):>9.1f}/{percentile(r['ack'], 99):<9.1f}"
+                  f"{percentile(r['first_audio'], 50):>16.0f}/{percentile(r['first_audio'], 95):.0f}"
+                  f"/{percentile(r['first_audio'], 99):<10.0f}"
+                  f"{r['audio_in_s']:>16.1f}{r['deltas_s']:>10.0f}{r['cpu_pct']:>8.0f}{r['rss_mb']:>14.1f}")
+            if r['refused']:
+                print(f"         {r['refused']} trames refusées par la contre-pression")
+            for error in r['errors']:
+                print(f"         erreur : {error}")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark du traitement des messages OpenAI par VoiceSession, rejouant une
+trace d'événements : pipeline historique (json.loads dans le transport,
+json.dumps puis json.loads dans la session) contre décodage unique, avec
+chaque bibliothèque JSON disponible.
+
+Usage : python benchmarks/bench_message_dispatch.py [--trace trace.jsonl] [--turns 20]
+"""
+
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('OPENAI_API_KEY', 'bench-key')
+os.environ['RECORD_AUDIO'] = '0'
+
+import app  # noqa: E402
+import json_backend  # noqa: E402
+from realtime_trace import load_trace, synthetic_trace  # noqa: E402
+
+
+def legacy(voice_session, raw):
+    data = json.loads(raw)
+    voice_session.on_message(None, json.dumps(data))
+
+
+def single_parse(voice_session, raw):
+    voice_session.dispatch_message(json_backend.loads(raw))
+
+
+def measure(func, backend, messages, repeat):
+    json_backend.use_backend(backend)
+    voice_session = app.VoiceSession('bench')
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for raw in messages:
+            func(voice_session, raw)
+    elapsed = time.perf_counter() - start
+    voice_session.disconnect()
+    return elapsed / (repeat * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trace', help="trace JSONL enregistrée (par défaut : trace synthétique)")
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace) if args.trace else synthetic_trace(args.turns)
+    messages = [json.dumps(entry['event']) for entry in trace]
+    kinds = collections.Counter(entry['event']['type'] for entry in trace)
+    print(f"{len(messages)} messages ({kinds['response.audio.delta']} deltas audio, "
+          f"{sum(map(len, messages)) / 1e6:.1f} Mo)")
+
+    app.socketio.emit = lambda *args, **kwargs: None
+    print(f"{'pipeline':<32}{'µs / message':>14}")
+    print(f"{'historique (3 passes JSON)':<32}{measure(legacy, 'json', messages, args.repeat):>14.1f}")
+    for backend in ('json', 'orjson'):
+        if backend == 'orjson' and json_backend.orjson is None:
+            continue
+        label = f'décodage unique ({backend})'
+        print(f"{label:<32}{measure(single_parse, backend, messages, args.repeat):>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
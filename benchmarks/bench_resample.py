@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark du rééchantillonnage polyphase en flux (resample.py) : échantillons
+produits par seconde de CPU sur un cœur, pour les paires de fréquences
+courantes des navigateurs, avec des trames de 20 et 100 ms. Compare au
+rééchantillonnage en un bloc de scipy.signal.resample_poly.
+
+Usage : python benchmarks/bench_resample.py [secondes_audio]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.signal import resample_poly
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from resample import StreamingResampler, design_filter  # noqa: E402
+
+PAIRS = [(48000, 24000), (44100, 24000), (16000, 24000), (24000, 48000), (24000, 44100)]
+
+
+def streaming(samples, in_rate, out_rate, frame_ms):
+    resampler = StreamingResampler(in_rate, out_rate)
+    frame = in_rate * frame_ms // 1000 * 2
+    pcm = samples.tobytes()
+    start = time.process_time()
+    produced = 0
+    for offset in range(0, len(pcm), frame):
+        produced += len(resampler.process(pcm[offset:offset + frame])) // 2
+    return produced / (time.process_time() - start)
+
+
+def one_shot(samples, in_rate, out_rate):
+    resampler = StreamingResampler(in_rate, out_rate)
+    start = time.process_time()
+    out = resample_poly(samples.astype(np.float32), resampler.up, resampler.down)
+    return len(out) / (time.process_time() - start)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    rng = np.random.default_rng(0)
+    print(f"{seconds:.0f}s d'audio par paire, échantillons produits / s CPU (millions)")
+    print(f"{'paire':<18}{'trames 20 ms':>14}{'trames 100 ms':>15}{'un bloc':>10}{'conception filtre (ms)':>24}")
+    for in_rate, out_rate in PAIRS:
+        samples = (rng.standard_normal(int(in_rate * seconds)) * 3000).astype(np.int16)
+        resampler = StreamingResampler(in_rate, out_rate)
+        design_filter.cache_clear()
+        start = time.perf_counter()
+        design_filter(resampler.up, resampler.down)
+        design_ms = (time.perf_counter() - start) * 1000
+        print(f"{f'{in_rate}->{out_rate}':<18}"
+              f"{streaming(samples, in_rate, out_rate, 20) / 1e6:>14.1f}"
+              f"{streaming(samples, in_rate, out_rate, 100) / 1e6:>15.1f}"
+              f"{one_shot(samples, in_rate, out_rate) / 1e6:>10.1f}"
+              f"{design_ms:>24.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test de charge des transports temps réel : thread par session contre
+boucle asyncio partagée, face au serveur local realtime_stub.py.
+
+Chaque configuration tourne dans un sous-processus pour isoler la mémoire
+(RSS maximale), le nombre de threads et les changements de contexte.
+
+Usage : python benchmarks/bench_transport_load.py [--sessions 100 500 1000] [--seconds 5]
+"""
+
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CHUNK = b'\x00\x00' * 2400  # 100 ms à 24 kHz
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_worker(transport, sessions, seconds, url):
+    sys.path.insert(0, ROOT)
+    if transport == 'asyncio':
+        from async_stream_handler import AsyncOpenAIStreamHandler as handler_class
+    else:
+        from stream_handler import OpenAIStreamHandler as handler_class
+
+    received = [0]
+    lock = threading.Lock()
+
+    def on_event(event, data):
+        if event == 'message':
+            with lock:
+                received[0] += 1
+
+    handlers = []
+    connect_start = time.perf_counter()
+    for _ in range(sessions):
+        handler = handler_class('key', 'model', 'instructions', on_event, url=url)
+        if handler.start():
+            handlers.append(handler)
+    connect_time = time.perf_counter() - connect_start
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_before = time.process_time()
+    sent = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        tick = time.monotonic()
+        for handler in handlers:
+            if handler.send_audio(CHUNK):
+                sent += 1
+        time.sleep(max(0.0, 0.1 - (time.monotonic() - tick)))
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = time.process_time() - cpu_before
+
+    result = {
+        'transport': transport,
+        'sessions': len(handlers),
+        'threads': threading.active_count(),
+        'max_rss_mb': usage_after.ru_maxrss / 1024,
+        'ctx_switches': (usage_after.ru_nvcsw + usage_after.ru_nivcsw)
+                        - (usage_before.ru_nvcsw + usage_before.ru_nivcsw),
+        'cpu_s': cpu,
+        'connect_s': connect_time,
+        'sent': sent,
+        'received': received[0],
+    }
+    for handler in handlers:
+        handler.close()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--transports', nargs='+', default=['thread', 'asyncio'])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--worker', action='store_true')
+    parser.add_argument('--url')
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.transports[0], args.sessions[0], args.seconds, args.url)
+        return
+
+    port = free_port()
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, 'realtime_stub.py'), '--port', str(port)],
+                            stdout=subprocess.PIPE, text=True)
+    stub.stdout.readline()
+    url = f'ws://127.0.0.1:{port}'
+    try:
+        print(f"{'transport':<10}{'sessions':>9}{'threads':>9}{'RSS max (Mo)':>14}"
+              f"{'chgt contexte':>15}{'CPU (s)':>9}{'connexion (s)':>15}")
+        for sessions in args.sessions:
+            for transport in args.transports:
+                output = subprocess.run(
+                    [sys.executable, __file__, '--worker', '--transports', transport,
+                     '--sessions', str(sessions), '--seconds', str(args.seconds), '--url', url],
+                    capture_output=True, text=True, check=True).stdout
+                r = json.loads(output.strip().splitlines()[-1])
+                print(f"{r['transport']:<10}{r['sessions']:>9}{r['threads']:>9}{r['max_rss_mb']:>14.1f}"
+                      f"{r['ctx_switches']:>15}{r['cpu_s']:>9.2f}{r['connect_s']:>15.2f}")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import threading
+import time
+from datetime import datetime
+
+
+class EventRecord:
+    """Compact journal entry; the timestamp is formatted only when read."""
+
+    __slots__ = ('seq', 'ts_ns', 'type', 'level', 'data')
+
+    def __init__(self, seq, ts_ns, event_type, level, data):
+        self.seq = seq
+        self.ts_ns = ts_ns
+        self.type = event_type
+        self.level = level
+        self.data = data
+
+
+class EventJournal:
+    """Fixed-capacity ring buffer of session events with a read cursor.
+
+    Each record gets an increasing ``seq``; ``since(cursor)`` returns only
+    the records newer than the cursor still held in the ring.
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._ring = [None] * capacity
+        self._next_seq = 0
+        self._lock = threading.Lock()
+        # Monotonic clock anchored to wall time for display
+        self._wall_anchor = time.time()
+        self._mono_anchor = time.monotonic_ns()
+
+    def __len__(self):
+        return min(self._next_seq, self.capacity)
+
+    @property
+    def last_seq(self):
+        return self._next_seq - 1
+
+    def append(self, event_type, level, data):
+        with self._lock:
+            record = EventRecord(self._next_seq, time.monotonic_ns(), event_type, level, data)
+            self._ring[self._next_seq % self.capacity] = record
+            self._next_seq += 1
+        return record
+
+    def since(self, cursor=None):
+        """Records with ``seq > cursor``, oldest first (all when cursor is None)."""
+        with self._lock:
+            end = self._next_seq
+            start = max(0, end - self.capacity)
+            if cursor is not None:
+                start = max(start, cursor + 1)
+            return [self._ring[seq % self.capacity] for seq in range(start, end)]
+
+    def format(self, record):
+        wall = self._wall_anchor + (record.ts_ns - self._mono_anchor) / 1e9
+        return {
+            'id': record.seq,
+            'timestamp': datetime.fromtimestamp(wall).strftime('%H:%M:%S.%f')[:-3],
+            'type': record.type,
+            'level': record.level,
+            'data': record.data,
+        }
+
+    def to_list(self, cursor=None):
+        return [self.format(record) for record in self.since(cursor)]
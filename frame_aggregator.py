@@ -0,0 +1,146 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class FrameAggregator:
+    """Pack input PCM16 chunks into upstream frames of a target duration.
+
+    The target adapts between ``min_ms`` and ``max_ms`` to the measured
+    arrival jitter: regular chunks give small frames (low latency), bursty
+    ones larger frames. Audio is never held longer than ``max_latency_ms``;
+    the caller flushes on expiry through ``deadline()``. Chunks already at
+    least one frame long pass through without copying when nothing is
+    buffered.
+    """
+
+    def __init__(self, sample_rate=24000, min_ms=20, max_ms=100, max_latency_ms=120):
+        self.bytes_per_ms = sample_rate * 2 / 1000
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.max_latency = max_latency_ms / 1000
+        self._buffer = bytearray()
+        self._first_at = None
+        self._last_arrival = None
+        self._mean_gap = None
+        self.jitter_ms = 0.0
+        self.chunks_in = 0
+        self.frames_out = 0
+        self.bytes_out = 0
+        self.hold_ms_total = 0.0
+        self.hold_ms_max = 0.0
+
+    @property
+    def target_ms(self):
+        return min(self.max_ms, max(self.min_ms, self.min_ms + self.jitter_ms))
+
+    @property
+    def frame_bytes(self):
+        return int(self.target_ms * self.bytes_per_ms) & ~1
+
+    @property
+    def buffered_bytes(self):
+        return len(self._buffer)
+
+    def _observe_arrival(self, now):
+        if self._last_arrival is not None:
+            gap = (now - self._last_arrival) * 1000
+            if self._mean_gap is None:
+                self._mean_gap = gap
+            else:
+                self.jitter_ms += (abs(gap - self._mean_gap) - self.jitter_ms) / 16
+                self._mean_gap += (gap - self._mean_gap) / 16
+        self._last_arrival = now
+
+    def _emit(self, frame, now):
+        hold_ms = (now - self._first_at) * 1000 if self._first_at is not None else 0.0
+        self.frames_out += 1
+        self.bytes_out += len(frame)
+        self.hold_ms_total += hold_ms
+        self.hold_ms_max = max(self.hold_ms_max, hold_ms)
+        return frame
+
+    def push(self, pcm, now=None):
+        """Add a chunk and return the list of frames ready to send."""
+        now = time.monotonic() if now is None else now
+        self.chunks_in += 1
+        self._observe_arrival(now)
+        frame_bytes = self.frame_bytes
+
+        if not self._buffer and len(pcm) >= frame_bytes:
+            self._first_at = now
+            return [self._emit(pcm, now)]
+
+        if not self._buffer:
+            self._first_at = now
+        self._buffer += pcm
+        frames = []
+        while len(self._buffer) >= frame_bytes:
+            frames.append(self._emit(bytes(self._buffer[:frame_bytes]), now))
+            del self._buffer[:frame_bytes]
+            self._first_at = now if self._buffer else None
+        if frames or now - self._first_at < self.max_latency:
+            return frames
+        return frames + [self.flush(now)]
+
+    def deadline(self):
+        """Monotonic time at which buffered audio must be flushed, or None."""
+        if not self._buffer:
+            return None
+        return self._first_at + self.max_latency
+
+    def flush(self, now=None):
+        """Return all buffered audio as one frame (None when empty)."""
+        if not self._buffer:
+            return None
+        now = time.monotonic() if now is None else now
+        frame = self._emit(bytes(self._buffer), now)
+        self._buffer.clear()
+        self._first_at = None
+        return frame
+
+    def stats(self):
+        return {
+            'target_ms': round(self.target_ms, 1),
+            'jitter_ms': round(self.jitter_ms, 1),
+            'chunks_in': self.chunks_in,
+            'frames_out': self.frames_out,
+            'avg_frame_bytes': self.bytes_out // self.frames_out if self.frames_out else 0,
+            'avg_hold_ms': round(self.hold_ms_total / self.frames_out, 1) if self.frames_out else 0.0,
+            'max_hold_ms': round(self.hold_ms_max, 1),
+        }
+
+
+class DeadlineTimer:
+    """One daemon thread running callbacks at monotonic deadlines."""
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, deadline, callback):
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, next(self._counter), callback))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='deadline-timer', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                deadline, _, callback = self._heap[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+            try:
+                callback()
+            except Exception:
+                pass
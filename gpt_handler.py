@@ -1,34 +1,70 @@
 import requests
+from requests.adapters import HTTPAdapter
+
+import json_backend
+
+DEFAULT_CHAT_URL = "https://api.openai.com/v1/chat/completions"
 
 
 class GPTHandler:
-    """Simplified interface to OpenAI chat completions with streaming."""
+    """Simplified interface to OpenAI chat completions with streaming.
+
+    One ``requests.Session`` is shared by every call, so concurrent chats
+    reuse kept-alive TLS connections from its pool instead of paying a new
+    TCP and TLS handshake each time.
+    """
 
-    def __init__(self, api_key, model="gpt-4o-realtime-preview-2025-06-03"):
+    def __init__(self, api_key, model="gpt-4o-mini", url=None, pool_size=10, timeout=(5, 60)):
         self.api_key = api_key
         self.model = model
-
-    def stream_chat(self, messages, abort_event=None):
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {
+        self.url = url or DEFAULT_CHAT_URL
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
-        }
+        })
+
+    def stream_chat(self, messages, abort_event=None):
+        """Yield the raw ``data:`` payloads of the SSE stream until ``[DONE]``.
+
+        Lines are read as soon as they arrive (``chunk_size=None``) rather
+        than after 512 buffered bytes, which would hold back the first
+        tokens. The stream is read to its end after ``[DONE]`` so the
+        connection goes back to the pool; setting ``abort_event`` closes the
+        upstream request at the next line instead.
+        """
         payload = {
             "model": self.model,
             "messages": messages,
-            "stream": True,
-            "response_format": {"type": "spoken"}
+            "stream": True
         }
-        with requests.post(url, headers=headers, json=payload, stream=True) as resp:
+        done = False
+        with self.session.post(self.url, json=payload, stream=True, timeout=self.timeout) as resp:
             resp.raise_for_status()
-            for line in resp.iter_lines():
+            for line in resp.iter_lines(chunk_size=None):
                 if abort_event and abort_event.is_set():
                     break
-                if not line:
+                if done or not line:
                     continue
                 if line.startswith(b"data: "):
                     data = line[len(b"data: "):].decode()
                     if data == "[DONE]":
-                        break
+                        done = True
+                        continue
                     yield data
+
+    def stream_deltas(self, messages, abort_event=None):
+        """Yield the text deltas of the completion, parsed chunk by chunk."""
+        for data in self.stream_chat(messages, abort_event):
+            chunk = json_backend.loads(data)
+            for choice in chunk.get("choices", ()):
+                content = choice.get("delta", {}).get("content")
+                if content:
+                    yield content
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,46 @@
+"""JSON encoding for the realtime protocol, with orjson used when available.
+
+Callers go through the module (``json_backend.loads``) so ``use_backend``
+can switch implementations at startup.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+backend = None
+loads = json.loads
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj).decode()
+
+
+dumps = _json_dumps
+
+
+def use_backend(name='auto'):
+    """Select 'orjson', 'json' or 'auto' (orjson if installed); return the name."""
+    global backend, loads, dumps
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'json'
+    if name == 'orjson':
+        if orjson is None:
+            raise RuntimeError("the 'orjson' package is not installed")
+        loads, dumps = orjson.loads, _orjson_dumps
+    elif name == 'json':
+        loads, dumps = json.loads, _json_dumps
+    else:
+        raise ValueError(f"unknown JSON backend: {name}")
+    backend = name
+    return name
+
+
+use_backend()
@@ -0,0 +1,148 @@
+import bisect
+import threading
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    inner = ','.join(f'{key}="{str(value)}"' for key, value in sorted(labels.items()))
+    return '{' + inner + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by a fixed set of labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, labels=None):
+        key = tuple(sorted(labels.items())) if labels else ()
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, labels=None):
+        return self._values.get(tuple(sorted(labels.items())) if labels else (), 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        if not values:
+            yield self.name, None, 0
+        for key, value in values:
+            yield self.name, dict(key), value
+
+
+class Gauge:
+    """Value computed at scrape time by ``func``.
+
+    ``func`` returns a number, or a list of ``(labels, value)`` pairs.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, func):
+        self.name = name
+        self.help = help_text
+        self.func = func
+
+    def samples(self):
+        value = self.func()
+        if isinstance(value, (list, tuple)):
+            for labels, item in value:
+                yield self.name, labels, item
+        else:
+            yield self.name, None, value
+
+
+class CounterFunc(Gauge):
+    """Counter whose value is read at scrape time (e.g. lifecycle totals)."""
+
+    kind = 'counter'
+
+
+class Histogram:
+    """Cumulative-bucket histogram, cheap enough for per-chunk observations."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def samples(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            yield f'{self.name}_bucket', {'le': _format_value(float(bound))}, cumulative
+        yield f'{self.name}_sum', None, total
+        yield f'{self.name}_count', None, cumulative
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        return self.register(Counter(name, help_text))
+
+    def gauge(self, name, help_text, func):
+        return self.register(Gauge(name, help_text, func))
+
+    def counter_func(self, name, help_text, func):
+        return self.register(CounterFunc(name, help_text, func))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            except Exception:
+                continue
+        return '\n'.join(lines) + '\n'
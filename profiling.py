@@ -0,0 +1,227 @@
+import collections
+import functools
+import itertools
+import os
+import sys
+import threading
+import time
+import uuid
+
+
+class StageStats:
+    """Timings of one instrumented stage; only sampled calls are recorded."""
+
+    __slots__ = ('samples', 'total', 'max', 'recent')
+
+    def __init__(self, reservoir=1024):
+        self.samples = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = collections.deque(maxlen=reservoir)
+
+    def add(self, seconds):
+        self.samples += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    def summary(self, sample_every):
+        recent = sorted(self.recent)
+
+        def quantile(q):
+            return recent[min(len(recent) - 1, int(q * len(recent)))] * 1e6 if recent else 0.0
+
+        return {
+            'samples': self.samples,
+            'estimated_calls': self.samples * sample_every,
+            'estimated_total_ms': round(self.total * sample_every * 1000, 3),
+            'mean_us': round(self.total / self.samples * 1e6, 2) if self.samples else 0.0,
+            'p50_us': round(quantile(0.5), 2),
+            'p95_us': round(quantile(0.95), 2),
+            'max_us': round(self.max * 1e6, 2),
+        }
+
+
+class SpanProfiler:
+    """Sampled span timers for hot paths.
+
+    Each stage keeps its own call counter and times one call in
+    ``sample_every``, so the cost of an unsampled call is a counter
+    increment. Spans are inclusive: a stage called from another one is
+    also counted in its caller.
+    """
+
+    def __init__(self, sample_every=100):
+        self.sample_every = max(1, int(sample_every))
+        self.started_at = time.time()
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _counter(self, stage):
+        counter = self._counters.get(stage)
+        if counter is None:
+            counter = self._counters.setdefault(stage, itertools.count(1))
+        return counter
+
+    def record(self, stage, seconds):
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats()
+            stats.add(seconds)
+
+    def wrap(self, stage, func):
+        """``func`` timed under ``stage`` on sampled calls."""
+        counter = self._counter(stage)
+        every = self.sample_every
+        record = self.record
+        perf_counter = time.perf_counter
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            if next(counter) % every:
+                return func(*args, **kwargs)
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, perf_counter() - started)
+
+        timed.__wrapped_stage__ = stage
+        return timed
+
+    def instrument(self, cls, name, stage=None):
+        """Replace the method ``cls.name`` by its timed version (once)."""
+        method = cls.__dict__.get(name)
+        if method is None or hasattr(method, '__wrapped_stage__'):
+            return
+        setattr(cls, name, self.wrap(stage or f'{cls.__name__}.{name}', method))
+
+    def snapshot(self):
+        with self._lock:
+            stages = {stage: stats.summary(self.sample_every) for stage, stats in self._stages.items()}
+        return {
+            'sample_every': self.sample_every,
+            'window_seconds': round(time.time() - self.started_at, 3),
+            'stages': dict(sorted(stages.items(), key=lambda item: -item[1]['estimated_total_ms'])),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+            self.started_at = time.time()
+
+
+class StackSampler:
+    """Wall-clock sampler of every thread's Python stack.
+
+    Stacks are read with ``sys._current_frames()`` every ``interval``
+    seconds and counted in the folded format (``thread;frame;frame count``
+    per line) read by flamegraph.pl, speedscope or inferno. Nothing runs
+    between captures, so the sampler costs nothing when it is not started.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.stacks = collections.Counter()
+
+    def sample_once(self, skip_thread=None):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            frames = []
+            while frame is not None and len(frames) < self.max_depth:
+                code = frame.f_code
+                frames.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            frames.append(names.get(thread_id, f'thread-{thread_id}').replace(' ', '_'))
+            self.stacks[';'.join(reversed(frames))] += 1
+        self.samples += 1
+
+    def run(self, duration, sleep=time.sleep):
+        """Sample the other threads for ``duration`` seconds."""
+        me = threading.get_ident()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            self.sample_once(skip_thread=me)
+            sleep(self.interval)
+        return self
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class Trace:
+    """Timeline of one sampled browser chunk up to its upstream message."""
+
+    __slots__ = ('id', 'session_id', 'seq', 'started', 'marks', 'result')
+
+    def __init__(self, session_id, seq=None):
+        self.id = f'trace_{uuid.uuid4().hex[:20]}'
+        self.session_id = session_id
+        self.seq = seq
+        self.started = time.perf_counter()
+        self.marks = []
+        self.result = None
+
+    def mark(self, stage):
+        self.marks.append((stage, time.perf_counter()))
+
+    def to_dict(self):
+        end = self.marks[-1][1] if self.marks else self.started
+        return {
+            'trace_id': self.id,
+            'session_id': self.session_id,
+            'seq': self.seq,
+            'result': self.result,
+            'stages': [{'stage': stage, 'at_us': round((at - self.started) * 1e6, 1)} for stage, at in self.marks],
+            'total_us': round((end - self.started) * 1e6, 1),
+        }
+
+
+class Tracer:
+    """Samples one chunk in ``sample_every`` (0 disables tracing).
+
+    The trace id is sent upstream as the client ``event_id`` of the chunk's
+    ``input_audio_buffer.append``, so server errors about that message can
+    be matched to the browser sequence number. Finished traces are kept in
+    a ring of ``max_traces``.
+    """
+
+    def __init__(self, sample_every=0, max_traces=200):
+        self.sample_every = max(0, int(sample_every))
+        self.started = 0
+        self._counter = itertools.count(1)
+        self._finished = collections.deque(maxlen=max_traces)
+        self._by_id = {}
+        self._lock = threading.Lock()
+
+    def start(self, session_id, seq=None):
+        """New trace for this chunk, or None when it is not sampled."""
+        if not self.sample_every or next(self._counter) % self.sample_every:
+            return None
+        self.started += 1
+        trace = Trace(session_id, seq)
+        trace.mark('received')
+        return trace
+
+    def finish(self, trace, result='sent'):
+        trace.result = result
+        with self._lock:
+            if len(self._finished) == self._finished.maxlen:
+                self._by_id.pop(self._finished[0].id, None)
+            self._finished.append(trace)
+            self._by_id[trace.id] = trace
+
+    def get(self, trace_id):
+        return self._by_id.get(trace_id)
+
+    def recent(self, session_id=None, limit=50):
+        traces = [trace for trace in list(self._finished)
+                  if session_id is None or trace.session_id == session_id]
+        return [trace.to_dict() for trace in traces[-limit:]]
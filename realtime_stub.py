@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Serveur local imitant l'API OpenAI Realtime, pour les tests et benchmarks
+
+Usage : python realtime_stub.py [--host 127.0.0.1] [--port 8765] [--trace trace.jsonl | --synthetic]
+puis lancer l'application avec REALTIME_URL=ws://127.0.0.1:8765
+
+Avec une trace, les réponses rejouent les événements enregistrés avec leur
+cadencement d'origine (--speed pour accélérer).
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import threading
+import uuid
+
+import numpy as np
+import websockets
+
+from realtime_trace import load_trace, response_turns, synthetic_trace
+
+SAMPLE_RATE = 24000
+RESPONSE_SAMPLES = 2400  # 100 ms à 24 kHz par delta
+
+
+class _Connection:
+    """Per-connection protocol state."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.session_id = f"sess_{uuid.uuid4().hex[:12]}"
+        self.turn_detection = None
+        self.speaking = False
+        self.silence_ms = 0.0
+        self.turn = 0
+        self.response = None
+        self.response_id = None
+        self.buffer_bytes = 0
+
+    async def send(self, event):
+        await self.ws.send(json.dumps(event))
+
+
+class RealtimeStub:
+    """Minimal realtime protocol: session handshake, a canned or replayed
+    audio response, server VAD emulated on the appended audio's energy
+    when the session enables ``turn_detection``, response cancellation with
+    item truncation, and explicitly committed turns transcribed as their
+    duration."""
+
+    def __init__(self, response_deltas=3, trace=None, speed=1.0, vad_threshold=0.01):
+        self.response_deltas = response_deltas
+        self.turns = response_turns(trace) if trace else None
+        self.speed = speed
+        self.vad_threshold = vad_threshold
+        self.connections = 0
+        self.messages = 0
+        self.audio_bytes = 0
+        self.responses = 0
+        self.cancelled = 0
+        self.truncations = []
+        self.deleted = []
+
+    async def handler(self, ws):
+        self.connections += 1
+        conn = _Connection(ws)
+        await conn.send({"type": "session.created", "session": {"id": conn.session_id}})
+        try:
+            async for message in ws:
+                self.messages += 1
+                data = json.loads(message)
+                msg_type = data.get("type")
+                if msg_type == "session.update":
+                    conn.turn_detection = data.get("session", {}).get("turn_detection")
+                    await conn.send({"type": "session.updated", "session": {"id": conn.session_id}})
+                elif msg_type == "input_audio_buffer.append":
+                    audio = data.get("audio", "")
+                    self.audio_bytes += len(audio) * 3 // 4
+                    conn.buffer_bytes += len(audio) * 3 // 4
+                    if conn.turn_detection:
+                        await self.detect_turn(conn, base64.b64decode(audio))
+                elif msg_type == "input_audio_buffer.commit":
+                    item_id = f"item_{uuid.uuid4().hex[:12]}"
+                    await conn.send({"type": "input_audio_buffer.committed", "item_id": item_id})
+                    duration_ms = conn.buffer_bytes * 1000 // (2 * SAMPLE_RATE)
+                    conn.buffer_bytes = 0
+                    await conn.send({"type": "conversation.item.input_audio_transcription.completed",
+                                     "item_id": item_id, "content_index": 0,
+                                     "transcript": f"{duration_ms} ms d'audio"})
+                elif msg_type == "input_audio_buffer.clear":
+                    conn.buffer_bytes = 0
+                    await conn.send({"type": "input_audio_buffer.cleared"})
+                elif msg_type == "conversation.item.delete":
+                    self.deleted.append(data.get("item_id"))
+                    await conn.send({"type": "conversation.item.deleted", "item_id": data.get("item_id")})
+                elif msg_type == "response.create":
+                    self.start_response(conn)
+                elif msg_type == "response.cancel":
+                    await self.cancel_response(conn)
+                elif msg_type == "conversation.item.truncate":
+                    self.truncations.append((data.get("item_id"), data.get("audio_end_ms")))
+                    await conn.send({"type": "conversation.item.truncated", "item_id": data.get("item_id"),
+                                     "content_index": data.get("content_index", 0),
+                                     "audio_end_ms": data.get("audio_end_ms")})
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if conn.response is not None:
+                conn.response.cancel()
+
+    async def detect_turn(self, conn, pcm):
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2).astype(np.float32) / 32768.0
+        if samples.size == 0:
+            return
+        if np.sqrt(np.mean(samples * samples)) > self.vad_threshold:
+            conn.silence_ms = 0.0
+            if not conn.speaking:
+                conn.speaking = True
+                await conn.send({"type": "input_audio_buffer.speech_started"})
+            return
+        if not conn.speaking:
+            return
+        conn.silence_ms += samples.size * 1000 / SAMPLE_RATE
+        if conn.silence_ms >= conn.turn_detection.get("silence_duration_ms", 500):
+            conn.speaking = False
+            await conn.send({"type": "input_audio_buffer.speech_stopped"})
+            await conn.send({"type": "input_audio_buffer.committed"})
+            conn.buffer_bytes = 0
+            self.start_response(conn)
+
+    def start_response(self, conn):
+        if conn.response is None or conn.response.done():
+            conn.response = asyncio.ensure_future(self.respond(conn))
+
+    async def cancel_response(self, conn):
+        if conn.response is None or conn.response.done():
+            return
+        conn.response.cancel()
+        self.cancelled += 1
+        await conn.send({"type": "response.done", "response": {"id": conn.response_id, "status": "cancelled"}})
+
+    async def respond(self, conn):
+        if self.turns:
+            events = self.turns[conn.turn % len(self.turns)]
+            conn.turn += 1
+            for delay, event in events:
+                if delay:
+                    await asyncio.sleep(delay / self.speed)
+                if event.get("type") == "response.created":
+                    conn.response_id = event["response"]["id"]
+                await conn.send(event)
+        else:
+            response_id = conn.response_id = f"resp_{uuid.uuid4().hex[:12]}"
+            item_id = f"item_{uuid.uuid4().hex[:12]}"
+            delta = base64.b64encode(b"\x00\x00" * RESPONSE_SAMPLES).decode()
+            await conn.send({"type": "response.created", "response": {"id": response_id}})
+            for _ in range(self.response_deltas):
+                await conn.send({"type": "response.audio.delta", "response_id": response_id, "item_id": item_id,
+                                 "delta": delta})
+            await conn.send({"type": "response.audio.done", "response_id": response_id})
+            await conn.send({"type": "response.audio_transcript.done", "response_id": response_id,
+                             "item_id": item_id, "transcript": "Réponse de test"})
+            await conn.send({"type": "response.done", "response": {"id": response_id, "status": "completed",
+                                                                   "output": [{"id": item_id}]}})
+        self.responses += 1
+
+    async def serve(self, host, port, ready=None):
+        async with websockets.serve(self.handler, host, port, max_size=None) as server:
+            if ready is not None:
+                ready(server)
+            await asyncio.Future()
+
+
+def start_in_thread(host="127.0.0.1", port=0, **kwargs):
+    """Démarre le serveur dans un thread et retourne (stub, url)"""
+    stub = RealtimeStub(**kwargs)
+    started = threading.Event()
+    address = {}
+
+    def ready(server):
+        address['port'] = next(iter(server.sockets)).getsockname()[1]
+        started.set()
+
+    def run():
+        asyncio.run(stub.serve(host, port, ready))
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait(timeout=5)
+    return stub, f"ws://{host}:{address['port']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--trace', help="trace JSONL à rejouer (voir realtime_trace.py)")
+    parser.add_argument('--synthetic', action='store_true', help="rejouer une trace synthétique")
+    parser.add_argument('--speed', type=float, default=1.0, help="facteur d'accélération du rejeu")
+    args = parser.parse_args()
+    trace = load_trace(args.trace) if args.trace else synthetic_trace() if args.synthetic else None
+    print(f"STUB: ws://{args.host}:{args.port}", flush=True)
+    asyncio.run(RealtimeStub(trace=trace, speed=args.speed).serve(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
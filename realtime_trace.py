@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Traces d'événements temps réel : lignes JSON ``{"t": <secondes>, "event": {...}}``
+telles que reçues de l'API OpenAI Realtime, rejouées par les benchmarks
+
+Usage : python realtime_trace.py sortie.jsonl [--turns 5]
+"""
+
+import argparse
+import base64
+import json
+
+import numpy as np
+
+SAMPLE_RATE = 24000
+
+
+def synthetic_trace(turns=5, delta_ms=50, response_ms=3000, pause_ms=2000, seed=0):
+    """Build a trace shaped like a real session: setup, then per turn speech
+    events, a response with audio and transcript deltas, and rate limits."""
+    rng = np.random.default_rng(seed)
+    samples = SAMPLE_RATE * delta_ms // 1000
+    trace = []
+    t = 0.0
+
+    def add(delay, event):
+        nonlocal t
+        t += delay
+        trace.append({"t": round(t, 4), "event": event})
+
+    add(0.0, {"type": "session.created", "session": {"id": "sess_trace", "model": "gpt-4o-realtime-preview"}})
+    add(0.05, {"type": "session.updated", "session": {"id": "sess_trace"}})
+    for turn in range(turns):
+        item_id = f"item_user_{turn}"
+        response_id = f"resp_{turn}"
+        add(pause_ms / 1000, {"type": "input_audio_buffer.speech_started", "audio_start_ms": int(t * 1000),
+                              "item_id": item_id})
+        add(1.5, {"type": "input_audio_buffer.speech_stopped", "audio_end_ms": int(t * 1000), "item_id": item_id})
+        add(0.01, {"type": "input_audio_buffer.committed", "item_id": item_id})
+        add(0.0, {"type": "conversation.item.created", "item": {"id": item_id, "role": "user"}})
+        add(0.02, {"type": "response.created", "response": {"id": response_id, "status": "in_progress"}})
+        add(0.05, {"type": "response.output_item.added", "response_id": response_id,
+                   "item": {"id": f"item_assistant_{turn}", "role": "assistant"}})
+        for index in range(response_ms // delta_ms):
+            pcm = (rng.standard_normal(samples) * 3000).astype(np.int16).tobytes()
+            add(delta_ms / 1000 if index else 0.3,
+                {"type": "response.audio.delta", "response_id": response_id,
+                 "item_id": f"item_assistant_{turn}", "output_index": 0, "content_index": 0,
+                 "delta": base64.b64encode(pcm).decode()})
+            if index % 4 == 0:
+                add(0.0, {"type": "response.audio_transcript.delta", "response_id": response_id,
+                          "delta": "bonjour "})
+        add(0.01, {"type": "response.audio.done", "response_id": response_id})
+        add(0.0, {"type": "response.audio_transcript.done", "response_id": response_id})
+        add(0.0, {"type": "conversation.item.input_audio_transcription.completed", "item_id": item_id,
+                  "transcript": "Bonjour, quelle heure est-il ?"})
+        add(0.01, {"type": "response.done", "response": {"id": response_id, "status": "completed"}})
+        add(0.0, {"type": "rate_limits.updated", "rate_limits": []})
+    return trace
+
+
+def response_turns(trace):
+    """Split a trace into responses: lists of ``(delay, event)`` running from
+    ``response.created`` to ``response.done``, the first delay being the gap
+    after the previous event (the upstream time to first byte)."""
+    turns = []
+    current = None
+    previous_t = 0.0
+    for entry in trace:
+        event = entry["event"]
+        delay = round(max(0.0, entry["t"] - previous_t), 4)
+        previous_t = entry["t"]
+        if event.get("type") == "response.created":
+            current = []
+        if current is None:
+            continue
+        current.append((delay, event))
+        if event.get("type") == "response.done":
+            turns.append(current)
+            current = None
+    return turns
+
+
+def save_trace(path, trace):
+    with open(path, 'w', encoding='utf-8') as f:
+        for entry in trace:
+            f.write(json.dumps(entry) + '\n')
+
+
+def load_trace(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output')
+    parser.add_argument('--turns', type=int, default=5)
+    args = parser.parse_args()
+    trace = synthetic_trace(args.turns)
+    save_trace(args.output, trace)
+    print(f"{len(trace)} events, {trace[-1]['t']:.1f}s -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import os
+import struct
+import threading
+import time
+
+
+class StreamingWavWriter:
+    """Append PCM frames to a WAV file and keep its header up to date.
+
+    Frames go straight to a buffered file, so memory stays bounded whatever
+    the recording length. The RIFF/data sizes are patched every
+    ``patch_interval`` seconds and on close, which keeps the file readable
+    if the process dies mid-session.
+    """
+
+    HEADER_SIZE = 44
+
+    def __init__(self, path, sample_rate=24000, channels=1, sample_width=2,
+                 patch_interval=5.0, buffer_size=64 * 1024):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.patch_interval = patch_interval
+        self.data_size = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'wb', buffering=buffer_size)
+        self._file.write(self._header())
+        self._last_patch = time.monotonic()
+
+    def _header(self):
+        byte_rate = self.sample_rate * self.channels * self.sample_width
+        block_align = self.channels * self.sample_width
+        return struct.pack(
+            '<4sI4s4sIHHIIHH4sI',
+            b'RIFF', 36 + self.data_size, b'WAVE',
+            b'fmt ', 16, 1, self.channels, self.sample_rate,
+            byte_rate, block_align, self.sample_width * 8,
+            b'data', self.data_size,
+        )
+
+    def _patch_header(self):
+        self._file.flush()
+        position = self._file.tell()
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.seek(position)
+        self._file.flush()
+        self._last_patch = time.monotonic()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def write(self, frames):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(frames)
+            self.data_size += len(frames)
+            if time.monotonic() - self._last_patch >= self.patch_interval:
+                self._patch_header()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._patch_header()
+            self._file.close()
+
+
+class SessionRecorder:
+    """Record a dialogue's output track, and optionally its input track.
+
+    Files are created on the first frame of each track so that sessions
+    without audio leave nothing on disk. With an ``executor`` (a
+    single-worker ``ThreadPoolExecutor``, so frames stay in order) the disk
+    writes run off the calling thread, e.g. off a shared event loop.
+    """
+
+    def __init__(self, directory, basename, sample_rate=24000, record_input=False, executor=None):
+        self.directory = directory
+        self.basename = basename
+        self.sample_rate = sample_rate
+        self.record_input = record_input
+        self.executor = executor
+        self._writers = {}
+        self._lock = threading.Lock()
+
+    def _writer(self, track):
+        writer = self._writers.get(track)
+        if writer is None:
+            with self._lock:
+                writer = self._writers.get(track)
+                if writer is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    suffix = '' if track == 'output' else f'_{track}'
+                    path = os.path.join(self.directory, f'{self.basename}{suffix}.wav')
+                    writer = StreamingWavWriter(path, self.sample_rate)
+                    self._writers[track] = writer
+        return writer
+
+    def _write(self, track, frames):
+        self._writer(track).write(frames)
+
+    def _submit(self, track, frames):
+        if self.executor is None:
+            self._write(track, frames)
+        else:
+            self.executor.submit(self._write, track, bytes(frames))
+
+    def write_output(self, frames):
+        self._submit('output', frames)
+
+    def write_input(self, frames):
+        if self.record_input:
+            self._submit('input', frames)
+
+    def close(self):
+        """Finalize all tracks, after any pending write, and return the written file names."""
+        if self.executor is not None:
+            return self.executor.submit(self._close).result()
+        return self._close()
+
+    def _close(self):
+        with self._lock:
+            writers = list(self._writers.values())
+        filenames = []
+        for writer in writers:
+            writer.close()
+            filenames.append(os.path.basename(writer.path))
+        return filenames
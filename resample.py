@@ -0,0 +1,77 @@
+import functools
+import math
+
+import numpy as np
+from scipy.signal import firwin, upfirdn
+
+SUPPORTED_RATES = (8000, 11025, 16000, 22050, 24000, 32000, 44100, 48000)
+
+
+@functools.lru_cache(maxsize=32)
+def design_filter(up, down, half_len=10):
+    """Anti-aliasing low-pass FIR for a ``up/down`` polyphase resampler.
+
+    Same design as ``scipy.signal.resample_poly`` (Kaiser window, cutoff at
+    the narrower Nyquist), scaled by ``up`` to keep unity gain. Cached per
+    rate pair and read-only, so every session with the same negotiated
+    rates shares one array.
+    """
+    max_rate = max(up, down)
+    taps = firwin(2 * half_len * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * up
+    taps = taps.astype(np.float32)
+    taps.setflags(write=False)
+    return taps
+
+
+class StreamingResampler:
+    """Stateful polyphase resampler for PCM16 mono chunks.
+
+    Each chunk is filtered with ``upfirdn`` together with just enough input
+    history to continue the convolution where the previous chunk stopped,
+    so chunk boundaries are seamless and the output is identical to one
+    ``upfirdn`` call over the whole stream. The history always starts on an input index aligned with the decimation
+    phase, which keeps the ``upfirdn`` output grid on the stream's grid.
+    """
+
+    def __init__(self, in_rate, out_rate):
+        if in_rate == out_rate:
+            raise ValueError("input and output rates are identical")
+        divisor = math.gcd(in_rate, out_rate)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        self.taps = design_filter(self.up, self.down)
+        self._history = np.zeros(0, dtype=np.float32)
+        self._history_start = 0
+        self._consumed = 0
+        self._produced = 0
+
+    def process(self, pcm):
+        """Resample a PCM16 chunk; return the PCM16 bytes ready so far."""
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)
+        if samples.size == 0:
+            return b''
+
+        buffer = np.concatenate((self._history, samples.astype(np.float32)))
+        self._consumed += samples.size
+        # Output n depends on upsampled inputs up to n * down
+        end = (self._consumed * self.up + self.down - 1) // self.down
+        offset = self._history_start * self.up // self.down
+        out = upfirdn(self.taps, buffer, self.up, self.down)[self._produced - offset:end - offset]
+        self._produced = end
+
+        # Keep the inputs still needed by the next output, from an aligned index
+        needed = max(0, (end * self.down - len(self.taps) + 1) // self.up)
+        needed -= needed % self.down
+        self._history = buffer[needed - self._history_start:]
+        self._history_start = needed
+
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16).tobytes()
+
+
+def resample(pcm, in_rate, out_rate):
+    """One-shot resampling of a complete PCM16 buffer."""
+    if in_rate == out_rate:
+        return pcm
+    return StreamingResampler(in_rate, out_rate).process(pcm)
@@ -0,0 +1,250 @@
+import collections
+import threading
+import time
+import weakref
+
+
+class BatchingEmitter:
+    """Coalesce per-session Socket.IO updates and flush them periodically.
+
+    Counter updates only mark the session dirty; the stats snapshot is built
+    once per flush. Journal events are queued and sent as one ``new_events``
+    batch, formatted with ``event_formatter`` at flush time. Idle sessions
+    emit nothing.
+    """
+
+    def __init__(self, emit, room, stats_provider, interval=0.25, event_formatter=None):
+        self._emit = emit
+        self.room = room
+        self.stats_provider = stats_provider
+        self.event_formatter = event_formatter
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._events = []
+        self._dirty = False
+        self._last_flush = 0.0
+
+    @property
+    def dirty(self):
+        return self._dirty or bool(self._events)
+
+    @property
+    def pending(self):
+        """Journal events waiting for the next flush."""
+        return len(self._events)
+
+    def stats_changed(self):
+        self._dirty = True
+        if self.interval <= 0:
+            self.flush()
+
+    def queue_event(self, event):
+        with self._lock:
+            self._events.append(event)
+        if self.interval <= 0:
+            self.flush()
+
+    def flush(self, force=True, now=None):
+        """Emit pending updates; when ``force`` is False honour the interval."""
+        now = time.monotonic() if now is None else now
+        if not self.dirty:
+            return False
+        if not force and now - self._last_flush < self.interval:
+            return False
+
+        with self._lock:
+            events, self._events = self._events, []
+            dirty, self._dirty = self._dirty, False
+            self._last_flush = now
+
+        if events:
+            if self.event_formatter is not None:
+                events = [self.event_formatter(event) for event in events]
+            self._emit('new_events', events, room=self.room)
+        if dirty:
+            self._emit('stats_update', self.stats_provider(), room=self.room)
+        return True
+
+
+class FlushScheduler:
+    """Single background task flushing every registered emitter."""
+
+    def __init__(self, start_background_task, sleep, interval=0.25):
+        self._start_background_task = start_background_task
+        self._sleep = sleep
+        self.interval = interval
+        self._emitters = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def register(self, emitter):
+        with self._lock:
+            self._emitters.add(emitter)
+            if not self._started and self.interval > 0:
+                self._started = True
+                self._start_background_task(self._run)
+
+    def unregister(self, emitter):
+        with self._lock:
+            self._emitters.discard(emitter)
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            emitters = list(self._emitters)
+        for emitter in emitters:
+            emitter.flush(force=False, now=now)
+
+    def _run(self):
+        while True:
+            self._sleep(self.interval)
+            self.tick()
+
+
+class EgressQueue:
+    """Bounded queue of Socket.IO emissions for one session, drained by its
+    own writer task so a slow browser never stalls the upstream reader.
+
+    When the queue is full, ``policy`` decides what gives: ``block`` waits
+    up to ``block_timeout`` for room and then drops the new frame,
+    ``drop_oldest`` discards the oldest frame, and ``coalesce`` merges the
+    two oldest frames with ``merge`` (dropping the oldest when ``merge``
+    returns None). Frames still queued ``max_age`` seconds after being put
+    are dropped as stale by the writer: late audio is worse than a gap.
+    Control events put with ``droppable=False`` are never dropped.
+    """
+
+    POLICIES = ('block', 'drop_oldest', 'coalesce')
+
+    def __init__(self, emit, room, maxlen=32, policy='drop_oldest', max_age=2.0, block_timeout=0.2,
+                 merge=None, on_drop=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown egress policy: {policy}")
+        self._emit = emit
+        self.room = room
+        self.maxlen = maxlen
+        self.policy = policy
+        self.max_age = max_age
+        self.block_timeout = block_timeout
+        self.merge = merge
+        self.on_drop = on_drop
+        self._frames = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = {'overflow': 0, 'stale': 0, 'flushed': 0}
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        return len(self._frames)
+
+    def stats(self):
+        return {'depth': self.depth, 'max_depth': self.max_depth, 'sent': self.sent,
+                'coalesced': self.coalesced, 'dropped': dict(self.dropped)}
+
+    def put(self, event, data, droppable=True):
+        """Queue one emission; return False if it was dropped."""
+        drops = []
+        with self._cond:
+            if self._closed:
+                return False
+            if droppable and len(self._frames) >= self.maxlen and not self._make_room(drops):
+                drops.append('overflow')
+                accepted = False
+            else:
+                self._frames.append((event, data, time.monotonic(), droppable))
+                self.max_depth = max(self.max_depth, len(self._frames))
+                self._cond.notify_all()
+                accepted = True
+        self._count_drops(drops)
+        return accepted
+
+    def clear(self, event=None, data=None):
+        """Drop every queued frame, then queue ``event`` (e.g. a flush notice)
+        so that it reaches the browser after anything already being sent."""
+        with self._cond:
+            flushed = sum(1 for frame in self._frames if frame[3])
+            self._frames = collections.deque(frame for frame in self._frames if not frame[3])
+            if event is not None and not self._closed:
+                self._frames.append((event, data, time.monotonic(), False))
+            self._cond.notify_all()
+        self._count_drops(['flushed'] * flushed)
+        return flushed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._frames.clear()
+            self._cond.notify_all()
+
+    def _make_room(self, drops):
+        # Called with the condition held and the queue full
+        if self.policy == 'block':
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._frames) >= self.maxlen and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return not self._closed
+        for index, frame in enumerate(self._frames):
+            if not frame[3]:
+                continue
+            if self.policy == 'coalesce' and self.merge is not None and index + 1 < len(self._frames):
+                following = self._frames[index + 1]
+                merged = self.merge(frame[1], following[1]) if following[0] == frame[0] and following[3] else None
+                if merged is not None:
+                    del self._frames[index + 1]
+                    self._frames[index] = (frame[0], merged, frame[2], True)
+                    self.coalesced += 1
+                    return True
+            del self._frames[index]
+            drops.append('overflow')
+            return True
+        return False
+
+    def _count_drops(self, reasons):
+        for reason in reasons:
+            self.dropped[reason] += 1
+            if self.on_drop is not None:
+                self.on_drop(reason)
+
+    def _next_frame(self, wait=True):
+        with self._cond:
+            while wait and not self._frames and not self._closed:
+                self._cond.wait()
+            if self._closed or not self._frames:
+                return None
+            frame = self._frames.popleft()
+            self._cond.notify_all()
+            return frame
+
+    def _send(self, frame):
+        event, data, queued_at, droppable = frame
+        if droppable and self.max_age and time.monotonic() - queued_at > self.max_age:
+            self._count_drops(['stale'])
+            return
+        self._emit(event, data, room=self.room)
+        self.sent += 1
+
+    def drain(self):
+        """Send everything queued from the calling thread."""
+        while True:
+            frame = self._next_frame(wait=False)
+            if frame is None:
+                return
+            self._send(frame)
+
+    def run(self):
+        """Writer task: emit queued frames until the queue is closed."""
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return
+            try:
+                self._send(frame)
+            except Exception:
+                # A failed emit only loses this frame, the writer keeps going
+                pass
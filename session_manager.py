@@ -0,0 +1,152 @@
+import threading
+import time
+
+
+class SessionManager:
+    """Thread-safe store of the voice sessions owned by this worker.
+
+    Reads take a snapshot under a short lock; ``disconnect()`` always runs
+    outside it. A background reaper closes sessions idle for longer than
+    ``idle_timeout`` (and not attached to a browser socket) or older than
+    ``max_duration``, and renews their ownership in the registry.
+
+    Sessions must expose ``started_at`` and ``last_activity`` (monotonic
+    seconds), ``is_connected`` and ``disconnect()``.
+    """
+
+    def __init__(self, registry, idle_timeout=300, max_duration=3600, reap_interval=30,
+                 is_attached=None):
+        self.registry = registry
+        self.idle_timeout = idle_timeout
+        self.max_duration = max_duration
+        self.reap_interval = reap_interval
+        self.is_attached = is_attached or (lambda session_id: False)
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper_started = False
+        self.started = 0
+        self.stopped = 0
+        self.reaped = {'idle': 0, 'max_duration': 0}
+        self.leaked = 0
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def __getitem__(self, session_id):
+        with self._lock:
+            return self._sessions[session_id]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def __iter__(self):
+        return iter(self.ids())
+
+    def get(self, session_id, default=None):
+        with self._lock:
+            return self._sessions.get(session_id, default)
+
+    def ids(self):
+        with self._lock:
+            return list(self._sessions)
+
+    def values(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def add(self, session_id, voice_session):
+        """Insert a session unless it exists here or is owned by another worker;
+        return True if added."""
+        with self._lock:
+            if session_id in self._sessions:
+                return False
+            self._sessions[session_id] = voice_session
+        if not self.registry.register(session_id):
+            with self._lock:
+                self._sessions.pop(session_id, None)
+            return False
+        with self._lock:
+            self.started += 1
+        return True
+
+    def pop(self, session_id, default=None):
+        """Remove a session without disconnecting it."""
+        with self._lock:
+            voice_session = self._sessions.pop(session_id, None)
+        if voice_session is None:
+            return default
+        self.registry.unregister(session_id)
+        return voice_session
+
+    def stop(self, session_id):
+        """Remove and disconnect a session; return False if it was unknown."""
+        voice_session = self.pop(session_id)
+        if voice_session is None:
+            return False
+        with self._lock:
+            self.stopped += 1
+        voice_session.disconnect()
+        return True
+
+    def reap(self, now=None):
+        """Close idle or expired sessions; return [(session_id, reason)]."""
+        now = time.monotonic() if now is None else now
+        expired = []
+        with self._lock:
+            candidates = list(self._sessions.items())
+        for session_id, voice_session in candidates:
+            if now - voice_session.started_at >= self.max_duration:
+                expired.append((session_id, 'max_duration'))
+            elif now - voice_session.last_activity >= self.idle_timeout and not self.is_attached(session_id):
+                expired.append((session_id, 'idle'))
+
+        reaped = []
+        for session_id, reason in expired:
+            voice_session = self.pop(session_id)
+            if voice_session is None:
+                continue
+            with self._lock:
+                self.reaped[reason] += 1
+                if voice_session.is_connected:
+                    self.leaked += 1
+            try:
+                voice_session.disconnect()
+            except Exception:
+                pass
+            reaped.append((session_id, reason))
+        return reaped
+
+    def start_reaper(self, start_background_task, sleep, on_reap=None):
+        with self._lock:
+            if self._reaper_started:
+                return
+            self._reaper_started = True
+        start_background_task(self._run_reaper, sleep, on_reap)
+
+    def _run_reaper(self, sleep, on_reap):
+        while True:
+            sleep(self.reap_interval)
+            try:
+                for session_id, reason in self.reap():
+                    if on_reap:
+                        on_reap(session_id, reason)
+                self.registry.refresh(self.ids())
+            except Exception:
+                continue
+
+    def metrics(self):
+        """Live sessions and lifecycle counters.
+
+        ``leaked`` counts reaped sessions that still held an open upstream
+        connection, i.e. resources that would have stayed alive forever.
+        """
+        with self._lock:
+            return {
+                'live': len(self._sessions),
+                'started': self.started,
+                'stopped': self.stopped,
+                'reaped': dict(self.reaped),
+                'leaked': self.leaked,
+            }
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import json_backend
+from stream_handler import SERVER_VAD
+
+# Browser codecs a profile may impose: the ones the bundled voice interface decodes.
+# adpcm and opus stay available to clients that ask for them explicitly.
+ENCODINGS = ('pcm16', 'mulaw')
+
+
+class SessionProfile:
+    """Named realtime session settings, serialised once.
+
+    The ``session.update`` message is built and encoded when the profile is
+    created, in two variants (server turn detection on or off), so opening
+    a connection only sends a cached string. ``encoding`` is the browser-leg
+    codec of clients that do not request one, so it is limited to codecs the
+    bundled interface decodes; the upstream audio format stays PCM16 24 kHz.
+    """
+
+    FIELDS = ('model', 'voice', 'instructions', 'turn_detection', 'transcription_model',
+              'modalities', 'temperature', 'encoding')
+
+    def __init__(self, name, instructions, model=None, voice='alloy', turn_detection=SERVER_VAD,
+                 transcription_model='whisper-1', modalities=('text', 'audio'), temperature=None,
+                 encoding='pcm16'):
+        if not isinstance(instructions, str):
+            raise ValueError(f"profile {name}: 'instructions' must be a string")
+        if not isinstance(voice, str):
+            raise ValueError(f"profile {name}: 'voice' must be a string")
+        if turn_detection is not None and not isinstance(turn_detection, dict):
+            raise ValueError(f"profile {name}: 'turn_detection' must be an object or null")
+        for field, value in (('model', model), ('transcription_model', transcription_model)):
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"profile {name}: '{field}' must be a string or null")
+        if isinstance(modalities, str) or not isinstance(modalities, (list, tuple)) \
+                or not all(isinstance(modality, str) for modality in modalities):
+            raise ValueError(f"profile {name}: 'modalities' must be a list of strings")
+        if temperature is not None and (isinstance(temperature, bool) or not isinstance(temperature, (int, float))):
+            raise ValueError(f"profile {name}: 'temperature' must be a number or null")
+        if not isinstance(encoding, str) or encoding not in ENCODINGS:
+            raise ValueError(f"profile {name}: encoding must be one of {', '.join(ENCODINGS)}, not {encoding}")
+        self.name = name
+        self.instructions = instructions
+        self.model = model
+        self.voice = voice
+        self.turn_detection = dict(turn_detection) if turn_detection is not None else None
+        self.transcription_model = transcription_model
+        self.modalities = list(modalities)
+        self.temperature = temperature
+        self.encoding = encoding
+        self._payloads = {server_vad: json_backend.dumps(self.session_config(server_vad))
+                          for server_vad in (True, False)}
+        # Identifies the settings that shape a reply (audio cache keys), whatever the JSON backend
+        config = json.dumps(self.session_config(True), sort_keys=True)
+        self.fingerprint = hashlib.sha256(config.encode('utf-8')).hexdigest()[:16]
+
+    def session_config(self, server_vad=True):
+        session = {
+            "modalities": self.modalities,
+            "voice": self.voice,
+            "instructions": self.instructions,
+            "turn_detection": self.turn_detection if server_vad else None,
+            "input_audio_format": "pcm16",
+            "output_audio_format": "pcm16",
+            "input_audio_transcription": {"model": self.transcription_model} if self.transcription_model else None,
+        }
+        if self.temperature is not None:
+            session["temperature"] = self.temperature
+        return {"type": "session.update", "session": session}
+
+    def session_update(self, server_vad=True):
+        """The serialised ``session.update`` message."""
+        return self._payloads[bool(server_vad)]
+
+    def settings(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, name, data, base):
+        """Profile read from the profiles file; missing fields come from ``base``."""
+        if not isinstance(data, dict):
+            raise ValueError(f"profile {name}: expected an object")
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError(f"profile {name}: unknown fields {', '.join(sorted(unknown))}")
+        settings = base.settings()
+        settings.update(data)
+        turn_detection = data.get('turn_detection', base.turn_detection)
+        if isinstance(turn_detection, dict):
+            # Partial VAD settings complete the default server VAD
+            turn_detection = dict(SERVER_VAD, **turn_detection)
+        settings['turn_detection'] = turn_detection
+        return cls(name, **settings)
+
+
+class ProfileStore:
+    """Session profiles from a JSON file, reloaded when the file changes.
+
+    The file holds ``profiles`` (name -> settings), an optional ``users``
+    mapping (user -> profile name) and an optional ``default`` profile
+    name. The file's mtime is checked at most every ``check_interval``
+    seconds on lookup, so edits apply to new connections without a
+    restart. A file that fails to load keeps the previous profiles.
+    """
+
+    def __init__(self, path, base, check_interval=2.0, on_reload=None):
+        self.path = path
+        self.base = base
+        self.check_interval = check_interval
+        self.on_reload = on_reload
+        self.profiles = {base.name: base}
+        self.users = {}
+        self.default = base.name
+        self.version = 0
+        self.reloads = 0
+        self.errors = 0
+        self.last_error = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the file if present; raise ValueError when it is invalid."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime is None:
+            profiles, users, default = {self.base.name: self.base}, {}, self.base.name
+        else:
+            profiles, users, default = self._parse()
+        self.profiles, self.users, self.default = profiles, users, default
+        self._mtime = mtime
+        self.version += 1
+
+    def _parse(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"{self.path}: {e}")
+        if not isinstance(data, dict):
+            raise ValueError(f"{self.path}: expected an object")
+
+        profiles = {self.base.name: self.base}
+        entries = data.get('profiles') or {}
+        if not isinstance(entries, dict):
+            raise ValueError(f"{self.path}: 'profiles' must be an object")
+        for name, settings in entries.items():
+            profiles[name] = SessionProfile.from_dict(name, settings, self.base)
+        users = data.get('users') or {}
+        if not isinstance(users, dict) or not all(isinstance(name, str) for name in users.values()):
+            raise ValueError(f"{self.path}: 'users' must map user names to profile names")
+        default = data.get('default', self.base.name)
+        if not isinstance(default, str):
+            raise ValueError(f"{self.path}: 'default' must be a profile name")
+        for name in [default, *users.values()]:
+            if name not in profiles:
+                raise ValueError(f"{self.path}: unknown profile {name}")
+        return profiles, users, default
+
+    def maybe_reload(self):
+        """Reload the file if its mtime changed; return True after a reload."""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime == self._mtime:
+                return False
+            try:
+                self.load()
+            except Exception as e:
+                # Whatever is wrong with the file, keep the previous profiles
+                # and do not retry the same broken file on every lookup
+                self.errors += 1
+                self.last_error = str(e)
+                self._mtime = mtime
+                return False
+            self.reloads += 1
+            self.last_error = None
+        if self.on_reload:
+            self.on_reload(self)
+        return True
+
+    def get(self, name=None):
+        """Profile by name (default profile for None); ValueError if unknown."""
+        self.maybe_reload()
+        profile = self.profiles.get(name or self.default)
+        if profile is None:
+            raise ValueError(f"unknown session profile: {name}")
+        return profile
+
+    def for_user(self, user):
+        self.maybe_reload()
+        return self.get(self.users.get(user))
+
+    def stats(self):
+        return {
+            'profiles': sorted(self.profiles),
+            'default': self.default,
+            'version': self.version,
+            'reloads': self.reloads,
+            'errors': self.errors,
+            'last_error': self.last_error,
+        }
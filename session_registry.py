@@ -0,0 +1,176 @@
+import base64
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Atomic compare-and-delete: only the owner releases a session
+UNREGISTER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class InMemorySessionRegistry:
+    """Single-process registry: sessions can only be owned by this worker."""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def register(self, session_id):
+        with self._lock:
+            if self._owners.get(session_id, self.worker_id) != self.worker_id:
+                return False
+            self._owners[session_id] = self.worker_id
+            return True
+
+    def unregister(self, session_id):
+        with self._lock:
+            if self._owners.get(session_id) == self.worker_id:
+                del self._owners[session_id]
+
+    def refresh(self, session_ids):
+        pass
+
+    def owner(self, session_id):
+        with self._lock:
+            return self._owners.get(session_id)
+
+    def forward(self, session_id, command, **payload):
+        return False
+
+    def subscribe(self, handler):
+        pass
+
+    def close(self):
+        pass
+
+
+class RedisSessionRegistry:
+    """Registry shared by every worker through a Redis-compatible server.
+
+    Ownership is a ``<prefix>:session:<id>`` key holding the worker id, with
+    a TTL so sessions of a dead worker expire. Commands for a session owned
+    elsewhere (audio, end of speech, stop) are published on the owner's
+    ``<prefix>:worker:<id>`` channel. Ownership is claimed with ``SET NX``
+    and released with a compare-and-delete script, so two workers never
+    both own a session. ``client`` only needs ``get``, ``set``, ``eval``,
+    ``expire``, ``publish`` and ``pubsub``.
+    """
+
+    def __init__(self, client, worker_id, prefix='voix', ttl=3600, resubscribe_delay=1.0):
+        self.client = client
+        self.worker_id = worker_id
+        self.prefix = prefix
+        self.ttl = ttl
+        self.resubscribe_delay = resubscribe_delay
+        self._pubsub = None
+        self._closed = threading.Event()
+
+    def _key(self, session_id):
+        return f"{self.prefix}:session:{session_id}"
+
+    def _channel(self, worker_id):
+        return f"{self.prefix}:worker:{worker_id}"
+
+    def register(self, session_id):
+        """Claim ``session_id``; False if another worker already owns it."""
+        if self.client.set(self._key(session_id), self.worker_id, nx=True, ex=self.ttl):
+            return True
+        if self.owner(session_id) == self.worker_id:
+            self.client.expire(self._key(session_id), self.ttl)
+            return True
+        return False
+
+    def unregister(self, session_id):
+        self.client.eval(UNREGISTER_SCRIPT, 1, self._key(session_id), self.worker_id)
+
+    def refresh(self, session_ids):
+        for session_id in session_ids:
+            self.client.expire(self._key(session_id), self.ttl)
+
+    def owner(self, session_id):
+        value = self.client.get(self._key(session_id))
+        if isinstance(value, bytes):
+            value = value.decode()
+        return value
+
+    def forward(self, session_id, command, **payload):
+        """Publish ``command`` to the worker owning ``session_id``."""
+        owner = self.owner(session_id)
+        if owner is None or owner == self.worker_id:
+            return False
+        if isinstance(payload.get('audio'), (bytes, bytearray)):
+            payload['audio'] = base64.b64encode(payload['audio']).decode()
+            payload['binary'] = True
+        message = dict(payload, session_id=session_id, command=command)
+        return self.client.publish(self._channel(owner), json.dumps(message)) > 0
+
+    def subscribe(self, handler):
+        """Deliver commands addressed to this worker to ``handler(message)``.
+
+        The subscription is renewed if the pub/sub connection drops.
+        """
+        self._subscribe()
+        thread = threading.Thread(target=self._listen, args=(handler,), name='registry-listener', daemon=True)
+        thread.start()
+
+    def _subscribe(self):
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            except Exception:
+                pass
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self._channel(self.worker_id))
+
+    def _listen(self, handler):
+        while not self._closed.is_set():
+            try:
+                for item in self._pubsub.listen():
+                    if item.get('type') == 'message':
+                        self._deliver(handler, item)
+            except Exception:
+                if self._closed.is_set():
+                    return
+                logger.exception("Session registry subscription lost, resubscribing")
+            if self._closed.is_set():
+                return
+            self._closed.wait(self.resubscribe_delay)
+            try:
+                self._subscribe()
+            except Exception:
+                logger.exception("Session registry resubscription failed")
+
+    def _deliver(self, handler, item):
+        try:
+            message = json.loads(item['data'])
+            if message.pop('binary', False):
+                message['audio'] = base64.b64decode(message['audio'])
+            handler(message)
+        except Exception:
+            logger.exception("Forwarded session command failed")
+
+    def close(self):
+        self._closed.set()
+        if self._pubsub is not None:
+            self._pubsub.close()
+
+
+def create_registry(url, worker_id, ttl=3600):
+    """Build the registry for ``url`` (empty: in-memory, redis://...: Redis)."""
+    if not url:
+        return InMemorySessionRegistry(worker_id)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("the 'redis' package is required for a Redis session registry")
+        return RedisSessionRegistry(redis.Redis.from_url(url), worker_id, ttl=ttl)
+    raise ValueError(f"unsupported session registry URL: {url}")
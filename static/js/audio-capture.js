@@ -1,5 +1,5 @@
 export class AudioCapture {
-  constructor({onAudioFrame, onSpeechStart, onSpeechStop, sampleRate=24000, bufferSize=4096, threshold=0.01, silenceFrames=20}) {
+  constructor({onAudioFrame, onSpeechStart, onSpeechStop, sampleRate=null, bufferSize=4096, threshold=0.01, silenceFrames=20}) {
     this.onAudioFrame = onAudioFrame;
     this.onSpeechStart = onSpeechStart;
     this.onSpeechStop = onSpeechStop;
@@ -15,8 +15,12 @@ export class AudioCapture {
   }
 
   async start() {
-    this.audioContext = new (window.AudioContext || window.webkitAudioContext)({sampleRate: this.sampleRate});
-    this.stream = await navigator.mediaDevices.getUserMedia({audio: {sampleRate: this.sampleRate, channelCount: 1}});
+    // Without an explicit rate the context runs at the hardware rate; the
+    // server resamples (see the 'audio_format' Socket.IO event)
+    const options = this.sampleRate ? {sampleRate: this.sampleRate} : {};
+    this.audioContext = new (window.AudioContext || window.webkitAudioContext)(options);
+    this.sampleRate = this.audioContext.sampleRate;
+    this.stream = await navigator.mediaDevices.getUserMedia({audio: {channelCount: 1}});
     const source = this.audioContext.createMediaStreamSource(this.stream);
     this.processor = this.audioContext.createScriptProcessor(this.bufferSize, 1, 1);
     source.connect(this.processor);
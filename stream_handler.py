@@ -1,64 +1,164 @@
-import json
 import threading
 import base64
 import websocket
 
+import json_backend
 
-class OpenAIStreamHandler:
-    """Handle real-time audio streaming with OpenAI via WebSocket."""
 
-    def __init__(self, api_key, model, instructions, event_callback=None):
+DEFAULT_REALTIME_URL = "wss://api.openai.com/v1/realtime"
+SERVER_VAD = {"type": "server_vad", "threshold": 0.5}
+# pcm16 is always 24 kHz mono on the realtime API
+UPSTREAM_SAMPLE_RATE = 24000
+
+
+def b64_payload_size(audio_b64):
+    """Return the decoded size of a base64 string without decoding it."""
+    size = len(audio_b64)
+    if not size:
+        return 0
+    padding = 2 if audio_b64.endswith('==') else 1 if audio_b64.endswith('=') else 0
+    return size * 3 // 4 - padding
+
+
+class BaseStreamHandler:
+    """Transport-independent part of an OpenAI realtime connection.
+
+    Subclasses deliver ``open``/``message``/``error``/``close`` events through
+    ``event_callback`` and implement ``start``, ``send``, ``close``.
+    """
+
+    def __init__(self, api_key, model, instructions, event_callback=None, url=None,
+                 turn_detection=SERVER_VAD, profile=None):
         self.api_key = api_key
         self.model = model
         self.instructions = instructions
         self.event_callback = event_callback
+        self.url = url or DEFAULT_REALTIME_URL
+        # None disables upstream turn detection (turns are committed locally)
+        self.turn_detection = turn_detection
+        # SessionProfile whose pre-serialised session.update is sent on connect
+        self.profile = profile
         self.ws = None
         self.connected = threading.Event()
         self.stopped = threading.Event()
+        self._state_lock = threading.Lock()
 
     def _emit(self, event, data):
         if self.event_callback:
             self.event_callback(event, data)
 
-    def on_open(self, ws):
-        self.connected.set()
-        self._emit('open', None)
-        config = {
+    def _mark_closed(self, status):
+        """Clear the connected flag and emit ``close`` exactly once."""
+        with self._state_lock:
+            if not self.connected.is_set():
+                return
+            self.connected.clear()
+        self._emit('close', status)
+
+    @property
+    def endpoint(self):
+        return f"{self.url}?model={self.model}"
+
+    def headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "OpenAI-Beta": "realtime=v1",
+        }
+
+    def session_config(self):
+        return {
             "type": "session.update",
             "session": {
                 "modalities": ["text", "audio"],
                 "voice": "alloy",
                 "instructions": self.instructions,
-                "turn_detection": {"type": "server_vad", "threshold": 0.5},
+                "turn_detection": self.turn_detection,
                 "input_audio_format": "pcm16",
                 "output_audio_format": "pcm16",
                 "input_audio_transcription": {"model": "whisper-1"}
             }
         }
-        ws.send(json.dumps(config))
+
+    def session_message(self):
+        """Serialised ``session.update``, sent once per connection."""
+        if self.profile is not None:
+            return self.profile.session_update(server_vad=self.turn_detection is not None)
+        return json_backend.dumps(self.session_config())
 
     def on_message(self, ws, message):
         try:
-            data = json.loads(message)
+            data = json_backend.loads(message)
         except Exception:
             return
         self._emit('message', data)
 
+    def send(self, payload):
+        raise NotImplementedError
+
+    def pending_sends(self):
+        """Messages queued but not yet written to the socket."""
+        return 0
+
+    def send_audio(self, pcm16_bytes, event_id=None):
+        return self.send_audio_b64(base64.b64encode(pcm16_bytes).decode(), event_id)
+
+    def send_audio_b64(self, audio_b64, event_id=None):
+        """Forward already base64-encoded PCM16 without decoding it.
+
+        ``event_id`` tags the append message (trace id of a sampled chunk);
+        the server echoes it in errors about that message.
+        """
+        if not self.connected.is_set():
+            return False
+        message = {"type": "input_audio_buffer.append", "audio": audio_b64}
+        if event_id is not None:
+            message["event_id"] = event_id
+        self.send(message)
+        return True
+
+    def stop_audio(self):
+        if self.connected.is_set():
+            # Finalize the input audio and request a response
+            self.send({"type": "input_audio_buffer.commit"})
+            self.send({"type": "response.create"})
+
+    def cancel_response(self, item_id=None, audio_end_ms=None):
+        """Cancel the response in progress and truncate its audio item to
+        what the listener actually heard, so the model's context matches."""
+        if not self.connected.is_set():
+            return False
+        self.send({"type": "response.cancel"})
+        if item_id is not None and audio_end_ms is not None:
+            self.truncate_item(item_id, audio_end_ms)
+        return True
+
+    def truncate_item(self, item_id, audio_end_ms):
+        """Truncate a finished audio item to what the listener heard."""
+        if not self.connected.is_set():
+            return False
+        self.send({"type": "conversation.item.truncate", "item_id": item_id,
+                   "content_index": 0, "audio_end_ms": int(audio_end_ms)})
+        return True
+
+
+class OpenAIStreamHandler(BaseStreamHandler):
+    """Handle real-time audio streaming with OpenAI via WebSocket."""
+
+    def on_open(self, ws):
+        self.connected.set()
+        self._emit('open', None)
+        ws.send(self.session_message())
+
     def on_error(self, ws, error):
         self._emit('error', str(error))
 
     def on_close(self, ws, status, msg):
-        self.connected.clear()
-        self._emit('close', status)
+        self._mark_closed(status)
 
     def start(self):
-        url = f"wss://api.openai.com/v1/realtime?model={self.model}"
-        headers = [
-            f"Authorization: Bearer {self.api_key}",
-            "OpenAI-Beta: realtime=v1"
-        ]
+        headers = [f"{name}: {value}" for name, value in self.headers().items()]
         self.ws = websocket.WebSocketApp(
-            url,
+            self.endpoint,
             header=headers,
             on_open=self.on_open,
             on_message=self.on_message,
@@ -69,23 +169,13 @@ class OpenAIStreamHandler:
         thread.start()
         return self.connected.wait(timeout=5)
 
-    def send_audio(self, pcm16_bytes):
-        if not self.connected.is_set():
-            return False
-        audio = base64.b64encode(pcm16_bytes).decode()
-        msg = {"type": "input_audio_buffer.append", "audio": audio}
-        self.ws.send(json.dumps(msg))
-        return True
-
-    def stop_audio(self):
-        if self.connected.is_set():
-            # Finalize the input audio and request a response
-            self.ws.send(json.dumps({"type": "input_audio_buffer.commit"}))
-            self.ws.send(json.dumps({"type": "response.create"}))
-
+    def send(self, payload):
+        self.ws.send(json_backend.dumps(payload))
 
     def close(self):
         if self.ws:
             self.ws.close()
             self.ws = None
+        # websocket-client may skip on_close when the socket is closed locally
+        self._mark_closed(None)
         self.stopped.set()
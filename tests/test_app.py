@@ -4,6 +4,8 @@ import importlib
 import base64
 import json
 import io
+import threading
+import time
 import pytest
 
 # Configurer les variables d'environnement requises avant l'import de l'application
@@ -140,7 +142,8 @@ def test_upload_page(client):
     assert resp.status_code == 200
 
 
-def test_file_upload(client):
+def test_file_upload(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'UPLOADS_DIR', str(tmp_path))
     client.post('/login', data={'username': 'tester', 'password': ''})
     data = {
         'file': (io.BytesIO(b'data'), 'sample.wav')
@@ -148,3 +151,870 @@ def test_file_upload(client):
     resp = client.post('/upload', data=data, content_type='multipart/form-data')
     assert resp.status_code == 200
     assert b'sample.wav' in resp.data
+    # Nom préfixé : un second envoi du même nom n'écrase pas le premier
+    client.post('/upload', data={'file': (io.BytesIO(b'data'), 'sample.wav')}, content_type='multipart/form-data')
+    stored = os.listdir(tmp_path)
+    assert len(stored) == 2 and all(name.endswith('_sample.wav') for name in stored)
+
+
+def test_socketio_audio_in(client, monkeypatch):
+    client.post('/login', data={'username': 'tester', 'password': ''})
+
+    sent = []
+
+    def fake_start(self):
+        self.is_connected = True
+        self.is_ready = True
+        return True
+
+    monkeypatch.setattr(app.VoiceSession, 'start_connection', fake_start)
+    resp = client.post('/api/start_dialogue')
+    assert resp.status_code == 200
+
+    with client.session_transaction() as sess:
+        session_id = sess['session_id']
+    voice_session = app.active_sessions[session_id]
+    monkeypatch.setattr(voice_session.stream, 'send_audio', lambda pcm: sent.append(pcm) or True)
+
+    sio = app.socketio.test_client(app.app, flask_test_client=client)
+    assert sio.is_connected()
+
+    # Trames binaires avec numéro de séquence
+    ack = sio.emit('audio_in', {'seq': 0, 'audio': b'\x01\x00\x02\x00'}, callback=True)
+    assert ack == {'ok': True, 'seq': 0}
+    ack = sio.emit('audio_in', {'seq': 1, 'audio': b'\x03\x00'}, callback=True)
+    assert ack['ok'] is True
+
+    # Une trame en retard est ignorée pour préserver l'ordre
+    ack = sio.emit('audio_in', {'seq': 0, 'audio': b'\x09\x00'}, callback=True)
+    assert ack['ok'] is False
+
+    # Octets bruts sans séquence
+    ack = sio.emit('audio_in', b'\x04\x00', callback=True)
+    assert ack['ok'] is True
+
+    assert sent == [b'\x01\x00\x02\x00', b'\x03\x00', b'\x04\x00']
+    assert voice_session.stats['chunks_sent'] == 3
+    assert voice_session.stats['bytes_sent'] == 8
+    assert voice_session.stats['chunks_dropped'] == 1
+
+    sio.disconnect()
+    app.active_sessions.pop(session_id, None)
+
+
+def test_socketio_audio_in_without_session(client):
+    client.post('/login', data={'username': 'tester', 'password': ''})
+    sio = app.socketio.test_client(app.app, flask_test_client=client)
+    ack = sio.emit('audio_in', b'\x00\x00', callback=True)
+    assert ack['ok'] is False
+    sio.disconnect()
+
+
+def test_audio_delta_passthrough(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: emitted.append((event, data)))
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'EGRESS_QUEUE_SIZE', 0)
+    voice_session = app.VoiceSession('passthrough')
+    delta = base64.b64encode(b'\x01\x02\x03\x04\x05').decode()
+
+    voice_session.on_message(None, json.dumps({'type': 'response.audio.delta', 'delta': delta}))
+    assert ('audio_output', {'audio': delta}) in emitted
+    assert voice_session.recorder is None
+    assert voice_session.stats['bytes_received'] == 5
+
+
+
+def test_audio_in_base64_passthrough(monkeypatch):
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'EGRESS_QUEUE_SIZE', 0)
+    voice_session = app.VoiceSession('passthrough_in')
+    voice_session.is_ready = True
+    sent = []
+    monkeypatch.setattr(voice_session.stream, 'send_audio_b64', lambda audio_b64: sent.append(audio_b64) or True)
+    audio = base64.b64encode(b'\x01\x00' * 240).decode()
+
+    # Configuration par défaut : ni VAD, ni regroupement, ni codec, le base64 est transmis tel quel
+    assert not voice_session.needs_pcm()
+    assert voice_session.send_audio(audio) is True
+    assert sent == [audio] and sent[0] is audio
+    assert voice_session.stats['chunks_sent'] == 1
+    assert voice_session.stats['bytes_sent'] == 480
+
+
+def test_streaming_recording(monkeypatch, tmp_path):
+    import wave
+
+    monkeypatch.setattr(app.socketio, 'emit', lambda *args, **kwargs: None)
+    monkeypatch.setattr(app, 'RECORD_AUDIO', True)
+    monkeypatch.setattr(app, 'RECORD_INPUT', True)
+    monkeypatch.setattr(app, 'RECORDINGS_DIR', str(tmp_path))
+    voice_session = app.VoiceSession('recording')
+    voice_session.is_ready = True
+    monkeypatch.setattr(voice_session.stream, 'send_audio', lambda pcm: True)
+
+    for chunk in (b'\x01\x00' * 10, b'\x02\x00' * 5):
+        delta = base64.b64encode(chunk).decode()
+        voice_session.on_message(None, json.dumps({'type': 'response.audio.delta', 'delta': delta}))
+    assert voice_session.send_audio_bytes(b'\x03\x00' * 4) is True
+
+    voice_session.disconnect()
+
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 2
+    output = [f for f in files if not f.endswith('_input.wav')][0]
+    with wave.open(str(tmp_path / output)) as wf:
+        assert wf.getframerate() == 24000
+        assert wf.readframes(wf.getnframes()) == b'\x01\x00' * 10 + b'\x02\x00' * 5
+    with wave.open(str(tmp_path / [f for f in files if f.endswith('_input.wav')][0])) as wf:
+        assert wf.getnframes() == 4
+
+
+def test_local_vad_commit(monkeypatch):
+    import numpy as np
+
+    monkeypatch.setattr(app.socketio, 'emit', lambda *args, **kwargs: None)
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'VAD_ENABLED', True)
+    monkeypatch.setattr(app, 'VAD_LOCAL_COMMIT', True)
+    monkeypatch.setattr(app, 'VAD_HANGOVER_MS', 200)
+    voice_session = app.VoiceSession('vad')
+    voice_session.is_ready = True
+    sent, commits = [], []
+    monkeypatch.setattr(voice_session.stream, 'send_audio', lambda pcm: sent.append(pcm) or True)
+    monkeypatch.setattr(voice_session.stream, 'stop_audio', lambda: commits.append(True))
+
+    silence = np.zeros(2400, dtype=np.int16).tobytes()
+    t = np.arange(2400) / 24000
+    speech = (np.sin(2 * np.pi * 220 * t) * 10000).astype(np.int16).tobytes()
+
+    for _ in range(3):
+        assert voice_session.send_audio_bytes(silence) is True
+    assert sent == []
+    for chunk in [speech, speech, speech, silence, silence, silence]:
+        voice_session.send_audio_bytes(chunk)
+
+    assert commits == [True]
+    assert voice_session.stats['vad_commits'] == 1
+    assert voice_session.stats['vad_chunks_dropped'] >= 3
+    assert voice_session.stats['vad_bytes_dropped'] > 0
+    assert any(e.type == 'vad' for e in voice_session.events.since())
+
+
+def test_audio_aggregation_flushes_on_stop(monkeypatch):
+    monkeypatch.setattr(app.socketio, 'emit', lambda *args, **kwargs: None)
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'AUDIO_AGGREGATION', True)
+    monkeypatch.setattr(app, 'AUDIO_FRAME_MIN_MS', 100)
+    monkeypatch.setattr(app, 'AUDIO_MAX_LATENCY_MS', 10000)
+    voice_session = app.VoiceSession('aggregation')
+    voice_session.is_ready = True
+    calls = []
+    monkeypatch.setattr(voice_session.stream, 'send_audio', lambda pcm: calls.append(('append', pcm)) or True)
+    monkeypatch.setattr(voice_session.stream, 'stop_audio', lambda: calls.append(('commit', None)))
+
+    # Le base64 est décodé pour le regroupement
+    for _ in range(3):
+        assert voice_session.send_audio(base64.b64encode(b'\x01\x00' * 240).decode()) is True
+    assert calls == []
+
+    assert voice_session.stop_audio() is True
+    assert calls == [('append', b'\x01\x00' * 720), ('commit', None)]
+    assert voice_session.stats_snapshot()['aggregation']['chunks_in'] == 3
+    voice_session.stop_event.set()
+
+
+def test_audio_forwarded_to_owning_worker(client, monkeypatch):
+    client.post('/login', data={'username': 'tester', 'password': ''})
+    forwarded = []
+
+    class RemoteRegistry:
+        """Registre factice : la session appartient à un autre worker"""
+
+        def owner(self, session_id):
+            return 'other-worker'
+
+        def forward(self, session_id, command, **payload):
+            forwarded.append((command, payload))
+            return True
+
+    monkeypatch.setattr(app, 'session_registry', RemoteRegistry())
+
+    resp = client.post('/api/start_dialogue')
+    assert resp.status_code == 400
+
+    payload = {'audio': base64.b64encode(b'test').decode()}
+    resp = client.post('/api/send_audio', json=payload)
+    assert resp.status_code == 200
+    assert resp.get_json()['forwarded'] is True
+
+    sio = app.socketio.test_client(app.app, flask_test_client=client)
+    ack = sio.emit('audio_in', {'seq': 3, 'audio': b'\x00\x00'}, callback=True)
+    assert ack['forwarded'] is True
+    sio.disconnect()
+
+    assert client.post('/api/end_audio').status_code == 200
+    assert client.get('/api/status').get_json()['owner'] == 'other-worker'
+    assert client.post('/api/stop_dialogue').status_code == 200
+
+    assert [c for c, _ in forwarded] == ['send_audio', 'send_audio_bytes', 'stop_audio', 'stop_dialogue']
+    assert forwarded[1][1] == {'audio': b'\x00\x00', 'seq': 3}
+
+
+def test_sessions_metrics(client):
+    resp = client.get('/api/sessions')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert {'live', 'reaped', 'leaked'} <= set(data)
+
+
+def test_events_since_cursor(client, monkeypatch):
+    client.post('/login', data={'username': 'tester', 'password': ''})
+    monkeypatch.setattr(app.VoiceSession, 'start_connection', lambda self: True)
+    monkeypatch.setattr(app.VoiceSession, 'disconnect', lambda self: None)
+    assert client.post('/api/start_dialogue').status_code == 200
+    with client.session_transaction() as sess:
+        voice_session = app.active_sessions[sess['session_id']]
+
+    for i in range(3):
+        voice_session.add_event('test', f'événement {i}')
+    events = client.get('/api/events').get_json()
+    assert [e['data'] for e in events] == ['événement 0', 'événement 1', 'événement 2']
+
+    cursor = events[-1]['id']
+    voice_session.add_event('test', 'nouveau')
+    events = client.get(f'/api/events?since={cursor}').get_json()
+    assert [e['data'] for e in events] == ['nouveau']
+    assert set(events[0]) == {'id', 'timestamp', 'type', 'level', 'data'}
+
+    assert client.post('/api/stop_dialogue').status_code == 200
+
+
+def test_metrics_endpoint(client, monkeypatch):
+    monkeypatch.setattr(app.socketio, 'emit', lambda *args, **kwargs: None)
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    voice_session = app.VoiceSession('metrics')
+    ready_before = app.time_to_ready_hist.count
+    first_audio_before = app.speech_to_audio_hist.count
+
+    delta = base64.b64encode(b'\x00' * 480).decode()
+    for message in ({'type': 'session.updated'},
+                    {'type': 'input_audio_buffer.speech_stopped'},
+                    {'type': 'response.created', 'response': {'id': 'r1'}},
+                    {'type': 'response.audio.delta', 'delta': delta},
+                    {'type': 'response.audio.delta', 'delta': delta},
+                    {'type': 'response.done'}):
+        voice_session.on_message(None, json.dumps(message))
+
+    assert app.time_to_ready_hist.count == ready_before + 1
+    # Seul le premier delta après la fin de parole est mesuré
+    assert app.speech_to_audio_hist.count == first_audio_before + 1
+
+    resp = client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.content_type.startswith('text/plain')
+    body = resp.get_data(as_text=True)
+    assert '# TYPE voix_response_duration_seconds histogram' in body
+    assert 'voix_egress_chunk_bytes_bucket{le="512"}' not in body
+    assert 'voix_egress_chunk_bytes_bucket{le="1024"}' in body
+    assert 'voix_ingest_pending 0' in body
+
+
+def test_stream_messages_dispatched_without_reencoding(monkeypatch):
+    emitted = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: emitted.append(event))
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app.json_backend, 'loads', lambda message: pytest.fail('message redécodé'))
+    voice_session = app.VoiceSession('dispatch')
+
+    voice_session.handle_stream_event('message', {'type': 'session.updated'})
+    voice_session.handle_stream_event('message', {'type': 'rate_limits.updated', 'rate_limits': []})
+    voice_session.handle_stream_event('message', {'type': 'response.audio.delta'})
+
+    assert voice_session.is_ready
+    assert 'session_ready' in emitted
+    # Un gestionnaire en échec est journalisé sans interrompre la session
+    assert voice_session.events.to_list()[-1]['level'] == 'error'
+
+
+def test_negotiated_sample_rates(client, monkeypatch):
+    emitted = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: emitted.append((event, data)))
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'EGRESS_QUEUE_SIZE', 0)
+    voice_session = app.VoiceSession('rates', input_rate=48000, output_rate=48000)
+    voice_session.is_ready = True
+    sent = []
+    monkeypatch.setattr(voice_session.stream, 'send_audio', lambda pcm: sent.append(pcm) or True)
+
+    # Micro 48 kHz -> OpenAI 24 kHz
+    assert voice_session.send_audio_bytes(b'\x00\x01' * 960) is True
+    assert sum(len(pcm) for pcm in sent) == 960
+
+    # OpenAI 24 kHz -> lecture 48 kHz
+    delta = base64.b64encode(b'\x00\x01' * 480).decode()
+    voice_session.handle_stream_event('message', {'type': 'response.audio.delta', 'delta': delta})
+    audio = [data['audio'] for event, data in emitted if event == 'audio_output']
+    assert len(base64.b64decode(audio[0])) == 1920
+    assert voice_session.stats['bytes_received'] == 960
+
+    assert voice_session.set_audio_format(24000, None) == {'encoding': 'pcm16', 'input_rate': 24000,
+                                                            'output_rate': 48000}
+    assert voice_session.input_resampler is None
+
+
+def test_start_dialogue_rejects_unsupported_rate(client):
+    client.post('/login', data={'username': 'tester', 'password': ''})
+    resp = client.post('/api/start_dialogue', json={'input_rate': 12345})
+    assert resp.status_code == 400
+    resp = client.get('/api/generate_test_audio?sample_rate=48000')
+    assert len(base64.b64decode(resp.get_json()['audio'])) == 96000
+
+
+def test_failed_start_releases_session_tasks(client, monkeypatch):
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'EGRESS_QUEUE_SIZE', 4)
+    monkeypatch.setattr(app.socketio, 'start_background_task', lambda *args, **kwargs: None)
+    created = []
+    original_init = app.VoiceSession.__init__
+
+    def init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        created.append(self)
+
+    monkeypatch.setattr(app.VoiceSession, '__init__', init)
+    monkeypatch.setattr(app.VoiceSession, 'start_connection', lambda self: False)
+    client.post('/login', data={'username': 'tester', 'password': ''})
+
+    resp = client.post('/api/start_dialogue')
+    assert resp.status_code == 500
+    # Échec de connexion : ni émetteur enregistré ni file de sortie ouverte
+    voice_session = created[0]
+    assert voice_session.emitter not in app.flush_scheduler._emitters
+    assert voice_session.egress._closed
+    assert not app.active_sessions.get(voice_session.session_id)
+
+
+def test_mulaw_session_decodes_and_encodes_browser_audio(client, monkeypatch):
+    emitted = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: emitted.append((event, data)))
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'EGRESS_QUEUE_SIZE', 0)
+    voice_session = app.VoiceSession('mulaw', encoding='mulaw')
+    voice_session.is_ready = True
+    sent = []
+    monkeypatch.setattr(voice_session.stream, 'send_audio', lambda pcm: sent.append(pcm) or True)
+
+    # Micro en μ-law -> PCM16 vers OpenAI
+    assert voice_session.send_audio_bytes(b'\xff' * 2400) is True
+    assert sent == [b'\x00\x00' * 2400]
+
+    # PCM16 d'OpenAI -> μ-law binaire vers le navigateur
+    delta = base64.b64encode(b'\x00\x00' * 2400).decode()
+    voice_session.handle_stream_event('message', {'type': 'response.audio.delta', 'delta': delta})
+    output = [data for event, data in emitted if event == 'audio_output'][0]
+    assert output == {'audio': b'\xff' * 2400, 'encoding': 'mulaw'}
+
+    codec_stats = voice_session.stats_snapshot()['codec']
+    assert codec_stats == {'encoding': 'mulaw', 'savings_in': 0.5, 'savings_out': 0.5}
+    assert 'voix_browser_audio_bytes_total{codec="mulaw",direction="out"} 2400' in app.metrics_registry.render()
+
+    with pytest.raises(ValueError):
+        voice_session.set_audio_format(encoding='flac')
+    assert voice_session.audio_format()['encoding'] == 'mulaw'
+
+
+def test_barge_in_cancels_response_and_flushes_browser(client, monkeypatch):
+    emitted = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: emitted.append((event, data)))
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    # Tâche d'émission pilotée par le test (egress.drain)
+    monkeypatch.setattr(app.socketio, 'start_background_task', lambda target: None)
+    voice_session = app.VoiceSession('barge')
+    cancelled = []
+    monkeypatch.setattr(voice_session.stream, 'cancel_response',
+                        lambda item_id=None, audio_end_ms=None: cancelled.append((item_id, audio_end_ms)))
+    delta = {'type': 'response.audio.delta', 'item_id': 'item_1',
+             'delta': base64.b64encode(b'\x00\x00' * 2400).decode()}
+
+    voice_session.handle_stream_event('message', {'type': 'response.created', 'response': {'id': 'resp_1'}})
+    voice_session.handle_stream_event('message', delta)
+    voice_session.egress.drain()
+    # Un delta encore en file au moment de l'interruption n'est jamais émis
+    voice_session.handle_stream_event('message', delta)
+    # Lecture commencée depuis 40 ms : seul ce qui a été entendu est conservé
+    voice_session.response_audio_started_at -= 0.04
+    voice_session.handle_stream_event('message', {'type': 'input_audio_buffer.speech_started'})
+    voice_session.handle_stream_event('message', delta)
+    voice_session.handle_stream_event('message', {'type': 'response.done', 'response': {'status': 'cancelled'}})
+    voice_session.egress.drain()
+
+    assert len(cancelled) == 1
+    item_id, audio_end_ms = cancelled[0]
+    assert item_id == 'item_1' and 40 <= audio_end_ms < 100
+    assert [event for event, data in emitted if event in ('audio_output', 'audio_flush')] == \
+        ['audio_output', 'audio_flush']
+    assert voice_session.stats['barge_ins'] == 1
+    assert voice_session.stats['barge_in_dropped_bytes'] == 4800
+    assert voice_session.stats['messages_count'] == 0
+    assert voice_session.egress.stats()['dropped']['flushed'] == 1
+
+    # Une nouvelle réponse est de nouveau relayée
+    voice_session.handle_stream_event('message', {'type': 'response.created', 'response': {'id': 'resp_2'}})
+    voice_session.handle_stream_event('message', delta)
+    voice_session.egress.drain()
+    assert [event for event, data in emitted].count('audio_output') == 2
+
+
+def test_barge_in_after_response_done_truncates_playing_reply(client, monkeypatch):
+    emitted = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: emitted.append((event, data)))
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'EGRESS_QUEUE_SIZE', 0)
+    voice_session = app.VoiceSession('barge_done')
+    calls = []
+    monkeypatch.setattr(voice_session.stream, 'cancel_response',
+                        lambda item_id=None, audio_end_ms=None: calls.append(('cancel', item_id, audio_end_ms)))
+    monkeypatch.setattr(voice_session.stream, 'truncate_item',
+                        lambda item_id, audio_end_ms: calls.append(('truncate', item_id, audio_end_ms)))
+    # 1 s de réponse reçue d'un coup, réponse terminée avant la fin de la lecture
+    delta = {'type': 'response.audio.delta', 'item_id': 'item_1',
+             'delta': base64.b64encode(b'\x00\x00' * 24000).decode()}
+    voice_session.handle_stream_event('message', {'type': 'response.created', 'response': {'id': 'resp_1'}})
+    voice_session.handle_stream_event('message', delta)
+    voice_session.handle_stream_event('message', {'type': 'response.done', 'response': {'status': 'completed'}})
+    voice_session.response_audio_started_at -= 0.3
+
+    voice_session.handle_stream_event('message', {'type': 'input_audio_buffer.speech_started'})
+    # Rien à annuler chez OpenAI, mais l'élément est tronqué et le lecteur vidé
+    assert len(calls) == 1 and calls[0][:2] == ('truncate', 'item_1') and 300 <= calls[0][2] < 400
+    flushes = [data for event, data in emitted if event == 'audio_flush']
+    assert len(flushes) == 1 and flushes[0]['response_id'] is None
+    assert voice_session.stats['barge_ins'] == 1
+
+    # Réponse entièrement jouée : une nouvelle prise de parole n'interrompt rien
+    voice_session.handle_stream_event('message', {'type': 'response.created', 'response': {'id': 'resp_2'}})
+    voice_session.handle_stream_event('message', delta)
+    voice_session.handle_stream_event('message', {'type': 'response.done', 'response': {'status': 'completed'}})
+    voice_session.response_audio_started_at -= 2
+    voice_session.handle_stream_event('message', {'type': 'input_audio_buffer.speech_started'})
+    assert len(calls) == 1 and voice_session.stats['barge_ins'] == 1
+
+
+class FakeStream:
+    def __init__(self, start_ok=True):
+        self.start_ok = start_ok
+        self.connected = threading.Event()
+        self.sent = []
+        self.audio = []
+        self.event_ids = []
+
+    def start(self):
+        if self.start_ok:
+            self.connected.set()
+        return self.start_ok
+
+    def send(self, payload):
+        self.sent.append(payload)
+
+    def send_audio(self, pcm, event_id=None):
+        self.audio.append(pcm)
+        self.event_ids.append(event_id)
+        return True
+
+    def close(self):
+        self.connected.clear()
+
+
+def test_upstream_drop_reconnects_and_replays_state(monkeypatch):
+    emitted = []
+    tasks = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: emitted.append((event, data)))
+    monkeypatch.setattr(app.socketio, 'start_background_task', lambda target: tasks.append(target))
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'RECONNECT_BASE_DELAY', 0)
+    voice_session = app.VoiceSession('resume')
+    voice_session.is_ready = True
+    for message in ({'type': 'conversation.item.created', 'item': {'id': 'item_u1', 'role': 'user'}},
+                    {'type': 'conversation.item.input_audio_transcription.completed', 'item_id': 'item_u1',
+                     'transcript': 'Bonjour'}):
+        voice_session.handle_stream_event('message', message)
+
+    # Coupure : l'audio du micro est mis en attente au lieu d'être refusé
+    voice_session.handle_stream_event('close', 1006)
+    assert ('session_disconnected', {}) not in emitted
+    assert voice_session.send_audio_bytes(b'\x01\x00' * 10, seq=1) is True
+    assert voice_session.send_audio_bytes(b'\x02\x00' * 10, seq=2) is True
+
+    streams = []
+    monkeypatch.setattr(app, 'create_stream_handler',
+                        lambda callback, profile=None: streams.append(FakeStream(start_ok=len(streams) > 0)) or streams[-1])
+    tasks.pop()()
+    assert len(streams) == 2 and voice_session.reconnect_attempt == 2
+
+    # session.updated sur la nouvelle connexion : historique rejoué puis audio en attente
+    voice_session.handle_stream_event('message', {'type': 'session.updated', 'session': {}})
+    assert [event['item']['id'] for event in streams[1].sent] == ['item_u1']
+    assert streams[1].audio == [b'\x01\x00' * 10, b'\x02\x00' * 10]
+    assert voice_session.gap_buffer is None and voice_session.is_ready
+    assert voice_session.stats['reconnects'] == 1
+    assert voice_session.stats['gap_frames_buffered'] == 2
+    assert [event for event, data in emitted if event.startswith('session_')] == \
+        ['session_reconnecting', 'session_resumed', 'session_ready']
+
+
+def test_ingest_depth_counts_frames_in_flight(monkeypatch):
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'EGRESS_QUEUE_SIZE', 0)
+    voice_session = app.VoiceSession('depth')
+    voice_session.is_ready = True
+    depths = []
+    monkeypatch.setattr(voice_session, '_ingest_frame',
+                        lambda pcm=None, audio_b64=None, seq=None: depths.append(voice_session.ingest_depth()))
+    voice_session.send_audio_bytes(b'\x00\x00' * 10, seq=1)
+    assert depths == [1] and voice_session.ingest_depth() == 0
+
+
+def test_gap_buffer_bounds_decoded_audio_duration(monkeypatch):
+    tasks = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda *args, **kwargs: None)
+    monkeypatch.setattr(app.socketio, 'start_background_task', lambda target: tasks.append(target))
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'RECONNECT_BASE_DELAY', 0)
+    monkeypatch.setattr(app, 'RECONNECT_BUFFER_MS', 10)
+    voice_session = app.VoiceSession('gap_mulaw', encoding='mulaw')
+    voice_session.is_ready = True
+
+    # 3 trames μ-law de 5 ms : 10 ms de tampon n'en gardent que 2, malgré 1 octet par échantillon
+    voice_session.handle_stream_event('close', 1006)
+    for seq in (1, 2, 3):
+        assert voice_session.send_audio_bytes(b'\xff' * 120, seq=seq) is True
+    assert voice_session.send_audio_bytes(b'\xff' * 120, seq=2) is False
+    assert len(voice_session.gap_buffer) == 2 and voice_session.stats['gap_frames_dropped'] == 1
+
+    stream = FakeStream()
+    monkeypatch.setattr(app, 'create_stream_handler', lambda callback, profile=None: stream)
+    tasks.pop()()
+    voice_session.handle_stream_event('message', {'type': 'session.updated', 'session': {}})
+    # Rejoué en PCM16 déjà décodé
+    assert stream.audio == [b'\x00\x00' * 120] * 2
+
+
+def test_upstream_reconnect_gives_up(monkeypatch):
+    emitted = []
+    tasks = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: emitted.append((event, data)))
+    monkeypatch.setattr(app.socketio, 'start_background_task', lambda target: tasks.append(target))
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'RECONNECT_BASE_DELAY', 0)
+    monkeypatch.setattr(app, 'RECONNECT_MAX_ATTEMPTS', 2)
+    monkeypatch.setattr(app, 'create_stream_handler', lambda callback, profile=None: FakeStream(start_ok=False))
+    voice_session = app.VoiceSession('give_up')
+
+    voice_session.handle_stream_event('close', 1006)
+    tasks.pop()()
+    assert ('session_disconnected', {'reason': 'upstream'}) in emitted
+    assert voice_session.gap_buffer is None
+    assert voice_session.send_audio_bytes(b'\x00\x00') is False
+
+
+def test_chat_streams_sse_deltas(client, monkeypatch):
+    received = []
+
+    def fake_deltas(messages, abort_event=None):
+        received.append(messages)
+        yield 'Bon'
+        yield 'jour'
+
+    monkeypatch.setattr(app.chat_handler, 'stream_deltas', fake_deltas)
+    assert client.post('/api/chat', json={'message': 'Salut'}).status_code == 401
+    client.post('/login', data={'username': 'tester', 'password': ''})
+    assert client.post('/api/chat', json={'messages': [{'role': 'system', 'content': 'x'}]}).status_code == 400
+
+    resp = client.post('/api/chat', json={'message': 'Salut'})
+    assert resp.mimetype == 'text/event-stream'
+    body = resp.get_data(as_text=True)
+    assert body == 'data: {"delta":"Bon"}\n\ndata: {"delta":"jour"}\n\nevent: done\ndata: {}\n\n'
+    assert received[0][0] == {'role': 'system', 'content': app.INSTRUCTIONS}
+    assert received[0][1] == {'role': 'user', 'content': 'Salut'}
+
+    # Le chat reprend les instructions du profil de l'utilisateur, comme la voix
+    base = app.profile_store.base
+    monkeypatch.setattr(app.profile_store, 'users', {'tester': 'support'})
+    monkeypatch.setitem(app.profile_store.profiles, 'support',
+                        app.SessionProfile('support', 'Répondez en tant que support.', voice=base.voice))
+    monkeypatch.setattr(app.profile_store, 'maybe_reload', lambda: False)
+    client.post('/api/chat', json={'message': 'Salut'}).get_data()
+    assert received[1][0] == {'role': 'system', 'content': 'Répondez en tant que support.'}
+
+
+def test_chat_over_socketio(client, monkeypatch):
+    aborts = []
+
+    def fake_deltas(messages, abort_event=None):
+        aborts.append(abort_event)
+        yield 'Salut'
+
+    monkeypatch.setattr(app.chat_handler, 'stream_deltas', fake_deltas)
+    monkeypatch.setattr(app.socketio, 'start_background_task', lambda target, *args: target(*args))
+    client.post('/login', data={'username': 'tester', 'password': ''})
+    sio = app.socketio.test_client(app.app, flask_test_client=client)
+
+    ack = sio.emit('chat_message', {'chat_id': 7, 'message': 'Bonjour'}, callback=True)
+    assert ack == {'ok': True}
+    events = [(event['name'], event['args'][0]) for event in sio.get_received() if event['name'].startswith('chat_')]
+    assert events == [('chat_delta', {'chat_id': 7, 'delta': 'Salut'}),
+                      ('chat_done', {'chat_id': 7, 'aborted': False})]
+    assert app.chat_aborts == {}
+    sio.disconnect()
+
+
+def test_upload_streams_file_into_active_dialogue(client, monkeypatch, tmp_path):
+    import wave
+
+    emitted = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: emitted.append((event, data)))
+    monkeypatch.setattr(app.socketio, 'start_background_task', lambda target, *args: target(*args))
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'EGRESS_QUEUE_SIZE', 0)
+    monkeypatch.setattr(app, 'UPLOAD_SPEED', 0)
+    monkeypatch.setattr(app, 'UPLOADS_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'create_stream_handler', lambda callback, profile=None: FakeStream())
+
+    client.post('/login', data={'username': 'tester', 'password': ''})
+    with client.session_transaction() as sess:
+        session_id = sess['session_id']
+    voice_session = app.VoiceSession(session_id)
+    voice_session.is_ready = True
+    app.active_sessions.add(session_id, voice_session)
+
+    # 200 ms à 16 kHz, envoyé en corps brut
+    wav = io.BytesIO()
+    with wave.open(wav, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(b'\x10\x00' * 3200)
+    try:
+        resp = client.post('/api/upload?filename=clip.wav', data=wav.getvalue(),
+                           content_type='application/octet-stream')
+        job = resp.get_json()['job']
+        assert job is not None
+        assert resp.get_json()['stored_as'].endswith('_clip.wav')
+
+        status = client.get(f"/api/uploads/{job['job_id']}").get_json()
+        assert status['state'] == 'done' and status['duration'] == 0.2
+        # Rééchantillonné en 24 kHz par la tâche, sans passer par le format du navigateur
+        upstream = b''.join(voice_session.stream.audio)
+        assert len(upstream) == (4800 + 24000 * 800 // 1000) * 2
+        assert voice_session.stats['chunks_sent'] == len(voice_session.stream.audio)
+        assert [data['state'] for event, data in emitted if event == 'upload_progress'][-1] == 'done'
+        assert app.upload_jobs_counter.value({'result': 'done'}) >= 1
+        # Fichier supprimé une fois importé
+        assert os.listdir(tmp_path) == []
+    finally:
+        app.active_sessions.pop(session_id)
+
+
+def test_batch_api_submits_uploaded_clips(client, monkeypatch, tmp_path):
+    from batch_runner import BatchRunner
+
+    monkeypatch.setattr(app, 'UPLOADS_DIR', str(tmp_path))
+    monkeypatch.setattr(app.socketio, 'emit', lambda *args, **kwargs: None)
+    runner = BatchRunner(lambda callback: FakeStream(start_ok=False), str(tmp_path / 'batches'),
+                         workers=1, max_retries=0, on_batch=app.on_batch_done)
+    monkeypatch.setattr(app, 'batch_runner', runner)
+    (tmp_path / 'autre.pcm').write_bytes(b'\x00\x00' * 2400)
+    client.post('/login', data={'username': 'tester', 'password': ''})
+    resp = client.post('/api/upload?filename=message.pcm&dialogue=0', data=b'\x00\x00' * 2400,
+                       content_type='application/octet-stream')
+    stored = resp.get_json()['stored_as']
+
+    resp = client.post('/api/batch', json={'clips': ['absent.wav']})
+    assert resp.status_code == 400
+    # Fichier présent mais importé par personne d'autre que cette session
+    resp = client.post('/api/batch', json={'clips': ['autre.pcm']})
+    assert resp.status_code == 400
+
+    resp = client.post('/api/batch', json={'clips': [stored], 'name': 'répondeur'})
+    assert resp.status_code == 202
+    batch_id = resp.get_json()['batch_id']
+    assert runner.get(batch_id).done.wait(5)
+
+    # Connexion impossible et aucune nouvelle tentative : le clip est en échec
+    snapshot = client.get(f'/api/batch/{batch_id}').get_json()
+    assert snapshot['state'] == 'done' and snapshot['name'] == 'répondeur'
+    assert snapshot['results'][0]['status'] == 'failed'
+    assert snapshot['report']['failed'] == 1
+    assert client.get('/api/batch/inconnu').status_code == 404
+    # Clip consommé par le lot : supprimé à la fin et non réutilisable
+    deadline = time.monotonic() + 5
+    while (tmp_path / stored).exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not (tmp_path / stored).exists()
+    assert client.post('/api/batch', json={'clips': [stored]}).status_code == 400
+
+    # Clips envoyés en multipart : supprimés eux aussi, même en échec
+    resp = client.post('/api/batch', data={'files': [(io.BytesIO(b'\x00\x00' * 2400), 'direct.pcm')]},
+                       content_type='multipart/form-data')
+    assert runner.get(resp.get_json()['batch_id']).done.wait(5)
+    deadline = time.monotonic() + 5
+    while any(name.endswith('_direct.pcm') for name in os.listdir(tmp_path)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not any(name.endswith('_direct.pcm') for name in os.listdir(tmp_path))
+
+    # Une autre session ne voit pas le lot et ne peut pas reprendre ses clips
+    with app.app.test_client() as other:
+        other.post('/login', data={'username': 'autre', 'password': ''})
+        assert other.get(f'/api/batch/{batch_id}').status_code == 404
+        assert other.post('/api/batch', json={'clips': [stored]}).status_code == 400
+
+
+def test_unclaimed_uploads_expire(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, 'UPLOADS_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'upload_owners', {})
+    client.post('/login', data={'username': 'tester', 'password': ''})
+
+    def upload(name):
+        resp = client.post(f'/api/upload?filename={name}&dialogue=0', data=b'\x00\x00' * 240,
+                           content_type='application/octet-stream')
+        return resp.get_json()['stored_as']
+
+    first = upload('un.pcm')
+    monkeypatch.setattr(app, 'UPLOAD_KEEP_SECONDS', -1)
+    # Le fichier jamais utilisé par un lot expire au dépôt suivant
+    second = upload('deux.pcm')
+    assert os.listdir(tmp_path) == [second] and list(app.upload_owners) == [second]
+    assert client.post('/api/batch', json={'clips': [first]}).status_code == 400
+
+
+def test_start_dialogue_uses_session_profile(client, monkeypatch, tmp_path):
+    from session_profiles import ProfileStore
+
+    path = tmp_path / 'profiles.json'
+    path.write_text(json.dumps({'profiles': {'support': {'voice': 'verse', 'encoding': 'mulaw'},
+                                             'direction': {'voice': 'sage'}},
+                                'users': {'tester': 'support', 'chef': 'direction'}}), encoding='utf-8')
+    store = ProfileStore(str(path), app.profile_store.base)
+    store.load()
+    monkeypatch.setattr(app, 'profile_store', store)
+    created = []
+    monkeypatch.setattr(app, 'create_stream_handler',
+                        lambda callback, profile=None: created.append(profile) or FakeStream())
+    monkeypatch.setattr(app.VoiceSession, 'start_connection', lambda self: True)
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    client.post('/login', data={'username': 'tester', 'password': ''})
+
+    resp = client.post('/api/start_dialogue', json={})
+    data = resp.get_json()
+    try:
+        # Profil associé à l'utilisateur, avec son encodage navigateur par défaut
+        assert data['profile'] == 'support'
+        assert data['audio_format']['encoding'] == 'mulaw'
+        assert created == [store.get('support')]
+    finally:
+        client.post('/api/stop_dialogue')
+
+    resp = client.post('/api/start_dialogue', json={'profile': 'inconnu'})
+    assert resp.status_code == 400
+    # Profil d'un autre utilisateur : refusé ; profil par défaut : accepté
+    resp = client.post('/api/start_dialogue', json={'profile': 'direction'})
+    assert resp.status_code == 403
+    resp = client.post('/api/start_dialogue', json={'profile': 'default'})
+    try:
+        assert resp.get_json()['profile'] == 'default'
+    finally:
+        client.post('/api/stop_dialogue')
+    assert client.get('/api/profiles').get_json()['user_profile'] == 'support'
+
+
+def test_repeated_prompt_served_from_audio_cache(monkeypatch):
+    from audio_cache import ResponseAudioCache
+
+    emitted = []
+    tasks = []
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: emitted.append((event, data)))
+    monkeypatch.setattr(app.socketio, 'start_background_task', lambda target, *args: tasks.append((target, args)))
+    monkeypatch.setattr(app.socketio, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'EGRESS_QUEUE_SIZE', 0)
+    monkeypatch.setattr(app, 'audio_cache', ResponseAudioCache())
+    monkeypatch.setattr(app, 'create_stream_handler', lambda callback, profile=None: FakeStream())
+    voice_session = app.VoiceSession('cache')
+    voice_session.stream.start()
+    cancelled = []
+    voice_session.stream.cancel_response = lambda item_id=None, audio_end_ms=None: cancelled.append(item_id)
+    reply = b'\x01\x00' * 2400
+    delta = {'type': 'response.audio.delta', 'item_id': 'item_1', 'delta': base64.b64encode(reply).decode()}
+
+    def message(event_type, **data):
+        voice_session.handle_stream_event('message', dict(data, type=event_type))
+
+    # Premier tour : réponse du modèle, mise en cache à response.done
+    message('input_audio_buffer.committed')
+    message('response.created', response={'id': 'resp_1'})
+    message('conversation.item.input_audio_transcription.completed', item_id='user_1', transcript='Bonjour !')
+    message('response.audio.delta', **delta)
+    message('response.audio_transcript.done', item_id='item_1', transcript='Salut')
+    message('response.done', response={'status': 'completed'})
+    assert app.audio_cache.stats()['stores'] == 1
+
+    # Même question : réponse du cache, celle du modèle est annulée dès sa création
+    message('input_audio_buffer.speech_stopped')
+    message('input_audio_buffer.committed')
+    message('conversation.item.input_audio_transcription.completed', item_id='user_2', transcript='bonjour')
+    message('response.created', response={'id': 'resp_2'})
+    message('response.audio.delta', **delta)
+    message('response.done', response={'status': 'cancelled'})
+    assert len(cancelled) == 1
+    created = [payload for payload in voice_session.stream.sent if payload['type'] == 'conversation.item.create']
+    assert created[0]['item']['content'][0]['text'] == 'Salut'
+
+    target, args = tasks[-1]
+    target(*args)
+    audio = [data for event, data in emitted if event == 'audio_output']
+    assert [base64.b64decode(data['audio']) for data in audio] == [reply, reply]
+    assert voice_session.stats['cache_hits'] == 1
+    assert voice_session.stats['messages_count'] == 2
+    assert app.audio_cache.stats()['hit_ratio'] == 0.5
+
+
+def test_traced_chunk_tagged_upstream_and_profile_endpoints(client, monkeypatch):
+    from profiling import Tracer
+
+    monkeypatch.setattr(app.socketio, 'emit', lambda event, data, room=None: None)
+    monkeypatch.setattr(app, 'RECORD_AUDIO', False)
+    monkeypatch.setattr(app, 'EGRESS_QUEUE_SIZE', 0)
+    monkeypatch.setattr(app, 'tracer', Tracer(sample_every=2))
+    monkeypatch.setattr(app, 'create_stream_handler', lambda callback, profile=None: FakeStream())
+    voice_session = app.VoiceSession('trace')
+    voice_session.stream.start()
+    voice_session.is_ready = True
+
+    for seq in (1, 2, 3):
+        assert voice_session.send_audio_bytes(b'\x01\x00' * 240, seq=seq) is True
+    # Seule la trame échantillonnée porte un event_id, celui de sa trace
+    trace_id = voice_session.stream.event_ids[1]
+    assert voice_session.stream.event_ids[0] is None and voice_session.stream.event_ids[2] is None
+    assert app.tracer.get(trace_id).seq == 2
+
+    # Une erreur OpenAI sur ce message est rattachée à la trame du navigateur
+    voice_session.handle_stream_event('message', {'type': 'error', 'error': {'message': 'x', 'event_id': trace_id}})
+    assert 'trame 2' in voice_session.events.since()[-1].data
+
+    # Routes d'administration : jeton exigé, même connecté
+    client.post('/login', data={'username': 'tester', 'password': ''})
+    assert client.get('/api/admin/profile').status_code == 403
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', 'secret')
+    assert client.get('/api/admin/profile', headers={'Authorization': 'Bearer autre'}).status_code == 403
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer secret'
+    data = client.get('/api/admin/profile?session_id=trace').get_json()
+    assert [trace['trace_id'] for trace in data['tracing']['traces']] == [trace_id]
+    assert [stage['stage'] for stage in data['tracing']['traces'][0]['stages']] == \
+        ['received', 'ingest', 'upstream_send', 'upstream_sent']
+    assert client.get('/api/admin/profile/stacks?seconds=0').status_code == 400
+    assert client.get('/api/admin/profile/stacks?seconds=30').status_code == 400
+    assert client.get('/api/admin/profile/stacks?seconds=1&interval_ms=1').status_code == 400
+    resp = client.get('/api/admin/profile/stacks?seconds=0.02&interval_ms=5')
+    assert resp.status_code == 200 and resp.content_type.startswith('text/plain')
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in resp.get_data(as_text=True).splitlines())
@@ -0,0 +1,57 @@
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from audio_cache import ResponseAudioCache, normalize_text
+
+
+def test_keys_normalise_text_and_include_profile():
+    assert normalize_text('  Bonjour, ÇA va ?! ') == 'bonjour ça va'
+    cache = ResponseAudioCache(max_bytes=1000)
+    cache.put('profil_a', 'Bonjour !', 'Salut', b'\x01\x00' * 10, first_audio_latency=0.8)
+
+    entry = cache.get('profil_a', 'bonjour')
+    assert entry is not None and entry.text == 'Salut' and entry.first_audio_latency == 0.8
+    # Même phrase sous un autre profil (voix, instructions) : autre entrée
+    assert cache.get('profil_b', 'bonjour') is None
+    # Ponctuation seule : rien à mettre en cache
+    assert cache.put('profil_a', '...', 'x', b'\x00\x00') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    assert cache.hit_ratio == 0.5
+
+
+def test_memory_lru_and_disk_tier(tmp_path):
+    cache = ResponseAudioCache(str(tmp_path), max_bytes=40, disk_max_bytes=10 ** 6, max_entry_bytes=30)
+    cache.put('p', 'un', 'Un', b'\x01' * 20)
+    cache.put('p', 'deux', 'Deux', b'\x02' * 20)
+    # Trop long pour une entrée
+    assert cache.put('p', 'long', 'Long', b'\x03' * 32) is None
+    cache.get('p', 'un')
+    cache.put('p', 'trois', 'Trois', b'\x04' * 20)
+    # L'entrée la moins récemment utilisée quitte la mémoire mais reste sur disque
+    assert cache.stats()['entries'] == 2 and cache.stats()['evictions'] == 1
+    assert cache.stats()['disk_entries'] == 3
+    assert cache.get('p', 'deux').pcm == b'\x02' * 20
+    assert cache.stats()['disk_hits'] == 1
+
+    # Le cache disque survit au redémarrage et reste borné
+    restarted = ResponseAudioCache(str(tmp_path), disk_max_bytes=2 * (44 + 20))
+    assert restarted.stats()['disk_entries'] == 2 and restarted.stats()['disk_evictions'] == 1
+    assert restarted.get('p', 'deux').text == 'Deux'
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        f'{key}{extension}' for key in restarted._disk for extension in ('.wav', '.json'))
+
+
+def test_disk_writes_run_on_executor(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        cache = ResponseAudioCache(str(tmp_path), disk_max_bytes=10 ** 6, executor=executor)
+        # Disponible en mémoire tout de suite, écrit sur disque en arrière-plan
+        assert cache.put('p', 'un', 'Un', b'\x01' * 20) is not None
+        assert cache.get('p', 'un').text == 'Un'
+    assert cache.stats()['disk_entries'] == 1
+    assert ResponseAudioCache(str(tmp_path)).get('p', 'un').pcm == b'\x01' * 20
@@ -0,0 +1,80 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from audio_codecs import ADPCMCodec, MuLawCodec, available_encodings, create_codec
+
+
+def speech_like(samples, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(samples) / 24000
+    signal = 8000 * np.sin(2 * np.pi * 220 * t) + 3000 * np.sin(2 * np.pi * 1300 * t)
+    return (signal + rng.standard_normal(samples) * 300).astype(np.int16)
+
+
+def snr_db(reference, decoded):
+    reference = reference.astype(np.float64)
+    noise = reference - decoded.astype(np.float64)
+    return 10 * np.log10(np.sum(reference ** 2) / np.sum(noise ** 2))
+
+
+def test_mulaw_reference_values():
+    codec = MuLawCodec()
+    pcm = np.array([0, -1, 32767, -32768, 1000, -1000], dtype=np.int16).tobytes()
+    # Valeurs de référence G.711 (identiques au module audioop)
+    assert codec.encode(pcm) == bytes([0xFF, 0x7E, 0x80, 0x00, 0xCE, 0x4E])
+    decoded = np.frombuffer(codec.decode(bytes([0xFF, 0x80, 0x00, 0xCE])), dtype=np.int16)
+    assert decoded.tolist() == [0, 32124, -32124, 988]
+
+
+def test_mulaw_round_trip_quality():
+    codec = MuLawCodec()
+    samples = speech_like(2400)
+    encoded = codec.encode(samples.tobytes())
+    assert len(encoded) == samples.size
+    assert snr_db(samples, np.frombuffer(codec.decode(encoded), dtype=np.int16)) > 30
+
+
+@pytest.mark.parametrize('count', [2400, 2401, 63, 1])
+def test_adpcm_round_trip(count):
+    codec = ADPCMCodec()
+    samples = speech_like(count)
+    encoded = codec.encode(samples.tobytes())
+    decoded = np.frombuffer(codec.decode(encoded), dtype=np.int16)
+    # Un nombre impair d'échantillons gagne un échantillon final
+    assert decoded.size == count + count % 2
+    if count > 64:
+        assert len(encoded) < samples.nbytes * 0.3
+        assert snr_db(samples, decoded[:count]) > 25
+
+
+def test_adpcm_empty_chunk():
+    codec = ADPCMCodec()
+    assert codec.encode(b'') == b''
+    assert codec.decode(b'') == b''
+
+
+def test_create_codec():
+    assert create_codec('pcm16', 24000).encode(b'\x01\x02') == b'\x01\x02'
+    with pytest.raises(ValueError):
+        create_codec('flac', 24000)
+    if 'opus' not in available_encodings():
+        with pytest.raises(ValueError):
+            create_codec('opus', 24000)
+
+
+def test_opus_round_trip():
+    if 'opus' not in available_encodings():
+        pytest.skip('opuslib non installé')
+    encoder = create_codec('opus', 24000)
+    decoder = create_codec('opus', 24000)
+    samples = speech_like(2400)
+    encoded = encoder.encode(samples.tobytes())
+    assert len(encoded) < samples.nbytes / 4
+    assert len(decoder.decode(encoded)) == samples.nbytes
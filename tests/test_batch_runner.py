@@ -0,0 +1,131 @@
+import json
+import os
+import sys
+import threading
+import time
+import wave
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import realtime_stub
+from batch_runner import BatchRunner
+from stream_handler import OpenAIStreamHandler
+
+
+def write_clip(path, seconds, rate=16000):
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b'\x20\x00' * int(rate * seconds))
+    return str(path)
+
+
+def test_batch_reuses_connections_and_writes_results(tmp_path):
+    stub, url = realtime_stub.start_in_thread()
+    runner = BatchRunner(lambda callback: OpenAIStreamHandler('key', 'model', 'instructions', callback,
+                                                              url=url, turn_detection=None),
+                         str(tmp_path / 'out'), workers=2, append_ms=250, transcript_grace=1)
+    clips = [write_clip(tmp_path / f'clip{i}.wav', 0.5 + i * 0.25) for i in range(5)]
+
+    job = runner.submit(clips, name='messagerie')
+    assert job.done.wait(20)
+
+    # Une connexion par worker, réutilisée pour tous les clips
+    assert stub.connections == 2 and runner.stats()['connections_opened'] == 2
+    assert stub.responses == 5
+    assert [result['transcript'] for result in job.results] == ['500 ms d\'audio', '750 ms d\'audio',
+                                                                 '1000 ms d\'audio', '1250 ms d\'audio',
+                                                                 '1500 ms d\'audio']
+    assert all(result['status'] == 'done' and result['response_text'] == 'Réponse de test' for result in job.results)
+    # Entrée et réponse de chaque clip supprimées de la conversation (le stub les reçoit en différé)
+    deadline = time.monotonic() + 5
+    while len(stub.deleted) < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(stub.deleted) == 10
+
+    with open(os.path.join(job.directory, 'report.json')) as f:
+        report = json.load(f)
+    assert report['succeeded'] == 5 and report['retries'] == 0
+    assert report['audio_in_seconds'] == 5.0 and report['audio_out_seconds'] == 1.5
+    assert os.path.getsize(os.path.join(job.directory, job.results[0]['audio_file'])) == 44 + 3 * 4800
+
+
+class FlakyHandler:
+    """Connexion factice dont la première réponse échoue"""
+
+    failures = 1
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.connected = threading.Event()
+
+    def start(self):
+        self.connected.set()
+        self.callback('message', {'type': 'session.updated'})
+        return True
+
+    def send(self, payload):
+        if payload['type'] == 'input_audio_buffer.commit':
+            self.callback('message', {'type': 'input_audio_buffer.committed', 'item_id': 'item_1'})
+            self.callback('message', {'type': 'conversation.item.input_audio_transcription.completed',
+                                      'item_id': 'item_1', 'transcript': 'allô'})
+        elif payload['type'] == 'response.create':
+            status = 'failed' if FlakyHandler.failures else 'completed'
+            FlakyHandler.failures = max(0, FlakyHandler.failures - 1)
+            self.callback('message', {'type': 'response.done', 'response': {'status': status, 'output': []}})
+
+    def send_audio(self, pcm):
+        return self.connected.is_set()
+
+    def close(self):
+        self.connected.clear()
+
+
+def test_batch_retries_failed_clips_and_reports_bad_files(tmp_path):
+    runner = BatchRunner(FlakyHandler, str(tmp_path / 'out'), workers=1, max_retries=1,
+                         retry_base_delay=0, sleep=lambda s: None)
+    broken = tmp_path / 'broken.wav'
+    broken.write_bytes(b'data')
+    job = runner.submit([write_clip(tmp_path / 'ok.wav', 0.2), str(broken)])
+    assert job.done.wait(5)
+
+    ok, bad = job.results
+    assert ok['status'] == 'done' and ok['attempts'] == 2 and ok['transcript'] == 'allô'
+    # Un fichier illisible échoue sans nouvelle tentative
+    assert bad['status'] == 'failed' and bad['attempts'] == 1
+    assert runner.stats()['connections_opened'] == 2
+    report = job.report()
+    assert report['succeeded'] == 1 and report['failed'] == 1 and report['retries'] == 1
+
+
+class ClosedHandler:
+    def __init__(self, callback):
+        self.connected = threading.Event()
+
+    def start(self):
+        return False
+
+    def close(self):
+        pass
+
+
+def test_worker_survives_failing_callbacks(tmp_path):
+    batches = []
+
+    def on_clip(job, result):
+        raise RuntimeError('progression')
+
+    runner = BatchRunner(ClosedHandler, str(tmp_path / 'out'), workers=1, max_retries=0,
+                         on_clip=on_clip, on_batch=batches.append)
+    first = runner.submit([str(tmp_path / 'a.wav')])
+    assert first.done.wait(5)
+    # Le même worker traite le lot suivant malgré l'exception du rappel
+    second = runner.submit([str(tmp_path / 'b.wav'), str(tmp_path / 'c.wav')])
+    assert second.done.wait(5)
+    deadline = time.monotonic() + 5
+    while len(batches) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batches == [first, second] and runner.stats()['workers'] == 1
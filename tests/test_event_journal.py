@@ -0,0 +1,39 @@
+import os
+import sys
+import re
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from event_journal import EventJournal
+
+
+def test_ring_keeps_last_entries():
+    journal = EventJournal(capacity=5)
+    for i in range(12):
+        journal.append('t', 'info', i)
+    assert len(journal) == 5
+    assert [r.data for r in journal.since()] == [7, 8, 9, 10, 11]
+    assert journal.last_seq == 11
+
+
+def test_since_cursor():
+    journal = EventJournal(capacity=5)
+    for i in range(3):
+        journal.append('t', 'info', i)
+    assert [r.seq for r in journal.since(0)] == [1, 2]
+    assert journal.since(2) == []
+    # Un curseur trop ancien renvoie ce qui reste dans l'anneau
+    for i in range(10):
+        journal.append('t', 'info', i)
+    assert [r.seq for r in journal.since(1)] == [8, 9, 10, 11, 12]
+
+
+def test_format_on_read():
+    journal = EventJournal()
+    record = journal.append('speech', 'success', 'Début')
+    assert not hasattr(record, '__dict__')
+    event = journal.format(record)
+    assert event['id'] == 0 and event['type'] == 'speech' and event['level'] == 'success'
+    assert re.match(r'^\d{2}:\d{2}:\d{2}\.\d{3}$', event['timestamp'])
@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from frame_aggregator import FrameAggregator, DeadlineTimer
+
+MS = 48  # octets par milliseconde à 24 kHz PCM16
+
+
+def test_small_chunks_are_packed():
+    agg = FrameAggregator(min_ms=40, max_ms=40, max_latency_ms=1000)
+    frames = []
+    for i in range(10):
+        frames += agg.push(b'\x01\x00' * 240, now=i * 0.01)  # 10 ms
+    assert [len(f) for f in frames] == [40 * MS, 40 * MS]
+    assert agg.flush(now=0.1) == b'\x01\x00' * 480
+    assert agg.flush() is None
+    assert agg.stats()['frames_out'] == 3
+
+
+def test_large_chunk_passes_through():
+    agg = FrameAggregator(min_ms=20, max_ms=20)
+    chunk = b'\x00' * (100 * MS)
+    frames = agg.push(chunk, now=0.0)
+    assert frames == [chunk] and frames[0] is chunk
+
+
+def test_max_latency_bound():
+    agg = FrameAggregator(min_ms=100, max_ms=100, max_latency_ms=50)
+    assert agg.push(b'\x00' * (10 * MS), now=0.0) == []
+    assert agg.deadline() == 0.05
+    frames = agg.push(b'\x00' * (10 * MS), now=0.06)
+    assert [len(f) for f in frames] == [20 * MS]
+    assert agg.deadline() is None
+
+
+def test_target_grows_with_jitter():
+    agg = FrameAggregator(min_ms=20, max_ms=100)
+    now = 0.0
+    for gap in [0.01, 0.09] * 50:
+        now += gap
+        agg.push(b'\x00\x00', now=now)
+    assert agg.target_ms > 40
+
+
+def test_deadline_timer_runs_callbacks():
+    timer = DeadlineTimer()
+    fired = threading.Event()
+    timer.schedule(time.monotonic() + 0.02, fired.set)
+    assert fired.wait(1)
@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from gpt_handler import GPTHandler
+
+
+class FakeResponse:
+    def __init__(self, lines, on_line=None):
+        self.lines = lines
+        self.on_line = on_line
+        self.closed = False
+        self.read = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, chunk_size=512):
+        assert chunk_size is None
+        for line in self.lines:
+            if self.on_line:
+                self.on_line(line)
+            self.read.append(line)
+            yield line
+
+
+def sse(content):
+    return b'data: {"choices": [{"delta": {"content": "%s"}}]}' % content.encode()
+
+
+def make_handler(response):
+    handler = GPTHandler('key', url='http://chat.test/v1/chat/completions')
+    calls = []
+
+    def post(url, json=None, stream=False, timeout=None):
+        calls.append((url, json, stream))
+        return response
+
+    handler.session.post = post
+    return handler, calls
+
+
+def test_stream_deltas_parses_chunks():
+    response = FakeResponse([b'data: {"choices": [{"delta": {"role": "assistant"}}]}', b'',
+                             sse('Bon'), sse('jour'), b'data: [DONE]', sse('ignoré')])
+    handler, calls = make_handler(response)
+
+    assert list(handler.stream_deltas([{'role': 'user', 'content': 'Salut'}])) == ['Bon', 'jour']
+    url, payload, stream = calls[0]
+    assert stream is True and payload['stream'] is True
+    assert 'response_format' not in payload
+    # Flux lu jusqu'au bout après [DONE] : la connexion retourne dans le pool
+    assert response.read == response.lines
+    assert response.closed
+
+
+def test_abort_event_stops_reading():
+    abort_event = threading.Event()
+    response = FakeResponse([sse('a'), sse('b'), sse('c')],
+                            on_line=lambda line: line == sse('b') and abort_event.set())
+    handler, _ = make_handler(response)
+
+    assert list(handler.stream_deltas([], abort_event)) == ['a']
+    assert response.closed
+
+
+def test_session_is_shared_and_authenticated():
+    handler = GPTHandler('secret', pool_size=4)
+    assert handler.session.headers['Authorization'] == 'Bearer secret'
+    assert handler.session.get_adapter('https://api.openai.com')._pool_maxsize == 4
+    handler.close()
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import json_backend
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    previous = json_backend.backend
+    yield
+    json_backend.use_backend(previous)
+
+
+@pytest.mark.parametrize('name', ['json', 'orjson'])
+def test_backends_round_trip(name):
+    if name == 'orjson' and json_backend.orjson is None:
+        pytest.skip('orjson non installé')
+    json_backend.use_backend(name)
+    payload = {'type': 'input_audio_buffer.append', 'audio': 'AAAA', 'texte': 'déjà'}
+    encoded = json_backend.dumps(payload)
+    assert isinstance(encoded, str)
+    assert ' ' not in encoded.replace('déjà', '')
+    assert json_backend.loads(encoded) == payload
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        json_backend.use_backend('simplejson')
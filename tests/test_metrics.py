@@ -0,0 +1,45 @@
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from metrics import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    hist = registry.histogram('latency_seconds', 'Latence', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE latency_seconds histogram' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum 3.65' in lines
+    assert 'latency_seconds_count 4' in lines
+
+
+def test_counters_and_gauges():
+    registry = MetricsRegistry()
+    counter = registry.counter('chunks_total', 'Trames')
+    counter.inc()
+    counter.inc(4)
+    registry.gauge('depth', 'Profondeur', lambda: 3)
+    registry.counter_func('closed_total', 'Fermetures', lambda: [({'reason': 'idle'}, 2)])
+
+    body = registry.render()
+    assert 'chunks_total 5\n' in body
+    assert 'depth 3\n' in body
+    assert '# TYPE closed_total counter' in body
+    assert 'closed_total{reason="idle"} 2\n' in body
+
+
+def test_failing_gauge_does_not_break_scrape():
+    registry = MetricsRegistry()
+    registry.gauge('broken', 'Cassé', lambda: 1 / 0)
+    registry.gauge('ok', 'Valide', lambda: 1)
+    assert 'ok 1\n' in registry.render()
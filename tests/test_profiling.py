@@ -0,0 +1,66 @@
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from profiling import SpanProfiler, StackSampler, Tracer
+
+
+class Worker:
+    def step(self, value):
+        return value * 2
+
+
+def test_span_profiler_times_one_call_in_n():
+    profiler = SpanProfiler(sample_every=3)
+    profiler.instrument(Worker, 'step', 'worker.step')
+    # Deuxième instrumentation sans effet : pas de double chronométrage
+    profiler.instrument(Worker, 'step', 'worker.step')
+    try:
+        assert [Worker().step(i) for i in range(7)] == [0, 2, 4, 6, 8, 10, 12]
+        stats = profiler.snapshot()['stages']['worker.step']
+        assert stats['samples'] == 2 and stats['estimated_calls'] == 6
+        assert 0 < stats['p50_us'] <= stats['max_us']
+        profiler.reset()
+        assert profiler.snapshot()['stages'] == {}
+    finally:
+        Worker.step = Worker.step.__wrapped__
+
+
+def test_stack_sampler_folds_thread_stacks():
+    release = threading.Event()
+
+    def wait_for_release():
+        release.wait(5)
+
+    thread = threading.Thread(target=wait_for_release, name='attente test')
+    thread.start()
+    try:
+        sampler = StackSampler().run(0.02)
+    finally:
+        release.set()
+        thread.join()
+    assert sampler.samples >= 1
+    lines = sampler.folded().splitlines()
+    waiting = [line for line in lines if line.startswith('attente_test;')]
+    assert waiting and 'test_profiling.py:wait_for_release' in waiting[0]
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_tracer_samples_and_keeps_recent_traces():
+    assert Tracer(0).start('s') is None
+    tracer = Tracer(sample_every=2, max_traces=2)
+    traces = [tracer.start('s', seq) for seq in range(6)]
+    sampled = [trace for trace in traces if trace is not None]
+    assert [trace.seq for trace in sampled] == [1, 3, 5]
+    for trace in sampled:
+        trace.mark('upstream_sent')
+        tracer.finish(trace)
+    # Anneau borné : la plus ancienne trace n'est plus retrouvée
+    assert tracer.get(sampled[0].id) is None and tracer.get(sampled[2].id) is sampled[2]
+    recent = tracer.recent('s')
+    assert [trace['seq'] for trace in recent] == [3, 5]
+    assert [stage['stage'] for stage in recent[0]['stages']] == ['received', 'upstream_sent']
@@ -0,0 +1,59 @@
+import os
+import sys
+import wave
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from recorder import StreamingWavWriter, SessionRecorder
+
+
+def test_header_patched_while_recording(tmp_path):
+    path = str(tmp_path / 'live.wav')
+    writer = StreamingWavWriter(path, patch_interval=0)
+    writer.write(b'\x01\x00' * 100)
+
+    # Le fichier est lisible avant la fermeture (arrêt brutal du processus)
+    with wave.open(path) as wf:
+        assert wf.getnframes() == 100
+
+    writer.write(b'\x02\x00' * 50)
+    writer.close()
+    with wave.open(path) as wf:
+        assert wf.getnframes() == 150
+    assert writer.closed
+
+
+def test_session_recorder_creates_files_lazily(tmp_path):
+    recorder = SessionRecorder(str(tmp_path), 'dialogue_x')
+    recorder.write_input(b'\x00\x00')
+    assert recorder.close() == []
+    assert os.listdir(tmp_path) == []
+
+    recorder = SessionRecorder(str(tmp_path), 'dialogue_y', record_input=True)
+    recorder.write_output(b'\x00\x00')
+    recorder.write_input(b'\x00\x00')
+    assert sorted(recorder.close()) == ['dialogue_y.wav', 'dialogue_y_input.wav']
+
+
+def test_session_recorder_writes_on_executor(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+
+    threads = set()
+    recorder = SessionRecorder(str(tmp_path), 'dialogue_z')
+    original = recorder._write
+    recorder._write = lambda track, frames: threads.add(threading.get_ident()) or original(track, frames)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        recorder.executor = executor
+        frames = bytearray(b'\x01\x00' * 10)
+        recorder.write_output(frames)
+        # Le tampon de l'appelant peut être réutilisé aussitôt
+        frames[:] = b'\x02\x00' * 10
+        recorder.write_output(frames)
+        # close attend les écritures en attente
+        assert recorder.close() == ['dialogue_z.wav']
+    assert threading.get_ident() not in threads
+    with wave.open(str(tmp_path / 'dialogue_z.wav')) as wf:
+        assert wf.readframes(20) == b'\x01\x00' * 10 + b'\x02\x00' * 10
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy.signal import upfirdn
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from resample import StreamingResampler, design_filter, resample
+
+
+@pytest.mark.parametrize('in_rate,out_rate', [(48000, 24000), (44100, 24000), (16000, 24000), (24000, 44100)])
+def test_streaming_matches_one_shot(in_rate, out_rate):
+    samples = (np.random.default_rng(0).standard_normal(in_rate // 2) * 3000).astype(np.int16)
+    resampler = StreamingResampler(in_rate, out_rate)
+    out = b''
+    # Découpage irrégulier, y compris des trames d'un seul échantillon
+    start, sizes = 0, [1, 480, 997, 7]
+    while start < len(samples):
+        size = sizes[start % len(sizes)]
+        out += resampler.process(samples[start:start + size].tobytes())
+        start += size
+    out += resampler.process(b'')
+
+    streamed = np.frombuffer(out, dtype=np.int16)
+    reference = upfirdn(resampler.taps, samples.astype(np.float32), resampler.up, resampler.down)
+    reference = np.clip(np.rint(reference[:len(streamed)]), -32768, 32767)
+    assert len(streamed) == len(samples) * out_rate // in_rate
+    assert np.array_equal(streamed, reference)
+
+
+def test_tone_preserved():
+    t = np.arange(48000) / 48000
+    tone = (np.sin(2 * np.pi * 1000 * t) * 10000).astype(np.int16).tobytes()
+    out = np.frombuffer(resample(tone, 48000, 24000), dtype=np.int16)[200:]
+    spectrum = np.abs(np.fft.rfft(out))
+    peak_hz = np.argmax(spectrum) * 24000 / len(out)
+    assert abs(peak_hz - 1000) < 5
+    assert 9000 < np.abs(out).max() < 11000
+
+
+def test_filter_design_cached():
+    assert design_filter(80, 147) is design_filter(80, 147)
+    assert resample(b'\x01\x00', 24000, 24000) == b'\x01\x00'
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from session_emitter import BatchingEmitter, EgressQueue, FlushScheduler
+
+
+def make_emitter(interval=0.25):
+    emitted = []
+    stats = {'chunks_sent': 0}
+    emitter = BatchingEmitter(lambda event, data, room=None: emitted.append((event, data, room)),
+                              'room1', lambda: dict(stats), interval)
+    return emitter, emitted, stats
+
+
+def test_stats_updates_are_coalesced():
+    emitter, emitted, stats = make_emitter()
+    for _ in range(50):
+        stats['chunks_sent'] += 1
+        emitter.stats_changed()
+    assert emitted == []
+
+    assert emitter.flush(force=False, now=1000.0) is True
+    assert emitted == [('stats_update', {'chunks_sent': 50}, 'room1')]
+
+    # Dans l'intervalle, rien n'est émis même si les stats changent
+    emitter.stats_changed()
+    assert emitter.flush(force=False, now=1000.1) is False
+    assert emitter.flush(force=False, now=1000.3) is True
+    assert len(emitted) == 2
+
+
+def test_idle_session_emits_nothing():
+    emitter, emitted, _ = make_emitter()
+    assert emitter.flush() is False
+    assert emitted == []
+
+
+def test_events_are_batched():
+    emitter, emitted, _ = make_emitter()
+    emitter.queue_event({'type': 'a'})
+    emitter.queue_event({'type': 'b'})
+    emitter.flush()
+    assert emitted == [('new_events', [{'type': 'a'}, {'type': 'b'}], 'room1')]
+
+
+def test_zero_interval_flushes_immediately():
+    emitter, emitted, _ = make_emitter(interval=0)
+    emitter.stats_changed()
+    assert [e[0] for e in emitted] == ['stats_update']
+
+
+def test_scheduler_tick_flushes_dirty_emitters():
+    started = []
+    scheduler = FlushScheduler(lambda target: started.append(target), lambda s: None, 0.25)
+    emitter, emitted, _ = make_emitter()
+    idle, idle_emitted, _ = make_emitter()
+    scheduler.register(emitter)
+    scheduler.register(idle)
+    assert len(started) == 1
+
+    emitter.stats_changed()
+    scheduler.tick(now=1000.0)
+    assert len(emitted) == 1
+    assert idle_emitted == []
+
+    scheduler.unregister(emitter)
+    emitter.stats_changed()
+    scheduler.tick(now=1001.0)
+    assert len(emitted) == 1
+
+
+def make_queue(**kwargs):
+    emitted = []
+    queue = EgressQueue(lambda event, data, room=None: emitted.append((event, data)), 'room1', **kwargs)
+    return queue, emitted
+
+
+def test_egress_drop_oldest_keeps_latest_frames():
+    queue, emitted = make_queue(maxlen=3)
+    for index in range(5):
+        assert queue.put('audio_output', index) is True
+    queue.drain()
+    assert emitted == [('audio_output', 2), ('audio_output', 3), ('audio_output', 4)]
+    assert queue.stats()['dropped']['overflow'] == 2
+
+
+def test_egress_coalesce_merges_oldest_frames():
+    queue, emitted = make_queue(maxlen=2, policy='coalesce', merge=lambda a, b: a + b)
+    for chunk in ('a', 'b', 'c', 'd'):
+        queue.put('audio_output', chunk)
+    queue.drain()
+    # Aucun audio perdu, deux émissions seulement
+    assert emitted == [('audio_output', 'abc'), ('audio_output', 'd')]
+    assert queue.coalesced == 2
+
+
+def test_egress_block_waits_for_writer_then_drops():
+    queue, emitted = make_queue(maxlen=1, policy='block', block_timeout=0.05)
+    queue.put('audio_output', 1)
+    started = time.monotonic()
+    assert queue.put('audio_output', 2) is False
+    assert time.monotonic() - started >= 0.05
+
+    writer = threading.Thread(target=queue.run, daemon=True)
+    writer.start()
+    assert queue.put('audio_output', 3) is True
+    queue.close()
+    writer.join(1)
+    assert emitted[0] == ('audio_output', 1)
+    assert queue.stats()['dropped']['overflow'] == 1
+
+
+def test_egress_drops_stale_frames_and_clear_keeps_control_event():
+    queue, emitted = make_queue(max_age=0.01)
+    queue.put('audio_output', 'stale')
+    time.sleep(0.02)
+    queue.put('audio_output', 'fresh')
+    queue.drain()
+    assert emitted == [('audio_output', 'fresh')]
+
+    queue.put('audio_output', 'cancelled')
+    assert queue.clear('audio_flush', {}) == 1
+    queue.drain()
+    assert emitted[1:] == [('audio_flush', {})]
+    assert queue.stats()['dropped'] == {'overflow': 0, 'stale': 1, 'flushed': 1}
@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from session_manager import SessionManager
+from session_registry import InMemorySessionRegistry
+
+
+class FakeSession:
+    def __init__(self, started_at=0.0, connected=True):
+        self.started_at = started_at
+        self.last_activity = started_at
+        self.is_connected = connected
+        self.disconnected = 0
+
+    def disconnect(self):
+        self.disconnected += 1
+
+
+def make_manager(**kwargs):
+    registry = InMemorySessionRegistry('w1')
+    return SessionManager(registry, idle_timeout=10, max_duration=100, **kwargs), registry
+
+
+def test_add_is_atomic_and_registers_owner():
+    manager, registry = make_manager()
+    results = []
+    barrier = threading.Barrier(8)
+
+    def add():
+        barrier.wait()
+        results.append(manager.add('s1', FakeSession()))
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results.count(True) == 1
+    assert registry.owner('s1') == 'w1'
+
+    assert manager.stop('s1') is True
+    assert manager.stop('s1') is False
+    assert registry.owner('s1') is None
+    assert manager.metrics()['stopped'] == 1
+
+    # Session détenue par un autre worker : refusée ici
+    registry._owners['s2'] = 'w2'
+    assert manager.add('s2', FakeSession()) is False
+    assert 's2' not in manager and registry.owner('s2') == 'w2'
+
+
+def test_reaper_closes_idle_and_expired_sessions():
+    attached = {'busy'}
+    manager, _ = make_manager(is_attached=lambda sid: sid in attached)
+    idle, busy, old, fresh = FakeSession(), FakeSession(), FakeSession(connected=False), FakeSession()
+    for sid, s in [('idle', idle), ('busy', busy), ('old', old), ('fresh', fresh)]:
+        manager.add(sid, s)
+    fresh.last_activity = 95.0
+    busy.last_activity = 0.0
+    old.started_at = -50.0
+
+    reaped = manager.reap(now=60.0)
+    assert sorted(reaped) == [('idle', 'idle'), ('old', 'max_duration')]
+    assert idle.disconnected == 1 and old.disconnected == 1
+    assert 'busy' in manager and 'fresh' in manager
+
+    metrics = manager.metrics()
+    assert metrics['live'] == 2
+    assert metrics['reaped'] == {'idle': 1, 'max_duration': 1}
+    # Seule la session dont la connexion OpenAI était encore ouverte a fui
+    assert metrics['leaked'] == 1
+
+    # Même une session attachée est fermée après la durée maximale
+    assert ('busy', 'max_duration') in manager.reap(now=200.0)
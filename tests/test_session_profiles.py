@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from session_profiles import SessionProfile, ProfileStore
+from stream_handler import OpenAIStreamHandler
+
+
+def write_profiles(path, data, mtime_ns):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_profile_payload_is_serialised_once():
+    profile = SessionProfile('support', 'Soyez bref.', voice='verse',
+                             turn_detection={'type': 'server_vad', 'threshold': 0.7})
+    assert profile.session_update() is profile.session_update()
+    session = json.loads(profile.session_update())['session']
+    assert session['voice'] == 'verse' and session['turn_detection']['threshold'] == 0.7
+    assert json.loads(profile.session_update(server_vad=False))['session']['turn_detection'] is None
+
+    # Le transport envoie la chaîne du profil, sans nouvelle sérialisation
+    handler = OpenAIStreamHandler('key', 'model', profile.instructions, turn_detection=profile.turn_detection,
+                                  profile=profile)
+    assert handler.session_message() is profile.session_update()
+    handler.turn_detection = None
+    assert handler.session_message() is profile.session_update(server_vad=False)
+
+
+def test_store_hot_reloads_profiles(tmp_path):
+    path = tmp_path / 'profiles.json'
+    base = SessionProfile('default', 'Bonjour')
+    write_profiles(path, {'profiles': {'support': {'voice': 'verse', 'turn_detection': {'silence_duration_ms': 800}}},
+                          'users': {'alice': 'support'}}, 1_000_000_000)
+    store = ProfileStore(str(path), base, check_interval=0)
+    store.load()
+
+    support = store.for_user('alice')
+    assert support.name == 'support' and support.instructions == 'Bonjour'
+    # Paramètres VAD partiels complétés par le VAD serveur par défaut
+    assert support.turn_detection == {'type': 'server_vad', 'threshold': 0.5, 'silence_duration_ms': 800}
+    assert store.for_user('bob') is base
+    assert store.get('support') is support
+    with pytest.raises(ValueError):
+        store.get('inconnu')
+
+    write_profiles(path, {'profiles': {'support': {'voice': 'sage'}}, 'default': 'support'}, 2_000_000_000)
+    reloaded = store.get()
+    assert reloaded.name == 'support' and reloaded.voice == 'sage' and reloaded is not support
+    assert store.reloads == 1 and store.version == 2
+
+    # Fichier invalide : les profils précédents restent en place
+    write_profiles(path, {'profiles': {'support': {'vitesse': 2}}}, 3_000_000_000)
+    assert store.get() is reloaded
+    assert store.errors == 1 and 'vitesse' in store.last_error
+
+    # Types incorrects : refusés au chargement, sans erreur à chaque recherche
+    for errors, data in enumerate([{'profiles': {'support': {'modalities': 5}}},
+                                   {'profiles': {'support': {'temperature': 'chaud'}}},
+                                   # Codec que l'interface ne décode pas
+                                   {'profiles': {'support': {'encoding': 'adpcm'}}},
+                                   {'users': ['alice']},
+                                   {'profiles': ['support']},
+                                   {'default': ['support']}], start=2):
+        write_profiles(path, data, errors * 1_000_000_000 + 1)
+        assert store.get() is reloaded and store.for_user('alice') is reloaded
+        assert store.errors == errors and 'must' in store.last_error
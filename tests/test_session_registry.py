@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import queue
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from session_registry import InMemorySessionRegistry, RedisSessionRegistry, create_registry
+
+
+class FakeRedis:
+    """Remplaçant local de Redis : clés, TTL ignorés, pub/sub en mémoire"""
+
+    def __init__(self):
+        self.data = {}
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        value = self.data.get(key)
+        return value.encode() if isinstance(value, str) else value
+
+    def set(self, key, value, nx=False, ex=None):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value
+            return True
+
+    def eval(self, script, numkeys, key, value):
+        # Seul script utilisé : suppression si la clé appartient encore à ce worker
+        with self.lock:
+            if self.data.get(key) == value:
+                del self.data[key]
+                return 1
+            return 0
+
+    def expire(self, key, ttl):
+        return key in self.data
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscribers = list(self.channels.get(channel, []))
+        for sub in subscribers:
+            sub.put({'type': 'message', 'channel': channel, 'data': message})
+        return len(subscribers)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = queue.Queue()
+
+    def subscribe(self, channel):
+        with self.redis.lock:
+            self.redis.channels.setdefault(channel, []).append(self.queue)
+
+    def listen(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def drop(self):
+        """Simule la perte de la connexion pub/sub"""
+        with self.redis.lock:
+            for subscribers in self.redis.channels.values():
+                if self.queue in subscribers:
+                    subscribers.remove(self.queue)
+        self.queue.put(ConnectionError('connexion perdue'))
+
+    def close(self):
+        self.queue.put(None)
+
+
+def test_in_memory_registry():
+    registry = create_registry('', 'w1')
+    assert isinstance(registry, InMemorySessionRegistry)
+    registry.register('s1')
+    assert registry.owner('s1') == 'w1'
+    assert registry.forward('s1', 'stop_audio') is False
+    registry.unregister('s1')
+    assert registry.owner('s1') is None
+
+
+def test_redis_registry_forwards_to_owner():
+    redis = FakeRedis()
+    worker1 = RedisSessionRegistry(redis, 'w1')
+    worker2 = RedisSessionRegistry(redis, 'w2')
+
+    received = queue.Queue()
+    worker1.subscribe(received.put)
+    worker1.register('s1')
+    assert worker2.owner('s1') == 'w1'
+
+    # Audio binaire transféré du worker 2 vers le propriétaire
+    assert worker2.forward('s1', 'send_audio_bytes', audio=b'\x01\x02', seq=7) is True
+    message = received.get(timeout=2)
+    assert message == {'session_id': 's1', 'command': 'send_audio_bytes', 'audio': b'\x01\x02', 'seq': 7}
+
+    # Le propriétaire ne se transfère rien à lui-même
+    assert worker1.forward('s1', 'stop_audio') is False
+
+    # Seul le propriétaire peut libérer la session
+    worker2.unregister('s1')
+    assert worker1.owner('s1') == 'w1'
+    worker1.unregister('s1')
+    assert worker2.owner('s1') is None
+    assert worker2.forward('s1', 'stop_audio') is False
+    worker1.close()
+
+
+def test_redis_registry_claims_are_exclusive():
+    redis = FakeRedis()
+    worker1 = RedisSessionRegistry(redis, 'w1')
+    worker2 = RedisSessionRegistry(redis, 'w2')
+
+    assert worker1.register('s1') is True
+    # Deuxième revendication : refusée, le propriétaire ne change pas
+    assert worker2.register('s1') is False
+    assert worker1.register('s1') is True
+    assert worker2.owner('s1') == 'w1'
+
+
+def test_redis_listener_logs_errors_and_resubscribes(caplog):
+    redis = FakeRedis()
+    worker1 = RedisSessionRegistry(redis, 'w1', resubscribe_delay=0)
+    worker2 = RedisSessionRegistry(redis, 'w2')
+    worker1.register('s1')
+    received = queue.Queue()
+
+    def handler(message):
+        if message['command'] == 'boom':
+            raise RuntimeError('commande en échec')
+        received.put(message)
+
+    worker1.subscribe(handler)
+    assert worker2.forward('s1', 'boom') is True
+    assert worker2.forward('s1', 'stop_audio') is True
+    assert received.get(timeout=2)['command'] == 'stop_audio'
+    assert 'Forwarded session command failed' in caplog.text
+
+    # Connexion pub/sub perdue : le worker se réabonne et reçoit de nouveau
+    worker1._pubsub.drop()
+    deadline = time.monotonic() + 2
+    while not worker2.forward('s1', 'stop_dialogue'):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert received.get(timeout=2)['command'] == 'stop_dialogue'
+    assert 'subscription lost' in caplog.text
+    worker1.close()
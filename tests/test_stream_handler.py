@@ -0,0 +1,48 @@
+import os
+import sys
+import base64
+import json
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from stream_handler import OpenAIStreamHandler, b64_payload_size
+
+
+class FakeWS:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def close(self):
+        pass
+
+
+def make_handler():
+    handler = OpenAIStreamHandler('key', 'model', 'instructions')
+    handler.ws = FakeWS()
+    handler.connected.set()
+    return handler
+
+
+def test_b64_payload_size():
+    for size in range(0, 10):
+        encoded = base64.b64encode(b'x' * size).decode()
+        assert b64_payload_size(encoded) == size
+
+
+def test_send_audio_b64_passthrough():
+    handler = make_handler()
+    audio_b64 = base64.b64encode(b'\x00\x01' * 4).decode()
+    assert handler.send_audio_b64(audio_b64) is True
+    assert handler.ws.sent == [{'type': 'input_audio_buffer.append', 'audio': audio_b64}]
+
+
+def test_send_audio_requires_connection():
+    handler = make_handler()
+    handler.connected.clear()
+    assert handler.send_audio(b'\x00\x00') is False
+    assert handler.ws.sent == []
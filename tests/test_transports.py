@@ -0,0 +1,116 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+pytest.importorskip('websockets')
+
+import realtime_stub
+from stream_handler import OpenAIStreamHandler
+from async_stream_handler import AsyncOpenAIStreamHandler
+
+
+@pytest.fixture(scope='module')
+def stub_url():
+    _, url = realtime_stub.start_in_thread()
+    return url
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+        self.done = threading.Event()
+        self.ready = threading.Event()
+
+    def __call__(self, event, data):
+        self.events.append((event, data))
+        if event == 'message' and data.get('type') == 'session.updated':
+            self.ready.set()
+        if event == 'message' and data.get('type') == 'response.done':
+            self.done.set()
+
+
+@pytest.mark.parametrize('handler_class', [OpenAIStreamHandler, AsyncOpenAIStreamHandler])
+def test_transport_roundtrip(stub_url, handler_class):
+    recorder = Recorder()
+    handler = handler_class('key', 'model', 'instructions', recorder, url=stub_url)
+    assert handler.start() is True
+    assert recorder.ready.wait(5)
+
+    assert handler.send_audio(b'\x00\x00' * 240) is True
+    handler.stop_audio()
+    assert recorder.done.wait(5)
+
+    types = [data.get('type') for event, data in recorder.events if event == 'message']
+    assert types[:2] == ['session.created', 'session.updated']
+    assert 'response.audio.delta' in types
+    assert recorder.events[0] == ('open', None)
+
+    handler.close()
+    for _ in range(100):
+        if recorder.events[-1][0] == 'close':
+            break
+        threading.Event().wait(0.05)
+    assert recorder.events[-1][0] == 'close'
+    assert not handler.connected.is_set()
+
+
+def test_stub_replays_trace_on_server_vad():
+    from realtime_trace import synthetic_trace
+    import numpy as np
+
+    stub, url = realtime_stub.start_in_thread(trace=synthetic_trace(turns=1, response_ms=500), speed=50)
+    recorder = Recorder()
+    handler = OpenAIStreamHandler('key', 'model', 'instructions', recorder, url=url)
+    assert handler.start() is True
+    assert recorder.ready.wait(5)
+
+    # Parole (bruit fort) puis silence : le VAD simulé déclenche la réponse
+    speech = (np.random.default_rng(0).standard_normal(2400) * 8000).astype(np.int16).tobytes()
+    for _ in range(3):
+        handler.send_audio(speech)
+    for _ in range(6):
+        handler.send_audio(b'\x00\x00' * 2400)
+    assert recorder.done.wait(5)
+
+    types = [data.get('type') for event, data in recorder.events if event == 'message']
+    assert types.index('input_audio_buffer.speech_started') < types.index('input_audio_buffer.speech_stopped')
+    assert types.count('response.audio.delta') == 10
+    assert stub.responses == 1
+    handler.close()
+
+
+def test_stub_cancels_and_truncates_response():
+    from realtime_trace import synthetic_trace
+
+    stub, url = realtime_stub.start_in_thread(trace=synthetic_trace(turns=1, response_ms=3000), speed=1)
+    recorder = Recorder()
+    handler = OpenAIStreamHandler('key', 'model', 'instructions', recorder, url=url)
+    assert handler.start() is True
+    assert recorder.ready.wait(5)
+
+    # Interrompre la réponse dès son premier delta audio
+    handler.stop_audio()
+    deadline = time.monotonic() + 5
+    while not any(event == 'message' and data.get('type') == 'response.audio.delta'
+                  for event, data in list(recorder.events)):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert handler.cancel_response('item_assistant_0', 120.7) is True
+    assert recorder.done.wait(5)
+
+    done = [data for event, data in recorder.events if event == 'message' and data.get('type') == 'response.done']
+    assert done[0]['response']['status'] == 'cancelled'
+    assert stub.cancelled == 1 and stub.responses == 0
+    # La troncature suit l'annulation et peut être traitée après response.done
+    deadline = time.monotonic() + 5
+    while not stub.truncations and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stub.truncations == [('item_assistant_0', 120)]
+    handler.close()
@@ -0,0 +1,74 @@
+import os
+import sys
+import wave
+
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from upload_ingest import AudioFileReader, UploadJob
+
+
+def write_wav(path, frames, rate, width=2, channels=1):
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(width)
+        f.setframerate(rate)
+        f.writeframes(frames)
+
+
+def test_reader_converts_to_pcm16_mono(tmp_path):
+    # 8 bits non signé, stéréo : moyenne des canaux
+    stereo = tmp_path / 'stereo.wav'
+    write_wav(stereo, bytes([128, 128, 192, 64, 255, 255]), 8000, width=1, channels=2)
+    with AudioFileReader(str(stereo)) as reader:
+        assert reader.duration == 3 / 8000
+        assert np.frombuffer(reader.read(10), dtype='<i2').tolist() == [0, 0, 127 << 8]
+        assert reader.read(10) == b''
+
+    # 24 bits : les 16 bits de poids fort
+    deep = tmp_path / 'deep.wav'
+    write_wav(deep, bytes([0xAA, 0x34, 0x12, 0x00, 0x00, 0x80]), 16000, width=3)
+    with AudioFileReader(str(deep)) as reader:
+        assert np.frombuffer(reader.read(10), dtype='<i2').tolist() == [0x1234, -32768]
+
+
+def test_job_resamples_in_blocks_and_retries(tmp_path):
+    path = tmp_path / 'voice.wav'
+    write_wav(path, (np.ones(16000, dtype='<i2') * 1000).tobytes(), 16000)
+    received = []
+    refused = []
+    reports = []
+
+    def sink(pcm):
+        if not refused:
+            refused.append(pcm)
+            return False
+        received.append(pcm)
+        return True
+
+    job = UploadJob(str(path), 'voice.wav', 24000, block_ms=100, speed=0, trailing_silence_ms=100)
+    assert job.run(sink, on_progress=lambda j: reports.append(j.snapshot()), sleep=lambda s: None) == 'done'
+
+    # 10 blocs rééchantillonnés à 24 kHz puis 100 ms de silence
+    assert len(received) == 11
+    assert sum(len(pcm) for pcm in received[:-1]) == 24000 * 2
+    assert received[-1] == b'\x00\x00' * 2400
+    assert reports[-1]['state'] == 'done' and reports[-1]['progress'] == 1.0
+    assert job.bytes_sent == 24000 * 2 + 4800
+
+
+def test_job_cancel_and_failure(tmp_path):
+    path = tmp_path / 'voice.pcm'
+    path.write_bytes(b'\x01\x00' * 24000)
+    job = UploadJob(str(path), 'voice.pcm', 24000, speed=0)
+    assert job.run(lambda pcm: job.cancel() or True, sleep=lambda s: None) == 'cancelled'
+    assert job.sent_seconds == 0.1
+
+    broken = tmp_path / 'broken.wav'
+    broken.write_bytes(b'data')
+    job = UploadJob(str(broken), 'broken.wav', 24000)
+    assert job.run(lambda pcm: True) == 'failed'
+    assert 'WAV' in job.error
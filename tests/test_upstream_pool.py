@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import upstream_pool
+from upstream_pool import WarmConnectionPool
+
+
+class FakeHandler:
+    """Transport factice : poignée de main immédiate sans réseau"""
+
+    created = 0
+
+    def __init__(self, event_callback):
+        FakeHandler.created += 1
+        self.event_callback = event_callback
+        self.connected = threading.Event()
+        self.closed = False
+
+    def start(self):
+        self.connected.set()
+        self.event_callback('open', None)
+        self.event_callback('message', {'type': 'session.created', 'session': {'id': 's1'}})
+        self.event_callback('message', {'type': 'session.updated'})
+        return True
+
+    def close(self):
+        self.closed = True
+        self.connected.clear()
+
+
+def make_pool(size=2, ttl=600):
+    # Pas de tâche de fond : check() est appelé explicitement
+    return WarmConnectionPool(FakeHandler, size, ttl=ttl, start_background_task=lambda target: None)
+
+
+def test_claim_replays_handshake():
+    pool = make_pool()
+    pool.check()
+    assert pool.stats()['ready'] == 2
+
+    events = []
+    handler = pool.claim(lambda event, data: events.append((event, data)))
+    assert handler is not None
+    assert [e for e, _ in events] == ['open', 'message', 'message']
+    assert events[-1][1]['type'] == 'session.updated'
+
+    # Les événements suivants vont directement au propriétaire
+    handler.event_callback('message', {'type': 'response.created'})
+    assert events[-1][1]['type'] == 'response.created'
+    assert pool.stats()['hits'] == 1
+    assert pool.stats()['idle'] == 1
+
+
+def test_claim_miss_and_replenish():
+    pool = make_pool(size=1)
+    assert pool.claim(lambda e, d: None) is None
+    assert pool.stats()['misses'] == 1
+    pool.check()
+    assert pool.claim(lambda e, d: None) is not None
+    pool.check()
+    assert pool.stats()['idle'] == 1
+
+
+def test_expired_and_dead_connections_are_dropped(monkeypatch):
+    pool = make_pool(size=2, ttl=10)
+    pool.check()
+    conns = list(pool._idle)
+    conns[0].handler.close()
+
+    now = upstream_pool.time.monotonic()
+    monkeypatch.setattr(upstream_pool.time, 'monotonic', lambda: now + 20)
+    assert pool.claim(lambda e, d: None) is None
+    assert all(conn.handler.closed for conn in conns)
+    assert pool.stats()['expired'] == 2
@@ -0,0 +1,47 @@
+import os
+import sys
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from upstream_resume import ConversationHistory, GapBuffer, backoff_delay
+
+
+def test_backoff_delay_grows_and_is_capped():
+    assert [backoff_delay(attempt, 0.5, 10.0, rng=lambda: 1.0) for attempt in range(7)] == \
+        [0.5, 1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+    # Gigue complète : entre 0 et le plafond de la tentative
+    assert backoff_delay(3, 0.5, 10.0, rng=lambda: 0.25) == 1.0
+
+
+def test_history_replays_items_in_conversation_order():
+    history = ConversationHistory(max_items=3)
+    history.add('item_u1', 'user')
+    history.add('item_a1', 'assistant')
+    # La transcription de l'utilisateur arrive après celle de la réponse
+    history.set_text('item_a1', 'Il est midi.', 'assistant')
+    history.set_text('item_u1', 'Quelle heure est-il ?', 'user')
+    history.add('item_u2', 'user')
+    history.add('item_u1', 'user')
+
+    events = history.replay_events()
+    assert [event['item']['id'] for event in events] == ['item_u1', 'item_a1']
+    assert events[0]['item']['content'] == [{'type': 'input_text', 'text': 'Quelle heure est-il ?'}]
+    assert events[1]['item']['content'] == [{'type': 'text', 'text': 'Il est midi.'}]
+
+    # Au-delà de max_items, les plus anciens éléments sont oubliés
+    history.set_text('item_a2', 'Bonne journée.', 'assistant')
+    assert len(history) == 3
+    assert [event['item']['id'] for event in history.replay_events()] == ['item_a1', 'item_a2']
+
+
+def test_gap_buffer_keeps_most_recent_audio():
+    buffer = GapBuffer(max_bytes=10)
+    assert buffer.push(b'aaaa', 1) == 0
+    assert buffer.push(b'bbbb', 2) == 0
+    assert buffer.push(b'cccc', 3) == 1
+    assert buffer.push(b'x' * 11, 4) == 1
+    assert buffer.dropped == 2
+    assert buffer.drain() == [(b'bbbb', 2), (b'cccc', 3)]
+    assert len(buffer) == 0 and buffer.size == 0
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from vad import EnergyVAD
+
+RATE = 24000
+
+
+def tone(ms, amplitude=0.3, freq=220):
+    t = np.arange(RATE * ms // 1000) / RATE
+    return (np.sin(2 * np.pi * freq * t) * amplitude * 32767).astype(np.int16).tobytes()
+
+
+def silence(ms):
+    return np.zeros(RATE * ms // 1000, dtype=np.int16).tobytes()
+
+
+def test_silence_is_dropped_and_speech_forwarded_with_preroll():
+    vad = EnergyVAD(sample_rate=RATE, hangover_ms=300, preroll_ms=100)
+    first = silence(100)
+    assert vad.process(silence(100)).chunks == []
+    decision = vad.process(first)
+    assert decision.chunks == []
+
+    speech = tone(100)
+    decision = vad.process(speech)
+    assert decision.event == 'start'
+    # La dernière trame silencieuse est envoyée avant la parole
+    assert decision.chunks == [first, speech]
+
+
+def test_hangover_then_stop():
+    vad = EnergyVAD(sample_rate=RATE, hangover_ms=300)
+    vad.process(tone(200))
+    assert vad.process(silence(100)).chunks != []
+    assert vad.process(silence(100)).event is None
+    decision = vad.process(silence(100))
+    assert decision.event == 'stop'
+    assert decision.speech_ms >= 190
+    assert vad.process(silence(100)).chunks == []
+
+
+def test_noise_is_not_speech():
+    rng = np.random.default_rng(0)
+    noise = (rng.uniform(-0.3, 0.3, RATE // 10) * 32767).astype(np.int16)
+    vad = EnergyVAD(sample_rate=RATE)
+    assert not vad.classify(noise).any()
+    assert vad.classify(np.frombuffer(tone(100), dtype=np.int16)).all()
+
+
+def test_keep_every_forwards_some_silence():
+    vad = EnergyVAD(sample_rate=RATE, keep_every=3)
+    forwarded = [bool(vad.process(silence(100)).chunks) for _ in range(6)]
+    assert forwarded == [False, False, True, False, False, True]
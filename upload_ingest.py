@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+import uuid
+import wave
+
+import numpy as np
+
+from resample import StreamingResampler
+
+try:
+    import soundfile
+except ImportError:  # optional dependency, only needed for compressed uploads (FLAC, Ogg...)
+    soundfile = None
+
+RAW_EXTENSIONS = ('.pcm', '.raw')
+
+
+class AudioFileReader:
+    """Streamed reader of an uploaded audio file, as PCM16 mono blocks.
+
+    WAV files (8, 16, 24 or 32-bit integer PCM) are read with the standard
+    ``wave`` module, ``.pcm`` / ``.raw`` files as headerless PCM16 mono at
+    ``raw_rate``, and any other format through ``soundfile`` when it is
+    installed. Only one block is held in memory at a time; multi-channel
+    audio is downmixed by averaging the channels.
+    """
+
+    def __init__(self, path, raw_rate=24000):
+        self.path = path
+        self._file = None
+        self._wave = None
+        self._sound = None
+        extension = os.path.splitext(path)[1].lower()
+        if extension in RAW_EXTENSIONS:
+            self._file = open(path, 'rb')
+            self.sample_rate = raw_rate
+            self.channels = 1
+            self.sample_width = 2
+            self.frames = os.path.getsize(path) // 2
+        elif extension == '.wav':
+            try:
+                self._wave = wave.open(path, 'rb')
+            except (wave.Error, EOFError) as e:
+                raise ValueError(f"invalid WAV file: {e}")
+            self.sample_rate = self._wave.getframerate()
+            self.channels = self._wave.getnchannels()
+            self.sample_width = self._wave.getsampwidth()
+            self.frames = self._wave.getnframes()
+            if self.sample_width not in (1, 2, 3, 4):
+                self.close()
+                raise ValueError(f"unsupported WAV sample width: {self.sample_width} bytes")
+        elif soundfile is not None:
+            try:
+                self._sound = soundfile.SoundFile(path)
+            except RuntimeError as e:
+                raise ValueError(f"unsupported audio file: {e}")
+            self.sample_rate = self._sound.samplerate
+            self.channels = self._sound.channels
+            self.sample_width = 2
+            self.frames = self._sound.frames
+        else:
+            raise ValueError(f"unsupported audio format '{extension}' (WAV or PCM16, "
+                             "other formats need the 'soundfile' package)")
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    def read(self, frames):
+        """Return up to ``frames`` samples as PCM16 mono bytes, ``b''`` at the end."""
+        if self._sound is not None:
+            samples = self._sound.read(frames, dtype='int16', always_2d=True)
+            return self._downmix(samples)
+
+        if self._wave is not None:
+            data = self._wave.readframes(frames)
+        else:
+            data = self._file.read(frames * 2)
+        if not data:
+            return b''
+        width = self.sample_width
+        data = data[:len(data) - len(data) % (width * self.channels)]
+        if width == 1:
+            samples = (np.frombuffer(data, dtype=np.uint8).astype(np.int16) - 128) << 8
+        elif width == 2:
+            samples = np.frombuffer(data, dtype='<i2')
+        elif width == 3:
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+            samples = (raw[:, 1].astype(np.uint16) | (raw[:, 2].astype(np.uint16) << 8)).view(np.int16)
+        else:
+            samples = (np.frombuffer(data, dtype='<i4') >> 16).astype(np.int16)
+        return self._downmix(samples.reshape(-1, self.channels))
+
+    def _downmix(self, samples):
+        if samples.shape[1] > 1:
+            samples = samples.mean(axis=1).round().astype(np.int16)
+        return samples.astype('<i2', copy=False).tobytes()
+
+    def close(self):
+        for handle in (self._file, self._wave, self._sound):
+            if handle is not None:
+                handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class UploadJob:
+    """Background ingestion of one uploaded file into a sink.
+
+    The file is decoded and resampled to ``target_rate`` one ``block_ms``
+    block at a time and handed to ``sink(pcm)``. A sink returning False is
+    retried after ``retry_delay`` (backpressure); a sink raising fails the
+    job. With ``speed`` > 0 blocks are paced at that multiple of real time,
+    so a long file does not flood the upstream queues. ``trailing_silence_ms``
+    of silence is appended so turn detection closes the last turn.
+    """
+
+    STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+    def __init__(self, path, filename, target_rate, block_ms=100, speed=1.0,
+                 trailing_silence_ms=800, raw_rate=24000, session_id=None):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.filename = filename
+        self.target_rate = target_rate
+        self.block_ms = block_ms
+        self.speed = speed
+        self.trailing_silence_ms = trailing_silence_ms
+        self.raw_rate = raw_rate
+        self.session_id = session_id
+        self.state = 'queued'
+        self.error = None
+        self.duration = None
+        self.sent_seconds = 0.0
+        self.bytes_sent = 0
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    @property
+    def progress(self):
+        if not self.duration:
+            return 1.0 if self.state == 'done' else 0.0
+        return min(1.0, self.sent_seconds / self.duration)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def snapshot(self):
+        return {
+            'job_id': self.id,
+            'filename': self.filename,
+            'state': self.state,
+            'progress': round(self.progress, 3),
+            'sent_seconds': round(self.sent_seconds, 2),
+            'duration': round(self.duration, 2) if self.duration is not None else None,
+            'error': self.error,
+        }
+
+    def run(self, sink, on_progress=None, sleep=time.sleep, progress_interval=0.5, retry_delay=0.02):
+        """Feed the whole file to ``sink``; return the final state."""
+        self.state = 'running'
+        last_report = 0.0
+        try:
+            with AudioFileReader(self.path, self.raw_rate) as reader:
+                self.duration = reader.duration
+                resampler = None
+                if reader.sample_rate != self.target_rate:
+                    resampler = StreamingResampler(reader.sample_rate, self.target_rate)
+                block_frames = max(1, reader.sample_rate * self.block_ms // 1000)
+                silence = b'\x00\x00' * (self.target_rate * self.trailing_silence_ms // 1000)
+                started = time.monotonic()
+                position = 0.0
+
+                while not self._cancel.is_set():
+                    pcm = reader.read(block_frames)
+                    if not pcm:
+                        break
+                    position += len(pcm) / 2 / reader.sample_rate
+                    if resampler is not None:
+                        pcm = resampler.process(pcm)
+                    if pcm and not self._deliver(sink, pcm, sleep, retry_delay):
+                        break
+                    self.sent_seconds = position
+
+                    if self.speed > 0:
+                        ahead = position / self.speed - (time.monotonic() - started)
+                        if ahead > 0:
+                            sleep(ahead)
+                    if on_progress and time.monotonic() - last_report >= progress_interval:
+                        last_report = time.monotonic()
+                        on_progress(self)
+
+                if silence and not self._cancel.is_set():
+                    self._deliver(sink, silence, sleep, retry_delay)
+
+            self.state = 'cancelled' if self._cancel.is_set() else 'done'
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+            if on_progress:
+                on_progress(self)
+        return self.state
+
+    def _deliver(self, sink, pcm, sleep, retry_delay):
+        while not self._cancel.is_set():
+            if sink(pcm):
+                self.bytes_sent += len(pcm)
+                return True
+            sleep(retry_delay)
+        return False
@@ -0,0 +1,169 @@
+import threading
+import time
+
+
+class _WarmConnection:
+    """A pooled handler whose events are buffered until a session claims it."""
+
+    def __init__(self, handler_factory):
+        self.created_at = time.monotonic()
+        self.ready = threading.Event()
+        self.dead = False
+        self._owner = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self.handler = handler_factory(self)
+
+    def __call__(self, event, data):
+        with self._lock:
+            if self._owner is not None:
+                self._owner(event, data)
+                return
+            if event in ('close', 'error'):
+                self.dead = True
+            elif event == 'message' and data.get('type') == 'session.updated':
+                self.ready.set()
+            self._buffer.append((event, data))
+
+    def state(self, ttl, now):
+        """'ready', 'pending' (handshake in progress) or 'stale'."""
+        if self.dead or now - self.created_at >= ttl:
+            return 'stale'
+        if not self.ready.is_set():
+            return 'pending'
+        return 'ready' if self.handler.connected.is_set() else 'stale'
+
+    def attach(self, event_callback):
+        """Hand the connection to its owner, replaying the buffered handshake."""
+        with self._lock:
+            self._owner = event_callback
+            self.handler.event_callback = event_callback
+            buffered, self._buffer = self._buffer, []
+            for event, data in buffered:
+                event_callback(event, data)
+
+
+class WarmConnectionPool:
+    """Keep upstream realtime sessions connected and configured ahead of time.
+
+    ``claim`` hands out a ready connection instantly; a background task drops
+    expired or unhealthy connections and tops the pool back up to ``size``.
+    """
+
+    def __init__(self, handler_factory, size, ttl=600, check_interval=5,
+                 start_background_task=None):
+        self.handler_factory = handler_factory
+        self.size = size
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._start_background_task = start_background_task or self._start_thread
+        self._idle = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._started = False
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.failed = 0
+
+    @staticmethod
+    def _start_thread(target):
+        thread = threading.Thread(target=target, name='warm-pool', daemon=True)
+        thread.start()
+        return thread
+
+    def start(self):
+        with self._lock:
+            if self._started or self.size <= 0:
+                return
+            self._started = True
+        self._start_background_task(self._run)
+
+    def claim(self, event_callback):
+        """Return a ready handler bound to ``event_callback``, or None."""
+        self.start()
+        now = time.monotonic()
+        stale = []
+        conn = None
+        with self._lock:
+            remaining = []
+            for candidate in self._idle:
+                state = candidate.state(self.ttl, now)
+                if state == 'stale':
+                    stale.append(candidate)
+                elif state == 'ready' and conn is None:
+                    conn = candidate
+                else:
+                    remaining.append(candidate)
+            self._idle = remaining
+            if conn is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self._close_all(stale)
+        self._wakeup.set()
+        if conn is None:
+            return None
+        conn.attach(event_callback)
+        return conn.handler
+
+    def _close_all(self, conns):
+        for conn in conns:
+            if conn.dead:
+                self.failed += 1
+            else:
+                self.expired += 1
+            try:
+                conn.handler.close()
+            except Exception:
+                pass
+
+    def check(self):
+        """Drop unhealthy connections and refill the pool to its target size."""
+        now = time.monotonic()
+        with self._lock:
+            healthy, stale = [], []
+            for conn in self._idle:
+                if conn.state(self.ttl, now) == 'stale':
+                    stale.append(conn)
+                else:
+                    healthy.append(conn)
+            self._idle = healthy
+            missing = self.size - len(self._idle)
+        self._close_all(stale)
+
+        for _ in range(missing):
+            conn = _WarmConnection(self.handler_factory)
+            try:
+                started = conn.handler.start()
+            except Exception:
+                started = False
+            if not started:
+                self.failed += 1
+                conn.handler.close()
+                continue
+            with self._lock:
+                self._idle.append(conn)
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                pass
+            self._wakeup.wait(self.check_interval)
+            self._wakeup.clear()
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+            ready = sum(1 for conn in self._idle if conn.ready.is_set())
+        return {
+            'target': self.size,
+            'idle': idle,
+            'ready': ready,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'failed': self.failed,
+        }
@@ -0,0 +1,104 @@
+import collections
+import random
+
+
+def backoff_delay(attempt, base=0.5, cap=10.0, rng=random.random):
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2**attempt)].
+
+    Jitter spreads the reconnects of sessions dropped together (an
+    upstream restart) instead of retrying them in lockstep.
+    """
+    return rng() * min(cap, base * 2 ** attempt)
+
+
+class ConversationHistory:
+    """Recent conversation items, replayed as text on a new upstream connection.
+
+    Items are registered in conversation order when created and get their
+    text later from the transcription events, which may arrive out of
+    order. Only the last ``max_items`` items are kept.
+    """
+
+    def __init__(self, max_items=20):
+        self.max_items = max_items
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item_id, role):
+        if not item_id or role not in ('user', 'assistant') or item_id in self._items:
+            return
+        self._items[item_id] = {'role': role, 'text': None}
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def set_text(self, item_id, text, role):
+        if not item_id or not text:
+            return
+        self.add(item_id, role)
+        if item_id in self._items:
+            self._items[item_id]['text'] = text
+
+    def replay_events(self):
+        """``conversation.item.create`` events recreating the transcribed items.
+
+        Original item ids are kept, so the server's ``conversation.item.created``
+        echoes do not register the items twice.
+        """
+        events = []
+        for item_id, item in self._items.items():
+            if not item['text']:
+                continue
+            content_type = 'input_text' if item['role'] == 'user' else 'text'
+            events.append({
+                "type": "conversation.item.create",
+                "item": {
+                    "id": item_id,
+                    "type": "message",
+                    "role": item['role'],
+                    "content": [{"type": content_type, "text": item['text']}],
+                },
+            })
+        return events
+
+
+class GapBuffer:
+    """Bounded FIFO of input audio frames received while the upstream link is down.
+
+    Beyond ``max_bytes`` the oldest frames are dropped: after a long gap the
+    most recent speech is the part worth sending.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._frames = collections.deque()
+        self.size = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def push(self, audio, seq=None):
+        """Buffer one frame; return the number of frames dropped to make room."""
+        if len(audio) > self.max_bytes:
+            self.dropped += 1
+            return 1
+        dropped = 0
+        self._frames.append((audio, seq))
+        self.size += len(audio)
+        while self.size > self.max_bytes:
+            old, _ = self._frames.popleft()
+            self.size -= len(old)
+            dropped += 1
+        self.dropped += dropped
+        return dropped
+
+    def drain(self):
+        frames = list(self._frames)
+        self._frames.clear()
+        self.size = 0
+        return frames
+
+    def clear(self):
+        self.drain()
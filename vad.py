@@ -0,0 +1,111 @@
+import collections
+
+import numpy as np
+
+
+class VADDecision:
+    """Outcome of one chunk: what to forward upstream and any turn transition."""
+
+    __slots__ = ('chunks', 'event', 'dropped_bytes', 'speech_ms')
+
+    def __init__(self, chunks, event=None, dropped_bytes=0, speech_ms=0):
+        self.chunks = chunks
+        self.event = event
+        self.dropped_bytes = dropped_bytes
+        self.speech_ms = speech_ms
+
+
+class EnergyVAD:
+    """Energy / zero-crossing voice activity detector for PCM16 mono chunks.
+
+    Each chunk is split into ``frame_ms`` frames and classified in one NumPy
+    pass: a frame is speech when its RMS exceeds ``threshold`` and its
+    zero-crossing rate stays below ``zcr_max`` (broadband noise crosses zero
+    far more often than voiced speech). Speech continues until ``hangover_ms``
+    of silence; silent chunks outside speech are dropped, except one in every
+    ``keep_every`` when set. The last ``preroll_ms`` of dropped audio are sent
+    ahead of the chunk that starts speech so onsets are not clipped.
+    """
+
+    def __init__(self, sample_rate=24000, frame_ms=10, threshold=0.01, zcr_max=0.35,
+                 hangover_ms=600, preroll_ms=200, keep_every=0):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_len = max(1, sample_rate * frame_ms // 1000)
+        self.threshold = threshold
+        self.zcr_max = zcr_max
+        self.hangover_ms = hangover_ms
+        self.keep_every = keep_every
+        self.speaking = False
+        self.silence_ms = 0
+        self.speech_ms = 0
+        self._silent_chunks = 0
+        self._preroll = collections.deque()
+        self._preroll_bytes = 0
+        self._preroll_max = sample_rate * 2 * preroll_ms // 1000
+
+    def classify(self, samples):
+        """Return a boolean speech flag per frame."""
+        count = len(samples) // self.frame_len
+        if count == 0:
+            frames = samples.reshape(1, -1)
+        else:
+            frames = samples[:count * self.frame_len].reshape(count, self.frame_len)
+        frames = frames.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1) if frames.shape[1] > 1 else np.zeros(len(frames))
+        return (rms > self.threshold) & (zcr < self.zcr_max)
+
+    def process(self, pcm):
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)
+        if samples.size == 0:
+            return VADDecision([])
+
+        flags = self.classify(samples)
+        frame_ms = len(samples) * 1000 / self.sample_rate / len(flags)
+        speech = np.flatnonzero(flags)
+
+        if speech.size:
+            trailing_silence = (len(flags) - 1 - speech[-1]) * frame_ms
+            if not self.speaking:
+                self.speaking = True
+                self.speech_ms = 0
+                chunks = list(self._preroll) + [pcm]
+                self._clear_preroll()
+                self.silence_ms = trailing_silence
+                self.speech_ms += speech.size * frame_ms
+                return VADDecision(chunks, 'start', speech_ms=self.speech_ms)
+            self.silence_ms = trailing_silence
+            self.speech_ms += speech.size * frame_ms
+            return VADDecision([pcm], speech_ms=self.speech_ms)
+
+        if self.speaking:
+            # Hangover: keep sending silence so the utterance ends naturally
+            self.silence_ms += len(flags) * frame_ms
+            if self.silence_ms >= self.hangover_ms:
+                self.speaking = False
+                self._silent_chunks = 0
+                return VADDecision([pcm], 'stop', speech_ms=self.speech_ms)
+            return VADDecision([pcm], speech_ms=self.speech_ms)
+
+        self._silent_chunks += 1
+        if self.keep_every and self._silent_chunks % self.keep_every == 0:
+            return VADDecision([pcm])
+        dropped = self._push_preroll(pcm)
+        return VADDecision([], dropped_bytes=dropped)
+
+    def _push_preroll(self, pcm):
+        """Keep ``pcm`` as pre-roll; return the bytes definitively dropped."""
+        dropped = 0
+        self._preroll.append(pcm)
+        self._preroll_bytes += len(pcm)
+        while self._preroll and self._preroll_bytes > self._preroll_max:
+            old = self._preroll.popleft()
+            self._preroll_bytes -= len(old)
+            dropped += len(old)
+        return dropped
+
+    def _clear_preroll(self):
+        self._preroll.clear()
+        self._preroll_bytes = 0